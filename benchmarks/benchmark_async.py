@@ -0,0 +1,64 @@
+"""Compares the worker utilisation of SCE-UA and the asynchronous sampler on a process pool
+
+Usage: python benchmarks/benchmark_async.py [processes] [repetitions]
+The model is the test function of benchmark_surrogate, which sleeps for a log-normally distributed time
+(median 20 ms, a few runs take ten times as long), as SWMM runs whose duration depends on the parameters.
+Utilisation is the simulated time divided by the wall time of all workers.
+"""
+import contextlib
+import io
+import sys
+import time
+
+import numpy as np
+import spotpy
+
+from swmm_calibration.classes.async_sampler import AsyncSampler
+from swmm_calibration.classes.parallel import ForEach
+from benchmark_surrogate import TestFunctionSetup
+
+
+class SlowTestFunctionSetup(TestFunctionSetup):
+    def __init__(self):
+        super(SlowTestFunctionSetup, self).__init__()
+        self.busy = 0.
+
+    def simulation(self, vector):
+        duration = 0.02 * np.exp(np.random.randn())
+        time.sleep(duration)
+        return super(SlowTestFunctionSetup, self).simulation(vector) + [duration]
+
+    def objectivefunction(self, simulation, evaluation):
+        # called in the parent process for every run
+        self.busy += simulation[1]
+        return simulation[0]
+
+
+def utilisation(algorithm, repetitions, processes, seed, **kwargs):
+    np.random.seed(seed)
+    setup = SlowTestFunctionSetup()
+    sampler = algorithm(setup, dbname='benchmark_async', dbformat='ram', save_sim=False,
+                        alt_objfun=None)
+    sampler.repeat = ForEach(sampler.simulate, processes=processes)
+    start = time.time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        sampler.sample(repetitions, **kwargs)
+    wall = time.time() - start
+    data = sampler.getdata()
+    return setup.busy / (wall * processes), len(data) / wall, data['like1'].min()
+
+
+def main(argv):
+    processes = int(argv[1]) if len(argv) > 1 else 4
+    repetitions = int(argv[2]) if len(argv) > 2 else 400
+    runs = [(spotpy.algorithms.sceua, {'ngs': 5, 'kstop': 5, 'pcento': 0.01}),
+            (AsyncSampler, {})]
+    print('{} processes, {} repetitions'.format(processes, repetitions))
+    print('{:<20} {:>12} {:>12} {:>12}'.format('algorithm', 'utilisation', 'runs/s', 'best'))
+    for algorithm, kwargs in runs:
+        used, rate, best = utilisation(algorithm, repetitions, processes, 0, **kwargs)
+        print('{:<20} {:>12.0%} {:>12.1f} {:>12.4g}'.format(algorithm.__name__, used, rate, best))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
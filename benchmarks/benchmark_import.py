@@ -0,0 +1,69 @@
+"""Import time of the modules a worker process loads to run models
+
+Usage: python benchmarks/benchmark_import.py [--output results.json] [--baseline results.json] [--repeat 5]
+Each module is imported in a fresh interpreter, as in a spawned worker process, best of `repeat`. The
+plotting modules are timed as well: they are only loaded when a plot is made. Fails if a module of the
+calibration path loads matplotlib or seaborn.
+"""
+import argparse
+import subprocess
+import sys
+from collections import OrderedDict
+
+from common import ROOT, report
+
+# modules that run models and evaluate them, which must not load the plotting libraries
+CORE_MODULES = [
+    'swmm_calibration.classes.swmm_model',
+    'swmm_calibration.classes.objective_function',
+    'swmm_calibration.classes.spotpy_setup',
+    'swmm_calibration.classes.optimizer',
+    'swmm_calibration.classes.experiment_runner',
+]
+PLOTTING_MODULES = [
+    'swmm_calibration.classes.model_plotting_utils',
+    'swmm_calibration.classes.optimizer_plotting_utils',
+]
+PLOTTING_LIBRARIES = ['matplotlib', 'seaborn']
+
+IMPORT = '''
+import sys, time
+started = time.perf_counter()
+import {module}
+print(time.perf_counter() - started)
+print(','.join(m for m in {libraries!r} if m in sys.modules))
+'''
+
+
+def import_time(module, repeat):
+    """Seconds to import a module in a fresh interpreter (best of repeat), and the plotting libraries it loads"""
+    times = []
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', IMPORT.format(module=module, libraries=PLOTTING_LIBRARIES)],
+                                cwd=ROOT, check=True, stdout=subprocess.PIPE, universal_newlines=True).stdout
+        seconds, loaded = output.split('\n')[:2]
+        times.append(float(seconds))
+    return min(times), [m for m in loaded.split(',') if m]
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', help='save results to this json file')
+    parser.add_argument('--baseline', help='compare with results saved earlier')
+    parser.add_argument('--repeat', type=int, default=5, help='imports per module')
+    args = parser.parse_args(argv[1:])
+
+    results = OrderedDict()
+    heavy = []
+    for module in CORE_MODULES + PLOTTING_MODULES:
+        results['import.' + module.rsplit('.', 1)[1]], loaded = import_time(module, args.repeat)
+        if loaded and module in CORE_MODULES:
+            heavy.append('{} loads {}'.format(module, ', '.join(loaded)))
+    regressions = report(results, args.output, args.baseline)
+    for line in heavy:
+        print('## ' + line)
+    return 1 if regressions or heavy else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
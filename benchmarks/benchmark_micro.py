@@ -0,0 +1,94 @@
+"""Micro-benchmarks of the stages of a calibration
+
+Usage: python benchmarks/benchmark_micro.py [--output results.json] [--baseline results.json]
+Times data ingestion (read_floodx_file, read_floodx, resample_interpolate, DataStore), model input rendering, output
+extraction from a file written by the stand-in SWMM engine and each objective function.
+"""
+import argparse
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+from common import BenchmarkSettings, STUB_SWMM, best_time, report
+
+from swmm_calibration.classes import data_store, swmm_model
+from swmm_calibration.classes.objective_function import ObjectiveFunction
+from swmm_calibration.classes.simulation_backend import SubprocessBackend
+from swmm_calibration.classes.swmm_output import SwmmOutputReader
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--output', help='save results to this json file')
+    parser.add_argument('--baseline', help='compare with results saved earlier')
+    args = parser.parse_args(argv[1:])
+    s = BenchmarkSettings
+    results = OrderedDict()
+
+    # data ingestion
+    forcing = data_store.read_floodx_file(s.forcing_data_file)
+    results['read_floodx_file'] = best_time(lambda: data_store.read_floodx_file(s.forcing_data_file), number=1)
+    results['read_floodx'] = best_time(lambda: data_store.read_floodx(s.forcing_data_file), number=3)
+    results['read_floodx.window'] = best_time(lambda: data_store.read_floodx(
+        s.forcing_data_file, s.calibration_event['start_dt'], s.calibration_event['end_dt'], period='S'), number=3)
+    results['resample_interpolate.1s'] = best_time(lambda: data_store.resample_interpolate(forcing, 'S'), number=3)
+    results['resample_interpolate.5s'] = best_time(lambda: data_store.resample_interpolate(forcing, '5S'), number=3)
+    results['data_store.forcing.cold'] = best_time(lambda: data_store.DataStore(persist=False).forcing(
+        s.forcing_data_file, s.calibration_event['start_dt'], s.calibration_event['end_dt']), number=1)
+    store = data_store.DataStore(persist=False)
+    results['data_store.forcing.warm'] = best_time(lambda: store.forcing(
+        s.forcing_data_file, s.calibration_event['start_dt'], s.calibration_event['end_dt']), number=100)
+
+    directory = tempfile.mkdtemp()
+    model = swmm_model.SwmmModel(
+        swmm_model_template=s.swmm_model_template, initial_conditions=s.calibration_event['initial_conditions'],
+        sim_start_dt=s.calibration_event['start_dt'], sim_end_dt=s.calibration_event['end_dt'],
+        sim_event_name='benchmark', forcing_data_file=s.forcing_data_file, obs_available=s.obs_available,
+        obs_config_calibration=s.obs_config_calibration, obs_config_validation=s.obs_config_validation,
+        cal_params=s.calibration_parameters, temp_folder=directory, data_store=store)
+    results['swmm_model.init'] = best_time(lambda: swmm_model.SwmmModel(
+        swmm_model_template=s.swmm_model_template, initial_conditions=s.calibration_event['initial_conditions'],
+        sim_start_dt=s.calibration_event['start_dt'], sim_end_dt=s.calibration_event['end_dt'],
+        sim_event_name='benchmark', forcing_data_file=s.forcing_data_file, obs_available=s.obs_available,
+        obs_config_calibration=s.obs_config_calibration, obs_config_validation=s.obs_config_validation,
+        cal_params=s.calibration_parameters, temp_folder=directory, data_store=store), number=3)
+
+    # model input and simulation
+    params = dict((name, np.mean(p['bounds'])) for name, p in s.calibration_parameters.items())
+    results['render'] = best_time(lambda: model.render(params), number=100)
+    input_mod = model.render(params)
+    results['write_model'] = best_time(lambda: model.write_model(input_mod), number=100)
+    temp_model, output_file, report_file = model.write_model(input_mod)
+    labels = [s.obs_available[o]['swmm_node'] for o in s.obs_config_calibration]
+    backend = SubprocessBackend(STUB_SWMM)
+    results['stub_swmm'] = best_time(lambda: backend.run(temp_model, report_file, output_file, labels), number=3)
+
+    # output extraction
+    reader = SwmmOutputReader()
+    names = [','.join(label) for label in labels]
+    results['swmm_output.extract'] = best_time(lambda: reader.extract(output_file, *names), number=100)
+    results['swmm_output.extract_array'] = best_time(lambda: reader.extract_array(output_file, *names), number=100)
+
+    # objective functions, on the simulation of the stand-in engine
+    simulation = backend.run(temp_model, report_file, output_file, labels)
+    simulation.columns = s.obs_config_calibration
+    simulation.index = model.sim_index
+    for obs_name in s.obs_config_calibration:
+        fname = s.obs_available[obs_name]['calibration']['obj_fun']
+        observations = model.obs_calibration[[obs_name]]
+        for compiled in [False, True]:
+            obj_fun = ObjectiveFunction(s.obs_available, compiled=compiled)
+            name = 'objective_function.{}.{}'.format(fname, 'compiled' if compiled else 'frames')
+            results[name] = best_time(lambda: obj_fun.evaluate(simulation, observations), number=100)
+
+    for filename in os.listdir(os.path.dirname(temp_model)):
+        os.remove(os.path.join(os.path.dirname(temp_model), filename))
+    regressions = report(results, args.output, args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
@@ -0,0 +1,56 @@
+"""Compares ObjectiveFunction.evaluate on data frames and on pre-aligned arrays (compiled)
+
+Usage: python benchmarks/benchmark_objective_function.py [periods]
+Simulations and observations are synthetic, with the time axis of the example calibration event.
+"""
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+
+from swmm_calibration.classes.objective_function import ObjectiveFunction
+
+REPEAT = 200
+OBJECTIVE_FUNCTIONS = ['rmse', 'spearman', 'spearman_zero', 'spearman_simple_zero']
+
+
+def synthetic_data(periods):
+    sim_index = pd.Index([str(t) for t in pd.date_range('2016/10/06 14:56:05', periods=periods, freq='5S')],
+                         name='datetime')
+    obs_config = {}
+    simulation = pd.DataFrame(index=sim_index)
+    evaluation = pd.DataFrame(index=sim_index[1:-1])
+    for name in OBJECTIVE_FUNCTIONS:
+        obs_config[name] = {'calibration': {'obj_fun': name, 'weight': 1, 'zero_threshold_sim': 0.02,
+                                            'zero_threshold_obs': 0.02}}
+        level = np.clip(np.sin(np.linspace(0, 3, periods)), 0, None)
+        simulation[name] = (level * np.random.uniform(0.8, 1.2, periods)).astype(np.float32)
+        evaluation[name] = level[1:-1] + np.random.normal(0, 0.05, periods - 2)
+    return obs_config, simulation, evaluation
+
+
+def main(argv):
+    periods = int(argv[1]) if len(argv) > 1 else 205
+    obs_config, simulation, evaluation = synthetic_data(periods)
+
+    for name in OBJECTIVE_FUNCTIONS + [None]:
+        columns = [name] if name else OBJECTIVE_FUNCTIONS
+        frames = ObjectiveFunction(dict((c, obs_config[c]) for c in columns), compiled=False)
+        compiled = ObjectiveFunction(dict((c, obs_config[c]) for c in columns), compiled=True)
+        compiled.compile(evaluation[columns], simulation.index)
+        observations = evaluation[columns]
+
+        expected = frames.evaluate(simulation, observations)
+        result = compiled.evaluate(simulation, observations)
+        timings = []
+        for function in [frames, compiled]:
+            seconds = min(timeit.repeat(lambda: function.evaluate(simulation, observations),
+                                        number=REPEAT, repeat=3)) / REPEAT
+            timings.append(seconds * 1e6)
+        print('{:<22} frames {:9.1f} us  compiled {:7.1f} us  speedup {:5.1f}  difference {:.1e}'.format(
+            name or 'all', timings[0], timings[1], timings[0] / timings[1], abs(expected - result)))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,54 @@
+"""Compares reading SWMM binary output with swmmtoolbox and with SwmmOutputReader
+
+Usage: python benchmarks/benchmark_output_reader.py [output_file] [label ...]
+Without an output file, a synthetic file with the nodes of the example model is written.
+"""
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime
+
+import numpy as np
+from swmmtoolbox import swmmtoolbox
+
+from swmm_calibration.classes import swmm_output
+
+REPEAT = 20
+
+
+def synthetic_output(filename, periods=205):
+    nodes = ['4', '9', 'v9', 'v7', 'virt2', 'v6', 'virtual1', 'virt3', '28', '29', 'v4', '5',
+             'm1', 'm2', 'm3', 's2', 's3', 's5', 's6', 'w2', 'w3', 'w4']
+    links = ['l{}'.format(i) for i in range(30)]
+    results = np.random.rand(periods, len(nodes), len(swmm_output.VARIABLES[1]))
+    swmm_output.write_output(filename, datetime(2016, 10, 6, 14, 56), 5, nodes, results, link_names=links)
+
+
+def main(argv):
+    if len(argv) > 1:
+        filename = argv[1]
+    else:
+        filename = os.path.join(tempfile.mkdtemp(), 'benchmark.out')
+        synthetic_output(filename)
+    labels = argv[2:] or ['node,s3,Depth_above_invert', 'node,s5,Depth_above_invert', 'node,s6,Depth_above_invert']
+
+    reader = swmm_output.SwmmOutputReader()
+    expected = swmmtoolbox.extract(filename, *labels)
+    result = reader.extract(filename, *labels)
+    print('values identical: {}'.format(np.array_equal(expected.values, result.values)))
+    # swmmtoolbox truncates dates to full seconds, SwmmOutputReader rounds them
+    print('largest time axis difference: {} s'.format(abs((expected.index - result.index).total_seconds()).max()))
+
+    timings = [
+        ('swmmtoolbox.extract', lambda: swmmtoolbox.extract(filename, *labels)),
+        ('SwmmOutputReader.extract', lambda: reader.extract(filename, *labels)),
+        ('SwmmOutputReader.extract_array', lambda: reader.extract_array(filename, *labels)),
+    ]
+    for name, function in timings:
+        seconds = min(timeit.repeat(function, number=REPEAT, repeat=3)) / REPEAT
+        print('{:<32} {:10.3f} ms per file'.format(name, seconds * 1000))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
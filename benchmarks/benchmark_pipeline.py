@@ -0,0 +1,67 @@
+"""End-to-end calibration throughput: ExperimentRunner -> Optimizer -> SwmmModel.run -> ObjectiveFunction
+
+Usage: python benchmarks/benchmark_pipeline.py [--repetitions N] [--backend subprocess|fake] [--parallel seq|pool]
+       [--processes N] [--output results.json] [--baseline results.json]
+Runs a short SCE-UA calibration of the example model with the stand-in SWMM engine (stub_swmm.py),
+then reports model runs per second and the cost of each stage of a model run.
+"""
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+
+from common import BenchmarkSettings, report
+
+from swmm_calibration.classes import experiment_runner
+
+
+class PipelineSettings(BenchmarkSettings):
+    # module level so that the experiment runner can pickle it
+    simulation_cache = None
+    instrumentation = True
+
+
+def main(argv):
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repetitions', type=int, default=200)
+    parser.add_argument('--backend', default='subprocess', help="'subprocess' runs stub_swmm.py, 'fake' in-process")
+    parser.add_argument('--parallel', default='seq')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--output', help='save results to this json file')
+    parser.add_argument('--baseline', help='compare with results saved earlier')
+    args = parser.parse_args(argv[1:])
+
+    PipelineSettings.swmm_backend = args.backend
+    PipelineSettings.parallel = args.parallel
+    PipelineSettings.processes = args.processes
+
+    directory = tempfile.mkdtemp()
+    try:
+        runner = experiment_runner.ExperimentRunner(
+            data_directory=directory, output_file=directory + '/experiments.csv', settings=PipelineSettings,
+            experiment_metadata={}, experiment_name='benchmark', evaluation_count=5)
+        started = time.perf_counter()
+        runner.calibrator.run(repetitions=args.repetitions, kstop=100, ngs=5)
+        elapsed = time.perf_counter() - started
+        like = runner.calibrator.iterations()['like1']
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    # a calibration whose runs all give the same objective function value does not exercise the sampler
+    if like.nunique() < 2:
+        print('## the objective function is {} for every run, check the events of the settings'.format(like.iloc[0]))
+        return 1
+
+    summary = runner.instrumentation.summary().set_index('stage')
+    runs = summary.loc['model_run', 'count']
+    print('{} model runs in {:.1f} s: {:.1f} runs/s'.format(runs, elapsed, runs / elapsed))
+    results = {'pipeline.seconds_per_run': elapsed / runs}
+    for stage, row in summary.iterrows():
+        results['stage.' + stage] = row['mean_ms'] / 1000
+    regressions = report(results, args.output, args.baseline)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
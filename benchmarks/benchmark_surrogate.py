@@ -0,0 +1,61 @@
+"""Compares the best objective function value found by SCE-UA and the surrogate sampler for a number of model runs
+
+Usage: python benchmarks/benchmark_surrogate.py [seeds]
+The model is a cheap 7 parameter test function (a shifted, scaled Rosenbrock function), as many as the example
+calibration parameters, so that the number of runs is what matters.
+"""
+import contextlib
+import io
+import sys
+
+import numpy as np
+import spotpy
+
+from swmm_calibration.classes.surrogate_sampler import SurrogateSampler
+
+DIMENSIONS = 7
+
+
+class TestFunctionSetup(object):
+    def __init__(self):
+        self.params = [spotpy.parameter.Uniform('x{}'.format(i), 0, 1) for i in range(DIMENSIONS)]
+
+    def parameters(self):
+        return spotpy.parameter.generate(self.params)
+
+    def simulation(self, vector):
+        x = 3 * np.array(vector) - 1.5
+        return [np.sum(100 * (x[1:] - x[:-1] ** 2) ** 2 + (1 - x[:-1]) ** 2)]
+
+    def evaluation(self):
+        return [0]
+
+    def objectivefunction(self, simulation, evaluation):
+        return simulation[0]
+
+
+def best_value(algorithm, repetitions, seed, **kwargs):
+    np.random.seed(seed)
+    sampler = algorithm(TestFunctionSetup(), dbname='benchmark_surrogate', dbformat='ram', save_sim=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        sampler.sample(repetitions, **kwargs)
+    data = sampler.getdata()
+    return data['like1'].min(), len(data)
+
+
+def main(argv):
+    seeds = int(argv[1]) if len(argv) > 1 else 3
+    runs = [(spotpy.algorithms.sceua, 1000, {'ngs': 5, 'kstop': 5, 'pcento': 0.01}),
+            (spotpy.algorithms.sceua, 5000, {'ngs': 5, 'kstop': 5, 'pcento': 0.01}),
+            (SurrogateSampler, 200, {}),
+            (SurrogateSampler, 400, {})]
+    print('{:<20} {:>12} {:>12} {:>14}'.format('algorithm', 'repetitions', 'model runs', 'best (median)'))
+    for algorithm, repetitions, kwargs in runs:
+        results = [best_value(algorithm, repetitions, seed, **kwargs) for seed in range(seeds)]
+        print('{:<20} {:>12} {:>12.0f} {:>14.4g}'.format(algorithm.__name__, repetitions,
+                                                        np.median([n for _, n in results]),
+                                                        np.median([v for v, _ in results])))
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,71 @@
+"""Timing, settings and reporting shared by the benchmarks"""
+import os
+import sys
+import copy
+import json
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE = os.path.join(ROOT, 'example')
+sys.path.insert(0, ROOT)
+
+from example.settings import Settings  # noqa: E402
+
+STUB_SWMM = [sys.executable, os.path.join(ROOT, 'benchmarks', 'stub_swmm.py')]
+# observation files shipped with the example, used in place of the sensor data
+OBSERVATION_FILES = {
+    's3': 'data/l5f16res_finetuned_FloodXCam1__FloodXCam1__signal.csv',
+    's5': 'data/l5f16res_augmented__FloodXCam5__signal.csv',
+    's6': 'data/l5f16res_finetuned_FloodXCam5__FloodXCam5__signal.csv',
+}
+
+
+class BenchmarkSettings(Settings):
+    """Example settings that run the stand-in SWMM engine on the data shipped with the example"""
+    swmm_executable = STUB_SWMM
+    swmm_backend = 'subprocess'
+    swmm_model_template = os.path.join(EXAMPLE, Settings.swmm_model_template)
+    forcing_data_file = os.path.join(EXAMPLE, Settings.forcing_data_file)
+    # periods with inflow that are covered by the observation files, so that the parameters change the results
+    calibration_event = dict(Settings.calibration_event, start_dt='2016/10/07 12:45:00', end_dt='2016/10/07 13:00:00')
+    validation_events = [dict(Settings.validation_events[0], start_dt='2016/10/07 13:15:00',
+                              end_dt='2016/10/07 13:30:00')]
+    obs_available = copy.deepcopy(Settings.obs_available)
+    for obs in obs_available.values():
+        obs['data_file'] = os.path.join(EXAMPLE, OBSERVATION_FILES[obs['location']])
+        obs['scale_factor'] = 1
+    del obs
+
+
+def best_time(function, number=10, repeat=3):
+    """Seconds per call, best of repeat"""
+    return min(timeit.repeat(function, number=number, repeat=repeat)) / number
+
+
+def report(results, output=None, baseline=None, tolerance=0.2):
+    """
+    Prints results and compares them with a baseline
+    :param results: dictionary of benchmark name and seconds
+    :param output: json file to save the results to
+    :param baseline: json file of earlier results. Benchmarks slower by more than the tolerance are reported
+    :param tolerance: allowed relative slowdown
+    :return: names of the benchmarks that regressed
+    """
+    previous = {}
+    if baseline is not None:
+        with open(baseline) as f:
+            previous = json.load(f)
+    regressions = []
+    for name, seconds in results.items():
+        line = '{:<45} {:12.3f} ms'.format(name, seconds * 1000)
+        if name in previous:
+            change = seconds / previous[name] - 1
+            line += '  {:+7.1%}'.format(change)
+            if change > tolerance:
+                line += '  REGRESSION'
+                regressions.append(name)
+        print(line)
+    if output is not None:
+        with open(output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return regressions
@@ -0,0 +1,48 @@
+"""Deterministic stand-in for the SWMM executable
+
+Usage: python benchmarks/stub_swmm.py model.inp report.rpt output.out
+Reads the simulation period, reporting step, forcing and objects of the input file and writes a valid
+SWMM binary output file with results of FakeBackend for every node variable, so that the SWMM
+executable can be replaced for benchmarks on machines without SWMM. Use it as swmm_executable:
+[sys.executable, 'benchmarks/stub_swmm.py'].
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from swmm_calibration.classes import swmm_output  # noqa: E402
+from swmm_calibration.classes.simulation_backend import FakeBackend, read_inp_sections  # noqa: E402
+
+NODE_SECTIONS = ['JUNCTIONS', 'OUTFALLS', 'DIVIDERS', 'STORAGE']
+LINK_SECTIONS = ['CONDUITS', 'PUMPS', 'ORIFICES', 'WEIRS', 'OUTLETS']
+
+
+def object_names(sections, section_names):
+    return [row[0] for name in section_names for row in sections.get(name, [])]
+
+
+def main(argv):
+    if len(argv) != 4:
+        print(__doc__)
+        return 1
+    model_file, report_file, output_file = argv[1:]
+    sections = read_inp_sections(model_file)
+    nodes = object_names(sections, NODE_SECTIONS)
+    variables = swmm_output.VARIABLES[1]
+
+    index, values = FakeBackend().results(model_file, ['node_{}_{}'.format(node, variable)
+                                                       for node in nodes for variable in variables])
+    # the first report is one reporting step after the start
+    step = index.freq.delta
+    swmm_output.write_output(output_file, index[0] - step, int(step.total_seconds()), nodes,
+                             values.reshape(len(index), len(nodes), len(variables)),
+                             subcatchment_names=object_names(sections, ['SUBCATCHMENTS']),
+                             link_names=object_names(sections, LINK_SECTIONS))
+    with open(report_file, 'w') as f:
+        f.write('Stand-in for SWMM: {} nodes, {} periods\n'.format(len(nodes), len(index)))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv))
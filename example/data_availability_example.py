@@ -1,12 +1,9 @@
 # set the working directory to the location of this file
 # os.chdir('C:/coding/swmm_calibration/example')
 
-import copy
-from datetime import datetime
-
 from example import settings
 
-from swmm_calibration.classes import experiment_runner
+from swmm_calibration.classes.scenario_scheduler import ScenarioScheduler
 
 scenarios = [
 
@@ -28,13 +25,16 @@ scenarios = [
     }
 ]
 
-for scenario in scenarios:
-    s = copy.deepcopy(settings.Settings)
-    # get temporary directory for saving working files. By default define a new one
-    nowstring = datetime.strftime(datetime.now(), '%Y%m%d_%H.%M')
-    temp_folder = 'results/availability/' + scenario['name']
-    s.calibration_algorithm = 'sceua'
-    s.observations_configuration = list(s.obs_available[i] for i in scenario['selection'])
-    exp = experiment_runner.ExperimentRunner(data_directory=temp_folder, output_file='results/experiments.csv',
-                                             settings=s)
-    exp.run(print_final=True, repetitions=5000, kstop=5, ngs=5, pcento=0.5)
+if __name__ == '__main__':
+    # the scenarios run concurrently and share the parsed data. Running the script again skips finished scenarios
+    # and resumes stopped calibrations
+    scheduler = ScenarioScheduler(
+        settings.Settings,
+        [{'name': scenario['name'],
+          'settings': {'calibration_algorithm': 'sceua',
+                       'observations_configuration': list(settings.Settings.obs_available[i]
+                                                          for i in scenario['selection'])},
+          'run': {'repetitions': 5000, 'kstop': 5, 'ngs': 5, 'pcento': 0.5}}
+         for scenario in scenarios],
+        directory='results/availability', output_file='results/experiments.csv')
+    scheduler.run()
@@ -0,0 +1,16 @@
+from datetime import datetime
+from example import settings
+
+from swmm_calibration.classes import experiment_runner
+
+s = settings.Settings
+
+if __name__ == '__main__':
+    nowstring = datetime.strftime(datetime.now(), '%Y%m%d_%H.%M')
+    temp_folder = 'results/test/sensitivity/' + nowstring
+    exp = experiment_runner.ExperimentRunner(data_directory=temp_folder, output_file='results/experiments.csv',
+                                             settings=s, experiment_metadata={'screening': 'morris'},
+                                             experiment_name='sensitivity')
+    # screen the parameters with 20 Morris trajectories, then calibrate only those the objectives depend on
+    exp.analyse_sensitivity(method='morris', count=20, freeze=True)
+    exp.run(repetitions=5000, kstop=5, ngs=5, pcento=0.5)
@@ -1,6 +1,31 @@
 class Settings(object):
     swmm_executable = "C:/Program Files (x86)/EPA SWMM 5.1/swmm5.exe"
+    swmm_backend = 'subprocess'  # 'subprocess' (swmm_executable), 'library' (swmm_library, in-process) or 'fake'
+    swmm_library = None  # path to the SWMM 5.2 shared library, searched on the system path if None
+    # reuse results of identical simulations (see SimulationCache), None to always simulate. e.g.
+    # {'max_items': 1000, 'directory': None, 'max_disk_mb': 500, 'quantize': None}: results kept in memory, where
+    # results are also kept on disk (None for memory only) and the size limit of the disk cache. 'quantize' rounds
+    # parameter values to steps of this fraction of their bounds before simulating, e.g. 0.01. The iterations record
+    # the parameters proposed by the sampler, which differ from the simulated ones
+    simulation_cache = None
+    # stop runs that take much longer than usual and penalize failed runs (see RunWatchdog), None to let them fail.
+    # e.g. {'timeout_factor': 10, 'min_timeout': 10, 'max_timeout': 3600, 'penalty': -10000, 'max_failures': 1}:
+    # runs are stopped after timeout_factor times the median run time, within min_timeout and max_timeout seconds
+    # (max_timeout is also used for the first runs), failed runs return the observations multiplied by penalty, and
+    # parameter sets are rejected without running SWMM after max_failures failures
+    run_watchdog = None
+    # start runs from a SWMM hotstart file saved after the first spinup_sec of the event. The spin-up is simulated once
+    # for all parameter sets with the same values of the listed parameters, None to simulate each run from the start.
+    # With 'check', a run from the hotstart file is compared with a cold start when the experiment is created, which
+    # stops with an error if they differ by more than 'tolerance' (see ExperimentRunner.check_hotstart). e.g.
+    # {'spinup_sec': 120, 'parameters': ['c_m1', 'c_m3'], 'max_files': 100, 'tolerance': 0.001, 'check': True}
+    hotstart = None
+    data_cache = True  # keep parsed data files in binary files next to them (FILE.HASH.npz)
+    # keep the observations and forcing of the models in memory-mapped files (shared_data/ in the experiment
+    # directory), which worker processes map instead of holding their own copies
+    shared_data = False
     swmm_model_template = 'swmm_model_template.inp'
+    template_float_format = '{:.6g}'  # format of the parameter values in the model input, None for all digits
     calibration_event = {
         'name': '21',
         'start_dt': '2016/10/06 14:56:00',  # start every 5 sec. (00:00:03 is bad). Format is important
@@ -30,9 +55,37 @@ class Settings(object):
             }
         }
     ]
+    # events calibrated jointly, e.g. [calibration_event, dict(validation_events[0], weight=0.5)]. Each event can have
+    # a weight in the objective function (default 1). None to calibrate on calibration_event only
+    calibration_events = None
+    # processes running the events of a parameter set at once, defaults to the number of events. With parallel = 'pool',
+    # each worker of the pool starts its own: processes * event_processes in total
+    event_processes = None
     sim_reporting_step_sec = 5  # in seconds
     forcing_data_file = 'data/all_p1_q_mid_endress_logi.txt'
-    calibration_algorithm = 'sceua'
+    calibration_algorithm = 'sceua'  # a spotpy algorithm, or 'surrogate' to screen parameter sets on an RBF surrogate
+    # or 'async_de' for differential evolution that keeps every worker busy (best with parallel = 'pool')
+    parallel = 'seq'  # 'seq' runs models one after the other, 'pool' runs them on a process pool,
+    # 'distributed' sends them to workers started with swmm_calibration/scripts/distributed_worker.py
+    processes = None  # size of the process pool, defaults to the number of cores, or number of distributed workers
+    # where the workers connect with parallel = 'distributed'. Use the host name of this machine for other machines,
+    # which requires a secret 'authkey' (or the environment variable SWMM_CALIBRATION_AUTHKEY): workers run what they
+    # receive. Without a key, a random one is printed at the start, which only works on localhost
+    distributed = {'address': ('localhost', 6000), 'heartbeat_timeout': 30}
+    iterations_format = 'csv'  # 'csv' (iterations.csv) or 'sqlite' (iterations.db, indexed by cost)
+    # log the runs of the calibration (checkpoint.pickle, checkpoint_runs.jsonl), so that a stopped experiment
+    # continues where it stopped with ExperimentRunner.resume. Not with calibration_algorithm = 'async_de' on several
+    # processes, whose parameter sets depend on the order in which runs complete
+    checkpoint = False
+    instrumentation = False  # time the stages of model runs, written to instrumentation.csv/.json
+    # 'inline' draws plots in the calibration process, 'background' in a separate process, 'data' only saves the
+    # data of the plots, which are drawn later with swmm_calibration/scripts/render_plots.py
+    plot_mode = 'inline'
+    compiled_objective = False  # evaluate objective functions on pre-aligned arrays instead of data frames
+    # calibration parameters held at a value instead of being calibrated, e.g. {'c_w1': 5}. Parameters found
+    # insensitive by ExperimentRunner.analyse_sensitivity(freeze=True) are fixed at their 'nominal' value if it is
+    # given below, otherwise at the middle of their bounds
+    fixed_parameters = None
     calibration_parameters = {
         's_r': {
             "display_name": 'Surface roughness',
@@ -0,0 +1,125 @@
+import time
+from collections import deque
+
+import numpy as np
+from spotpy.algorithms import _algorithm
+
+
+class AsyncSampler(_algorithm):
+    """Asynchronous steady-state differential evolution (DE/current-to-best/1/bin), minimizing as SCE-UA"""
+
+    def __init__(self, *args, **kwargs):
+        super(AsyncSampler, self).__init__(*args, **kwargs)
+        # results of jobs run by a sequential repeater
+        self.pending = deque()
+        self.utilisation = None
+
+    def submit(self, job):
+        if hasattr(self.repeat, 'submit'):
+            self.repeat.submit(job)
+        else:
+            # without a process pool, the job is run at once
+            self.pending.extend(self.repeat([job]))
+
+    def next_completed(self):
+        if hasattr(self.repeat, 'submit'):
+            return self.repeat.next_completed()
+        return self.pending.popleft()
+
+    def trial(self, population, values, target, mutation, crossover):
+        """
+        Trial parameter set for a population member, scaled to [0, 1]
+        :param population: array (members x parameters) of the evaluated members
+        :param values: objective function value of each member
+        :param target: index of the member the trial is compared with
+        :param mutation: (lower, upper) limit of the mutation factor, drawn per trial
+        :param crossover: probability that a parameter is taken from the mutant
+        """
+        size, dimensions = population.shape
+        others = [i for i in range(size) if i != target]
+        b, c = population[np.random.choice(others, 2, replace=False)]
+        factor = np.random.uniform(*mutation)
+        # moves towards the best member, with a random difference of two others
+        target_point = population[target]
+        mutant = target_point + factor * (population[np.argmin(values)] - target_point) + factor * (b - c)
+        # at least one parameter is taken from the mutant
+        crossed = np.random.rand(dimensions) < crossover
+        crossed[np.random.randint(dimensions)] = True
+        point = np.where(crossed, mutant, target_point)
+        # reflect at the bounds
+        point = np.abs(point)
+        return np.where(point > 1, 2 - point, point).clip(0, 1)
+
+    def sample(self, repetitions, population_size=None, in_flight=None, mutation=(0.5, 1.0), crossover=0.9,
+               **ignored):
+        """
+        :param repetitions: number of model runs
+        :param population_size: number of members of the population. Defaults to 5 per parameter, at least 10
+        :param in_flight: number of parameter sets simulated at the same time. Defaults to the number of worker
+        processes
+        :param mutation: (lower, upper) limit of the mutation factor, drawn per trial
+        :param crossover: probability that a parameter of the trial is taken from the mutant
+        :param ignored: options of other algorithms (e.g. kstop, ngs of SCE-UA), not used
+        """
+        self.set_repetiton(repetitions)
+        if ignored:
+            print('## options not used by the asynchronous sampler: {}'.format(', '.join(sorted(ignored))))
+        lower = np.array(self.parameter()['minbound'], dtype=np.float64)
+        upper = np.array(self.parameter()['maxbound'], dtype=np.float64)
+        dimensions = len(lower)
+        population_size = population_size or max(5 * dimensions, 10)
+        workers = getattr(self.repeat, 'size', 1)
+        in_flight = in_flight or workers
+        print('Starting the asynchronous sampler with {} repetitions...'.format(repetitions))
+
+        # the initial population is a latin hypercube design, started as workers become free
+        design = (np.random.rand(population_size, dimensions) + np.arange(population_size).reshape(-1, 1)) \
+            / population_size
+        for column in design.T:
+            np.random.shuffle(column)
+        population = np.empty((population_size, dimensions))
+        values = np.full(population_size, np.inf)
+        members = 0
+
+        # submitted jobs: run number -> (scaled parameters, index of the target member or None, start time)
+        jobs = {}
+        submitted = completed = trials = 0
+        busy = 0.
+        start_time = time.time()
+        while completed < repetitions:
+            while submitted < repetitions and submitted - completed < in_flight:
+                if submitted < population_size:
+                    point, target = design[submitted], None
+                elif members < 3:
+                    # too few members for a trial while many initial runs are in flight
+                    point, target = np.random.rand(dimensions), None
+                else:
+                    target = trials % members
+                    point = self.trial(population[:members], values[:members], target, mutation, crossover)
+                    trials += 1
+                jobs[submitted] = (point, target, time.time())
+                self.submit((submitted, lower + point * (upper - lower)))
+                submitted += 1
+
+            rep, randompar, simulations = self.next_completed()
+            point, target, started = jobs.pop(rep)
+            busy += time.time() - started
+            like = self.postprocessing(completed, randompar, simulations, chains=0 if target is None else 1)
+            completed += 1
+            value = like if like is not None and np.isfinite(like) else np.inf
+
+            if target is None and members < population_size:
+                population[members], values[members] = point, value
+                members += 1
+            else:
+                # the member may have been replaced since the trial was started, it competes with the current one
+                if target is None:
+                    target = int(np.argmax(values))
+                if value <= values[target]:
+                    population[target], values[target] = point, value
+
+        # time from submission to completion, which includes waiting for a worker if more jobs than workers
+        # are in flight
+        self.utilisation = min(busy / max((time.time() - start_time) * workers, 1e-9), 1.)
+        print('Worker utilisation: {:.0%}'.format(self.utilisation))
+        self.final_call()
@@ -0,0 +1,24 @@
+import os
+import tempfile
+import contextlib
+
+
+@contextlib.contextmanager
+def atomic_write(filename, mode='wb', **kwargs):
+    """
+    Opens a temporary file that replaces filename once it is written, so that other processes never read a
+    partial file and a failed write leaves the previous one. The temporary file is removed on failure
+    :param mode: 'wb' or 'w'
+    :param kwargs: passed to open, e.g. newline=''
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)), suffix='.tmp')
+    try:
+        with os.fdopen(handle, mode, **kwargs) as f:
+            yield f
+        os.replace(temp_path, filename)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
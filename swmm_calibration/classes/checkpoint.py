@@ -0,0 +1,114 @@
+import os
+import json
+import pickle
+
+from .atomic_file import atomic_write
+
+
+class RunLog(object):
+    """Objective function values of the model runs of a calibration, in a JSON lines file shared by processes"""
+
+    def __init__(self, filename):
+        """
+        :param filename: where runs are logged. None to keep them in memory until they are collected, as in
+        remote workers, which send them to the coordinator
+        """
+        self.filename = filename
+        self.records = []
+
+    def clear(self):
+        open(self.filename, 'w').close()
+
+    def record(self, params, like):
+        """
+        Logs a run
+        :param params: parameter vector of the run
+        :param like: objective function value of the run
+        """
+        if self.filename is None:
+            self.records.append(([float(p) for p in params], float(like)))
+            return
+        line = json.dumps({'params': [float(p) for p in params], 'like': float(like)})
+        with open(self.filename, 'a') as f:
+            f.write(line + '\n')
+
+    def collect(self):
+        """Returns the runs kept in memory since the last collect and starts over"""
+        records, self.records = self.records, []
+        return records
+
+    def read(self):
+        """Returns a dictionary of the objective function values of the logged runs, by parameter tuple"""
+        runs = {}
+        if not os.path.isfile(self.filename):
+            return runs
+        with open(self.filename, 'rb') as f:
+            content = f.read()
+        # the last line is incomplete if a process was stopped while writing it
+        for line in content[:content.rfind(b'\n') + 1].decode().splitlines():
+            try:
+                run = json.loads(line)
+                runs[tuple(run['params'])] = run['like']
+            except (ValueError, KeyError):
+                continue
+        return runs
+
+
+class Checkpoint(object):
+    """Where an experiment is resumed after it was stopped"""
+
+    def __init__(self, directory):
+        """
+        :param directory: directory of the experiment, the checkpoint is kept in checkpoint.pickle and
+        checkpoint_runs.jsonl
+        """
+        self.filename = os.path.join(directory, 'checkpoint.pickle')
+        # resuming replays the sampler from the saved random state, taking logged runs from the log
+        self.runs = RunLog(os.path.join(directory, 'checkpoint_runs.jsonl'))
+        self.state = None
+
+    def load(self):
+        """Loads the checkpoint, returns whether there is one"""
+        if not os.path.isfile(self.filename):
+            return False
+        with open(self.filename, 'rb') as f:
+            self.state = pickle.load(f)
+        return True
+
+    def save(self):
+        # replaced at once, so that a crash while saving leaves the previous checkpoint
+        with atomic_write(self.filename) as f:
+            pickle.dump(self.state, f)
+
+    def start(self, random_state, algorithm, parameters, repetitions, kwargs, workers=1):
+        """
+        Starts the checkpoint of a calibration, the runs of an earlier one are discarded
+        :param random_state: state of the numpy random number generator (np.random.get_state())
+        :param algorithm: name of the optimization algorithm
+        :param parameters: calibration parameters, with their ranges
+        :param repetitions: number of repetitions of the sampler
+        :param kwargs: keyword arguments of the sampler
+        :param workers: number of processes running the models, on which the batches of some samplers depend
+        """
+        self.state = {'random_state': random_state, 'algorithm': algorithm, 'parameters': parameters,
+                      'repetitions': repetitions, 'kwargs': kwargs, 'workers': workers, 'stages': []}
+        self.runs.clear()
+        self.save()
+
+    def check(self, algorithm, parameters, workers=1):
+        """
+        Raises a ValueError if the checkpoint was made with another algorithm, other calibration parameters or
+        another number of worker processes
+        """
+        if self.state['algorithm'] != algorithm or self.state['parameters'] != parameters or \
+                self.state.get('workers', workers) != workers:
+            raise ValueError('The checkpoint in {} was made with other calibration settings, '
+                             'it cannot be resumed'.format(self.filename))
+
+    def is_complete(self, stage):
+        return self.state is not None and stage in self.state['stages']
+
+    def complete(self, stage):
+        """Records that a stage of the experiment is complete"""
+        self.state['stages'].append(stage)
+        self.save()
@@ -0,0 +1,375 @@
+import os
+import glob
+import hashlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+from .atomic_file import atomic_write
+
+
+# FloodX rows start with a day first timestamp at fixed positions, e.g. '06/10/2016 12:14:25;' or '07.10.2016 12:45:00;'
+TIMESTAMP_DIGITS = [0, 1, 3, 4, 6, 7, 8, 9, 11, 12, 14, 15, 17, 18]
+TIMESTAMP_SEPARATORS = {2: b'./-', 5: b'./-', 10: b' ', 13: b':', 16: b':', 19: b';'}
+TIMESTAMP_LENGTH = 20
+# digits of TIMESTAMP_DIGITS from the year to the second
+TIMESTAMP_KEY_ORDER = [4, 5, 6, 7, 2, 3, 0, 1, 8, 9, 10, 11, 12, 13]
+# part of the name of binary caches, so that data parsed by an earlier parser is parsed again
+PARSER_VERSION = 3
+
+
+def read_floodx_file(evaluation_data_file):
+    return pd.read_csv(
+        filepath_or_buffer=evaluation_data_file,
+        index_col=0,
+        parse_dates=[0],
+        infer_datetime_format=True,
+        dayfirst=True,
+        sep=';')
+
+
+def period_seconds(period):
+    """Length of a pandas frequency (e.g. '5S') in whole seconds, None if it is not one"""
+    seconds = pd.tseries.frequencies.to_offset(period).nanos / 1e9
+    return int(seconds) if seconds >= 1 and seconds == int(seconds) else None
+
+
+def timestamp_key(seconds):
+    """Key of a time in seconds since 1970 as parse_floodx computes them, the digits of YYYYMMDDhhmmss read as hex"""
+    return int(pd.Timestamp(seconds, unit='s').strftime('%Y%m%d%H%M%S'), 16)
+
+
+def key_seconds(key):
+    """Time in seconds since 1970 of a key of timestamp_key, ValueError if it is not a valid time"""
+    time = datetime.strptime('{:014x}'.format(int(key)), '%Y%m%d%H%M%S')
+    return int((time - datetime(1970, 1, 1)).total_seconds())
+
+
+def window_rows(keys, filled, start=None, end=None, period=None, encode=int, decode=int):
+    """
+    Positions of the rows that are needed for a window of a series (see parse_floodx)
+    :param keys: key of the time of each row, which sort as the times
+    :param filled: whether each row has a value
+    :param start, end, period: window, see parse_floodx
+    :param encode: key of a time in seconds since 1970, by default the seconds are the keys
+    :param decode: time in seconds since 1970 of a key
+    """
+    step = period_seconds(period) if period is not None else None
+    if len(keys) == 0 or (period is not None and (step is None or 86400 % step != 0)):
+        # bins are not aligned with days, the whole file is needed
+        return np.arange(len(keys))
+    first = pd.Timestamp(start).value // 10 ** 9 if start is not None else decode(keys.min())
+    last = pd.Timestamp(end).value // 10 ** 9 if end is not None else decode(keys.max())
+    if step is not None:
+        # whole bins, and the bins interpolated from, which are the nearest ones with a value
+        first, last = first // step * step, last // step * step + step - 1
+        before, after = filled & (keys < encode(first)), filled & (keys > encode(last))
+        if before.any():
+            first = decode(keys[before].max()) // step * step
+        if after.any():
+            last = decode(keys[after].min()) // step * step + step - 1
+    return np.flatnonzero((keys >= encode(first)) & (keys <= encode(last)))
+
+
+def parse_floodx(content, start=None, end=None, period=None):
+    """
+    Parses the content of a FloodX data file (header, then rows of day first timestamp;value) with vectorized
+    fixed-position decoding, only the timestamps and values of the rows in the window are decoded
+    :param content: bytes of the file
+    :param start: datetime (or string) of the first row that is needed, None for all rows from the first one
+    :param end: datetime of the last row that is needed, None for all rows up to the last one
+    :param period: resampling period (pandas frequency) for which the window is read: the window is extended to
+    whole resampling bins, and to the nearest bins with values on either side, so that resample_interpolate
+    gives the values of the whole file within the window
+    :return: data frame as read_floodx_file (with float values), None if the content is not in this format
+    """
+    buffer = np.frombuffer(content, dtype=np.uint8)
+    line_ends = np.flatnonzero(buffer == ord('\n'))
+    if len(buffer) and buffer[-1] != ord('\n'):
+        line_ends = np.append(line_ends, len(buffer))
+    if len(line_ends) == 0:
+        return None
+    header = content[:line_ends[0]].decode('utf-8', 'replace').strip().split(';')
+    if len(header) != 2:
+        return None
+    starts, ends = line_ends[:-1] + 1, line_ends[1:]
+    # windows line ends and blank lines
+    ends = ends - ((ends > starts) & (buffer[np.maximum(ends - 1, 0)] == ord('\r')))
+    starts, ends = starts[ends > starts], ends[ends > starts]
+    if np.any(ends - starts < TIMESTAMP_LENGTH):
+        return None
+    for offset, allowed in TIMESTAMP_SEPARATORS.items():
+        if not np.isin(buffer[starts + offset], np.frombuffer(allowed, dtype=np.uint8)).all():
+            return None
+    digits = [buffer[starts + offset].astype(np.int64) - ord('0') for offset in TIMESTAMP_DIGITS]
+    if any(np.any((d < 0) | (d > 9)) for d in digits):
+        return None
+
+    if start is not None or end is not None:
+        # the window is found on the digits of the timestamps, in the order YYYYMMDDhhmmss one per 4 bits, which
+        # sort as the times they stand for. Only the timestamps of the window are decoded
+        keys = np.zeros(len(starts), dtype=np.int64)
+        for i in TIMESTAMP_KEY_ORDER:
+            keys = (keys << 4) | digits[i]
+        try:
+            selected = window_rows(keys, ends - starts > TIMESTAMP_LENGTH, start, end, period, encode=timestamp_key,
+                                   decode=key_seconds)
+        except ValueError:
+            return None
+        starts, ends = starts[selected], ends[selected]
+        digits = [d[selected] for d in digits]
+
+    day, month, year, hour, minute, second = [
+        digits[i] * 10 + digits[i + 1] for i in range(0, 4, 2)] + [
+        digits[4] * 1000 + digits[5] * 100 + digits[6] * 10 + digits[7]] + [
+        digits[i] * 10 + digits[i + 1] for i in range(8, 14, 2)]
+    if np.any((month < 1) | (month > 12) | (day < 1) | (day > 31) | (hour > 23) | (minute > 59) | (second > 59)):
+        return None
+    months = ((year - 1970) * 12 + month - 1).astype('datetime64[M]')
+    dates = months.astype('datetime64[D]') + (day - 1)
+    # days beyond the end of the month, e.g. 31.02.2016
+    if np.any(dates.astype('datetime64[M]') != months):
+        return None
+    days = dates.astype(np.int64)
+    seconds = days * 86400 + hour * 3600 + minute * 60 + second
+
+    # values are gathered into fixed width byte strings and converted at once, empty values are missing
+    value_starts, value_ends = starts + TIMESTAMP_LENGTH, ends
+    width = int((value_ends - value_starts).max()) if len(value_starts) else 1
+    positions = value_starts[:, None] + np.arange(max(width, 1))
+    text = np.where(positions < value_ends[:, None], buffer[np.minimum(positions, len(buffer) - 1)], 0)
+    text = np.ascontiguousarray(text, dtype=np.uint8).view('S{}'.format(max(width, 1))).ravel()
+    text[value_ends == value_starts] = b'nan'
+    try:
+        values = text.astype(np.float64)
+    except ValueError:
+        return None
+    index = pd.DatetimeIndex(seconds.astype('datetime64[s]').astype('datetime64[ns]'), name=header[0])
+    return pd.DataFrame({header[1]: values}, index=index)
+
+
+def read_floodx(filename, start=None, end=None, period=None):
+    """
+    Reads a FloodX data file as read_floodx_file, with the fast parser of parse_floodx. Files in other formats
+    are read with read_floodx_file, then with all their rows
+    :param start, end, period: window of the rows that are needed, see parse_floodx
+    """
+    with open(filename, 'rb') as f:
+        data = parse_floodx(f.read(), start=start, end=end, period=period)
+    if data is None:
+        data = read_floodx_file(filename)
+    return data
+
+
+def kahan_means(labels, values, count):
+    # means of the values per label (sorted labels), summed as pandas does, with compensation and without NaN
+    sums, compensation, observations = np.zeros(count), np.zeros(count), np.zeros(count, dtype=np.int64)
+    if len(labels):
+        group_starts = np.flatnonzero(np.r_[True, labels[1:] != labels[:-1]])
+        sizes = np.diff(np.r_[group_starts, len(labels)])
+        position = np.arange(len(labels)) - np.repeat(group_starts, sizes)
+        # the k-th value of every bin is added at once
+        order = np.argsort(position, kind='stable')
+        bounds = np.r_[0, np.cumsum(np.bincount(position))]
+        for k in range(len(bounds) - 1):
+            rows = order[bounds[k]:bounds[k + 1]]
+            value, label = values[rows], labels[rows]
+            valid = ~np.isnan(value)
+            value, label = value[valid], label[valid]
+            y = value - compensation[label]
+            t = sums[label] + y
+            compensation[label] = t - sums[label] - y
+            sums[label] = t
+            observations[label] += 1
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(observations > 0, sums / np.maximum(observations, 1), np.nan)
+
+
+def resample_interpolate(data, period, start=None, end=None):
+    """
+    data.resample(period).mean().interpolate(method='linear'), in one pass
+    :param data: data frame with a DatetimeIndex and numeric columns
+    :param period: pandas frequency, e.g. '5S'
+    :param start, end: only return the periods from start to end, e.g. of data read with a window (see
+    parse_floodx)
+    """
+    step = pd.tseries.frequencies.to_offset(period).nanos
+    if len(data) == 0:
+        return data.resample(period).mean()
+    times = data.index.values.astype('datetime64[ns]').astype(np.int64)
+    if np.any(times[1:] < times[:-1]):
+        order = np.argsort(times, kind='stable')
+        times, data = times[order], data.iloc[order]
+    # periods start at midnight of the first day, as with pandas' default origin
+    origin = times[0] - times[0] % (86400 * 10 ** 9)
+    offset = (times[0] - origin) // step
+    labels = (times - origin) // step - offset
+    count = labels[-1] + 1
+    first = 0 if start is None else min(max(-((origin - pd.Timestamp(start).value) // step) - offset, 0), count)
+    last = count - 1 if end is None else min((pd.Timestamp(end).value - origin) // step - offset, count - 1)
+    columns = {}
+    for column in data.columns:
+        means = kahan_means(labels, np.asarray(data[column].values, dtype=np.float64), count)
+        valid = np.flatnonzero(~np.isnan(means))
+        result = np.full(count, np.nan)
+        if len(valid):
+            # as pandas, by position, and periods before the first value are not filled
+            result[valid[0]:] = np.interp(np.arange(valid[0], count), valid, means[valid])
+        columns[column] = result[first:last + 1]
+    index = pd.DatetimeIndex(origin + (offset + np.arange(first, last + 1)) * step, freq=period, name=data.index.name)
+    return pd.DataFrame(columns, index=index, columns=data.columns)
+
+
+class DataStore(object):
+    """Parsed and resampled FloodX series, shared by all models of a process. Returned frames must not be modified"""
+
+    def __init__(self, persist=True):
+        """
+        :param persist: keep parsed files in binary caches next to them
+        """
+        self.persist = persist
+        self.digests = {}
+        self.data = {}
+
+    def __reduce__(self):
+        # processes that receive a model use their own store
+        return get_data_store, ()
+
+    def digest(self, filename):
+        """Hash of the content of a file, computed again only when the file changes"""
+        stat = os.stat(filename)
+        key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+        if key not in self.digests:
+            with open(filename, 'rb') as f:
+                self.digests[key] = hashlib.sha1(f.read()).hexdigest()
+        return self.digests[key]
+
+    def cache_file(self, filename, digest):
+        version = hashlib.sha1('{}.{}'.format(digest, PARSER_VERSION).encode()).hexdigest()
+        return '{}.{}.npz'.format(filename, version[:16])
+
+    def pushdown(self, digest):
+        # files are read per window, unless they have been read as a whole
+        return ('read', digest) not in self.data
+
+    def window(self, filename, digest, start, end, period):
+        """
+        Rows of a file that are needed for a window (see parse_floodx). Kept files are parsed as a whole into their
+        binary cache, which is sliced when it is loaded
+        """
+        if not self.persist:
+            return read_floodx(filename, start=start, end=end, period=period)
+        data = self.load(self.cache_file(filename, digest))
+        if data is None:
+            data = read_floodx(filename)
+            self.save(filename, digest, data)
+        seconds = data.index.values.astype('datetime64[s]').astype(np.int64)
+        return data.iloc[window_rows(seconds, data.notnull().any(axis=1).values, start, end, period)]
+
+    def read(self, filename):
+        """Same as read_floodx, with the parsed data kept in memory and on disk"""
+        digest = self.digest(filename)
+        key = ('read', digest)
+        if key not in self.data:
+            data = self.load(self.cache_file(filename, digest)) if self.persist else None
+            if data is None:
+                data = read_floodx(filename)
+                if self.persist:
+                    self.save(filename, digest, data)
+            self.data[key] = data
+        return self.data[key]
+
+    def load(self, cache_file):
+        try:
+            with np.load(cache_file, allow_pickle=False) as content:
+                return pd.DataFrame(content['values'], columns=list(content['columns']),
+                                    index=pd.DatetimeIndex(content['index'], name=str(content['index_name'])))
+        except (IOError, OSError, KeyError, ValueError):
+            return None
+
+    def save(self, filename, digest, data):
+        # only numeric tables can be stored in the binary cache
+        if not isinstance(data.index, pd.DatetimeIndex) or \
+                not all(np.issubdtype(dtype, np.floating) or np.issubdtype(dtype, np.integer) for dtype in data.dtypes):
+            return
+        cache_file = self.cache_file(filename, digest)
+        try:
+            # remove caches of earlier versions of the file
+            for old_file in glob.glob(glob.escape(filename) + '.*.npz'):
+                if old_file != cache_file:
+                    os.remove(old_file)
+            # other processes never read a partial cache
+            with atomic_write(cache_file) as f:
+                np.savez(f, values=data.values, columns=np.array(data.columns, dtype=str),
+                         index=data.index.values.astype('datetime64[ns]'), index_name=str(data.index.name))
+        except (IOError, OSError):
+            # e.g. a read-only data directory, the file is then parsed again in the next run
+            pass
+
+    def resampled(self, filename, period, scale_factor=1, start=None, end=None):
+        """
+        Scaled series of a file, resampled to a period and interpolated
+        :param filename: FloodX data file
+        :param period: pandas frequency, e.g. '5S'
+        :param scale_factor: factor applied to the values before resampling (e.g. for units)
+        :param start: datetime of the first period that is needed, None for the whole file
+        :param end: datetime of the last period that is needed, None for the whole file
+        """
+        digest = self.digest(filename)
+        window = (start, end) if (start is not None or end is not None) and self.pushdown(digest) else None
+        key = ('resampled', digest, period, scale_factor, window)
+        if key not in self.data:
+            if window is None:
+                data = self.read(filename)
+            else:
+                data = self.window(filename, digest, start, end, period)
+            if scale_factor != 1:
+                data = data.copy()
+                data['value'] = data['value'] * scale_factor
+            self.data[key] = resample_interpolate(data, period, *(window or ()))
+        data = self.data[key]
+        if window is None and (start is not None or end is not None):
+            data = data.loc[start:end]
+        return data
+
+    def forcing(self, filename, start, end):
+        """
+        Forcing data in the format of SWMM time series files (date time value), at a resolution of one second
+        :param filename: FloodX data file
+        :param start: datetime of the first value
+        :param end: datetime of the last value
+        :return: content of the time series file
+        """
+        digest = self.digest(filename)
+        window = (start, end) if self.pushdown(digest) else None
+        key = ('forcing', digest, window)
+        if key not in self.data:
+            data = self.resampled(filename, 'S', start=start, end=end) if window else self.resampled(filename, 'S')
+            # dates are formatted once per day, times are assembled from formatted numbers
+            seconds = data.index.values.astype('datetime64[s]').astype(np.int64)
+            days, day_rows = np.unique(seconds // 86400, return_inverse=True)
+            days = np.array([(datetime(1970, 1, 1) + timedelta(days=int(d))).strftime('%m/%d/%Y ') for d in days],
+                            dtype=object)
+            numbers = np.array(['{:02d}'.format(i) for i in range(60)], dtype=object)
+            time = seconds % 86400
+            values = data['value'].values
+            text = np.where(np.isnan(values), '', values.astype(str)).astype(object)
+            lines = days[day_rows] + numbers[time // 3600] + ':' + numbers[time // 60 % 60] + ':' \
+                + numbers[time % 60] + ' ' + text
+            self.data[key] = (data.index, lines)
+        index, lines = self.data[key]
+        first, last = index.searchsorted(pd.Timestamp(start)), index.searchsorted(pd.Timestamp(end), side='right')
+        if first == last:
+            return ''
+        return '\n'.join(lines[first:last]) + '\n'
+
+
+_data_store = None
+
+
+def get_data_store():
+    """Returns the data store of this process"""
+    global _data_store
+    if _data_store is None:
+        _data_store = DataStore()
+    return _data_store
@@ -0,0 +1,405 @@
+import os
+import copy
+import time
+import socket
+import queue
+import pickle
+import secrets
+import ipaddress
+import threading
+import traceback
+from collections import deque
+from multiprocessing.connection import Listener, Client, AuthenticationError
+
+import numpy as np
+from .instrumentation import get_instrumentation
+from .spotpy_setup import EvaluatedRun, attach_evaluation
+
+DEFAULT_ADDRESS = ('localhost', 6000)
+# environment variable with the key shared by the coordinator and the workers
+AUTHKEY_VARIABLE = 'SWMM_CALIBRATION_AUTHKEY'
+
+
+def _authkey(authkey):
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def get_authkey(authkey=None):
+    """The given key, else that of the environment variable AUTHKEY_VARIABLE, None if there is neither"""
+    return _authkey(authkey or os.environ.get(AUTHKEY_VARIABLE) or None)
+
+
+def is_loopback(host):
+    """Whether a host name or address only accepts connections from this machine"""
+    try:
+        return ipaddress.ip_address(socket.gethostbyname(host)).is_loopback
+    except (OSError, ValueError):
+        return False
+
+
+def _setup(process):
+    # the SpotpySwmmSetup of the sampler whose simulate method is the process
+    return getattr(process.__self__, 'setup', None)
+
+
+class RemoteWorker(object):
+    """Connection of the Broker to a worker, and the task the worker is running"""
+
+    def __init__(self, connection, name):
+        self.connection = connection
+        self.name = name
+        self.task_id = None
+        self.last_seen = time.time()
+
+
+class Broker(object):
+    """Repeater that runs spotpy jobs on workers that connect over TCP, with the interface of ForEach"""
+
+    def __init__(self, process, address=DEFAULT_ADDRESS, authkey=None, workers=None,
+                 heartbeat_interval=5, heartbeat_timeout=30):
+        """
+        :param process: function processing a job, usually the simulate method of a spotpy sampler
+        :param address: (host, port) on which workers are accepted
+        :param authkey: key shared with the workers, by default that of the environment variable AUTHKEY_VARIABLE.
+        Without a key, a random one is generated and printed, which is only allowed on a loopback address
+        :raises ValueError: if there is no key and the address accepts connections from other machines
+        :param workers: number of workers expected, used by samplers that run batches of jobs. Defaults to 1
+        :param heartbeat_interval: seconds between heartbeats of the workers
+        :param heartbeat_timeout: seconds after which a silent worker is considered lost
+        """
+        self.process = process
+        self.address = tuple(address)
+        # workers run what they receive, so the key is the only protection of the port
+        self.authkey = get_authkey(authkey)
+        if self.authkey is None:
+            if not is_loopback(self.address[0]):
+                raise ValueError('Workers on other machines need a key: set the authkey of distributed or the '
+                                 'environment variable {}'.format(AUTHKEY_VARIABLE))
+            self.authkey = secrets.token_hex(16).encode()
+            print('Key of the workers: {} (set {} to choose it)'.format(self.authkey.decode(), AUTHKEY_VARIABLE))
+        self.size = workers or 1
+        self.heartbeat_interval = heartbeat_interval
+        self.heartbeat_timeout = heartbeat_timeout
+        self.phase = None
+        self.seed = None
+        self.job_count = 0
+        self.listener = None
+        self.events = None
+        self.payload = None
+        self.workers = {}
+        self.worker_count = 0
+        # tasks that wait for a worker, and every (pickled) task that has not completed, by task id
+        self.pending = deque()
+        self.tasks = {}
+        # results of jobs in the order of __call__, and of submitted jobs in the order in which they complete
+        self.results = {}
+        self.submitted = set()
+        self.completed = deque()
+        self.in_flight = 0
+
+    def __getstate__(self):
+        # connections and threads stay with the coordinator
+        state = self.__dict__.copy()
+        for key in ['process', 'listener', 'events', 'payload']:
+            state[key] = None
+        for key in ['workers', 'tasks', 'results']:
+            state[key] = {}
+        state['pending'] = deque()
+        state['submitted'] = set()
+        state['completed'] = deque()
+        return state
+
+    def is_idle(self):
+        return False
+
+    def setphase(self, phasename):
+        self.phase = phasename
+
+    def start(self):
+        if self.seed is None:
+            # derive seeds from the sampler's random state without consuming any draws, as ForEach
+            self.seed = int(np.random.get_state()[1][0])
+        if self.payload is None:
+            # the sampler is sent without its database, which stays with the coordinator
+            sampler = copy.copy(self.process.__self__)
+            sampler.__dict__.pop('datawriter', None)
+            self.payload = pickle.dumps(('init', getattr(sampler, self.process.__name__), self.heartbeat_interval))
+        if self.listener is None:
+            self.listener = Listener(self.address, authkey=self.authkey)
+            self.events = queue.Queue()
+            threading.Thread(target=self.accept, args=(self.listener, self.events, self.payload), daemon=True).start()
+            print('Waiting for workers on {}:{}'.format(*self.address))
+
+    def terminate(self):
+        if self.listener is None:
+            return
+        for worker in list(self.workers.values()):
+            try:
+                worker.connection.send(('stop',))
+            except OSError:
+                pass
+            worker.connection.close()
+        self.workers = {}
+        self.listener.close()
+        self.listener = None
+        self.payload = None
+
+    def accept(self, listener, events, payload):
+        # runs in a thread, greets each new connection in a thread of its own
+        while True:
+            try:
+                connection = listener.accept()
+            except AuthenticationError:
+                continue
+            except OSError:
+                # the listener was closed
+                return
+            threading.Thread(target=self.greet, args=(connection, events, payload), daemon=True).start()
+
+    def greet(self, connection, events, payload):
+        # sends the sampler to a new worker and hands the worker to the coordinator once it answers with its name,
+        # so that a slow or silent worker does not hold up the others
+        try:
+            connection.send_bytes(payload)
+            if not connection.poll(self.heartbeat_timeout):
+                raise EOFError
+            name = connection.recv()
+        except (EOFError, OSError):
+            connection.close()
+            return
+        events.put(('connected', None, (connection, name)))
+
+    def read(self, worker_id, connection, events):
+        # runs in a thread per worker, hands its messages to the coordinator
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError, TypeError):
+                # TypeError: the connection was closed by the coordinator meanwhile
+                events.put(('lost', worker_id, None))
+                return
+            events.put((message[0], worker_id, message))
+
+    def tasks_of(self, jobs):
+        for job in jobs:
+            self.job_count += 1
+            task_id = self.job_count
+            # pickled now, as the pool does: jobs may refer to objects of the sampler that change later, and a
+            # task that is sent again has to be the same
+            self.tasks[task_id] = pickle.dumps(('task', task_id, self.phase, (self.seed + self.job_count) % 2 ** 32,
+                                                job))
+            self.pending.append(task_id)
+            yield task_id
+
+    def __call__(self, jobs):
+        self.start()
+        task_ids = list(self.tasks_of(jobs))
+        self.dispatch()
+        for task_id in task_ids:
+            while task_id not in self.results:
+                self.handle_event()
+            yield self.results.pop(task_id)
+
+    def submit(self, job):
+        """Starts a job without waiting for it, its result is returned by next_completed"""
+        self.start()
+        for task_id in self.tasks_of([job]):
+            self.submitted.add(task_id)
+        self.in_flight += 1
+        self.dispatch()
+
+    def next_completed(self):
+        """Waits for the next submitted job to complete and returns its result"""
+        while not self.completed:
+            self.handle_event()
+        self.in_flight -= 1
+        return self.completed.popleft()
+
+    def dispatch(self):
+        """Sends waiting tasks to idle workers"""
+        for worker_id, worker in list(self.workers.items()):
+            if not self.pending:
+                return
+            if worker.task_id is not None:
+                continue
+            task_id = self.pending.popleft()
+            try:
+                worker.connection.send_bytes(self.tasks[task_id])
+            except OSError:
+                self.pending.appendleft(task_id)
+                self.drop(worker_id, 'its connection failed')
+                continue
+            worker.task_id = task_id
+
+    def drop(self, worker_id, reason):
+        worker = self.workers.pop(worker_id, None)
+        if worker is None:
+            return
+        print('## worker {} is lost ({})'.format(worker.name, reason))
+        get_instrumentation().count('lost_workers')
+        worker.connection.close()
+        if worker.task_id is not None and worker.task_id in self.tasks:
+            # run again by the next free worker
+            get_instrumentation().count('redispatched_tasks')
+            self.pending.appendleft(worker.task_id)
+
+    def handle_event(self):
+        """Processes a message of a worker, or checks the heartbeats if there was none for a second"""
+        try:
+            kind, worker_id, content = self.events.get(timeout=1)
+        except queue.Empty:
+            kind = None
+        if kind == 'connected':
+            self.worker_count += 1
+            worker_id = self.worker_count
+            connection, name = content
+            name = '{} ({})'.format(worker_id, name)
+            self.workers[worker_id] = RemoteWorker(connection, name)
+            print('Worker {} connected'.format(name))
+            threading.Thread(target=self.read, args=(worker_id, connection, self.events), daemon=True).start()
+        elif kind == 'lost':
+            self.drop(worker_id, 'it disconnected')
+        elif kind is not None and worker_id in self.workers:
+            worker = self.workers[worker_id]
+            worker.last_seen = time.time()
+            if kind == 'result':
+                self.complete(worker, content)
+            elif kind == 'error':
+                raise RuntimeError('A job failed on worker {}:\n{}'.format(worker.name, content[2]))
+
+        now = time.time()
+        for worker_id, worker in list(self.workers.items()):
+            if now - worker.last_seen > self.heartbeat_timeout:
+                self.drop(worker_id, 'no heartbeat for {:.0f} s'.format(now - worker.last_seen))
+        self.dispatch()
+
+    def complete(self, worker, message):
+        _, task_id, result, recorded, runs = message
+        worker.task_id = None
+        if task_id not in self.tasks:
+            # completed by another worker in the meantime
+            return
+        del self.tasks[task_id]
+        get_instrumentation().merge(recorded)
+        setup = _setup(self.process)
+        if runs and setup is not None and setup.run_log is not None:
+            for params, like in runs:
+                setup.run_log.record(params, like)
+        if task_id in self.submitted:
+            self.submitted.discard(task_id)
+            self.completed.append(result)
+        else:
+            self.results[task_id] = result
+
+
+def evaluate_result(sampler, result):
+    """
+    Replaces the simulation in the result of the simulate method of a sampler, (run id, parameters,
+    simulation), by its objective function value, so that only the value is sent back to the coordinator.
+    Other results (e.g. complex evolution of SCE-UA, which evaluates its runs itself) are returned unchanged
+    """
+    if not (isinstance(result, tuple) and len(result) == 3):
+        return result
+    rep, params, simulation = result
+    if simulation is None or isinstance(simulation, EvaluatedRun):
+        return result
+    like = sampler.getfitness(simulation=simulation, params=sampler.update_params(params))
+    if isinstance(like, list):
+        like = like[0]
+    return rep, params, EvaluatedRun(like)
+
+
+def connect(address, authkey, wait):
+    """Connects to a broker, trying again for up to `wait` seconds. Returns None if it does not answer"""
+    deadline = time.time() + wait
+    while True:
+        try:
+            return Client(tuple(address), authkey=_authkey(authkey))
+        except (ConnectionRefusedError, ConnectionResetError, EOFError):
+            if time.time() >= deadline:
+                return None
+            time.sleep(1)
+
+
+def serve(connection, name, directory=None):
+    """Runs the tasks of a broker until it stops or the connection is lost"""
+    _, process, heartbeat_interval = connection.recv()
+    connection.send(name)
+    sampler = process.__self__
+    setup = getattr(sampler, 'setup', None)
+    if directory is not None and setup is not None:
+        setup.model.relocate(directory)
+    attach_evaluation(sampler)
+    if setup is not None and setup.run_log is not None:
+        # runs are logged by the coordinator
+        setup.run_log = type(setup.run_log)(None)
+    instrumentation = get_instrumentation()
+    instrumentation.reset()
+
+    lock = threading.Lock()
+    stopped = threading.Event()
+
+    def heartbeat():
+        while not stopped.wait(heartbeat_interval):
+            try:
+                with lock:
+                    connection.send(('heartbeat',))
+            except OSError:
+                return
+
+    threading.Thread(target=heartbeat, daemon=True).start()
+    try:
+        while True:
+            try:
+                message = connection.recv()
+            except (EOFError, OSError):
+                return
+            if message[0] == 'stop':
+                return
+            _, task_id, phase, seed, job = message
+            # the sampler in the worker is a copy, so the phase has to travel with every job, as with ForEach
+            sampler.repeat.phase = phase
+            np.random.seed(seed)
+            try:
+                result = evaluate_result(sampler, process(job))
+                runs = setup.run_log.collect() if setup is not None and setup.run_log is not None else None
+                reply = ('result', task_id, result, instrumentation.collect(), runs)
+            except Exception:
+                reply = ('error', task_id, traceback.format_exc())
+            try:
+                with lock:
+                    connection.send(reply)
+            except OSError:
+                return
+    finally:
+        stopped.set()
+        connection.close()
+
+
+def run_worker(address=DEFAULT_ADDRESS, authkey=None, directory=None, wait=60, name=None):
+    """
+    Runs tasks of brokers, one at a time. Start one worker per core on each machine
+    :param address: (host, port) of the broker
+    :param authkey: key shared with the broker, by default that of the environment variable AUTHKEY_VARIABLE
+    :raises ValueError: if there is no key
+    :param directory: where the files of runs are written, in a subdirectory per worker. None for the
+    directories of the coordinator, which then have to be available at the same paths, e.g. on a shared file system
+    :param wait: seconds to wait for a broker, also after one has finished, so that the worker serves the
+    calibrations of a sweep one after the other
+    :param name: name of the worker in messages of the broker
+    """
+    authkey = get_authkey(authkey)
+    if authkey is None:
+        raise ValueError('The key of the broker is required, as authkey or in the environment variable {}'.format(
+            AUTHKEY_VARIABLE))
+    name = name or '{}:{}'.format(socket.gethostname(), os.getpid())
+    if directory is not None:
+        # workers on the same machine do not share their files
+        directory = os.path.join(directory, 'worker_{}'.format(os.getpid()))
+    while True:
+        connection = connect(address, authkey, wait)
+        if connection is None:
+            print('No broker at {}:{}, stopping'.format(*address))
+            return
+        print('Connected to {}:{}'.format(*address))
+        serve(connection, name, directory)
@@ -3,10 +3,12 @@ import os
 import pickle
 import datetime
 
+import numpy as np
 import pandas as pd
-from . import swmm_model, objective_function
+from . import swmm_model, objective_function, simulation_backend, simulation_cache, data_store, \
+    results_store, instrumentation, run_watchdog, multi_event_model, checkpoint, plot_queue, sensitivity
 
-from . import optimizer
+from . import optimizer, parallel
 
 
 class ExperimentRunner(object):
@@ -28,10 +30,50 @@ class ExperimentRunner(object):
             print('Making directory {}'.format(data_directory))
             os.makedirs(data_directory)
 
+        # where results are saved: SQLite database for .db files, otherwise CSV
+        self.results = results_store.open_results_store(output_file)
+
         # write settings to file in temp dir
         with open(os.path.join(self.dir, 'settings.pickle'), 'wb') as file:
             pickle.dump(settings, file)
 
+        # define how models are simulated
+        self.backend = simulation_backend.get_backend(
+            getattr(self.s, 'swmm_backend', 'subprocess'),
+            swmm_executable=self.s.swmm_executable,
+            swmm_library=getattr(self.s, 'swmm_library', None))
+
+        # reuse results of identical simulations
+        self.cache = None
+        if getattr(self.s, 'simulation_cache', None) is not None:
+            self.cache = simulation_cache.SimulationCache(**self.s.simulation_cache)
+
+        # stop hung runs and penalize failed ones, failed parameter sets are recorded in quarantine.jsonl
+        self.watchdog = None
+        if getattr(self.s, 'run_watchdog', None) is not None:
+            self.watchdog = run_watchdog.RunWatchdog(
+                quarantine_file=os.path.join(self.dir, 'quarantine.jsonl'), **self.s.run_watchdog)
+
+        # runs of the calibration and completed stages are recorded, so that a stopped experiment can be resumed
+        self.checkpoint = None
+        if getattr(self.s, 'checkpoint', False):
+            self.checkpoint = checkpoint.Checkpoint(self.dir)
+
+        # time the stages of model runs over this experiment
+        self.instrumentation = instrumentation.get_instrumentation()
+        self.instrumentation.enabled = getattr(self.s, 'instrumentation', False)
+        self.instrumentation.reset()
+
+        # forcing and observation data are parsed once per process and kept in binary files next to the data
+        data_store.get_data_store().persist = getattr(self.s, 'data_cache', True)
+
+        # plots are drawn by a background process, or only their data is saved
+        plot_queue.get_plot_queue().mode = getattr(self.s, 'plot_mode', 'inline')
+
+        # calibration parameters held at a value instead of being calibrated, see fix_parameters
+        self.fixed_parameters = dict(getattr(self.s, 'fixed_parameters', None) or {})
+        self.check_fixed_parameters(self.fixed_parameters)
+
         # create calibration model
         self.model_cal = swmm_model.SwmmModel(
             swmm_model_template=self.s.swmm_model_template,
@@ -46,103 +88,367 @@ class ExperimentRunner(object):
             obs_config_validation=self.s.obs_config_validation,
             cal_params=self.s.calibration_parameters,
             temp_folder=self.dir,
-            swmm_exexcutable=self.s.swmm_executable
+            swmm_exexcutable=self.s.swmm_executable,
+            backend=self.backend,
+            cache=self.cache,
+            watchdog=self.watchdog,
+            hotstart=getattr(self.s, 'hotstart', None),
+            fixed_params=self.fixed_parameters,
+            shared_data=getattr(self.s, 'shared_data', False),
+            float_format=getattr(self.s, 'template_float_format', '{:.6g}')
         )
 
+        if getattr(self.s, 'hotstart', None) is not None and self.s.hotstart.get('check', False):
+            self.check_hotstart()
+
         # define objective function for observations
-        self.obj_fun = objective_function.ObjectiveFunction(self.s.obs_available)
+        self.obj_fun = objective_function.ObjectiveFunction(self.s.obs_available,
+                                                            compiled=getattr(self.s, 'compiled_objective', False))
+        if self.obj_fun.compiled:
+            self.obj_fun.compile(self.model_cal.obs_calibration, self.model_cal.sim_index)
+            self.obj_fun.compile(self.model_cal.obs_validation, self.model_cal.sim_index)
+
+        # events calibrated jointly, each with a weight in the objective function. Their models are
+        # created once and reused for evaluation
+        self.event_models = {}
+        self.calibration_events = getattr(self.s, 'calibration_events', None) or [self.s.calibration_event]
+        if len(self.calibration_events) > 1:
+            weights = [event.get('weight', 1) for event in self.calibration_events]
+            self.calibration_model = multi_event_model.MultiEventModel(
+                [self.event_model(event) for event in self.calibration_events], weights,
+                processes=getattr(self.s, 'event_processes', None))
+            self.calibration_objective = multi_event_model.MultiEventObjective(self.obj_fun, weights).evaluate
+        else:
+            self.calibration_model = self.model_cal
+            self.calibration_objective = self.obj_fun.evaluate
 
         # define calibrator
-        self.calibrator = optimizer.Optimizer(
-            model=self.model_cal,
-            algorithm=self.s.calibration_algorithm,
-            cal_params=self.s.calibration_parameters,
-            obj_fun=self.obj_fun.evaluate,
-            temp_folder=self.dir)
+        self.calibrator = self.create_calibrator(self.s.calibration_algorithm, checkpoint=self.checkpoint)
 
-    def run(self, **kwargs):
+    def calibrated_parameters(self):
+        """Calibration parameters that are not fixed, ranked in their order"""
+        if not self.fixed_parameters:
+            return self.s.calibration_parameters
+        ranked = sorted((k for k in self.s.calibration_parameters if k not in self.fixed_parameters),
+                        key=lambda k: self.s.calibration_parameters[k]['rank'])
+        return dict((name, dict(self.s.calibration_parameters[name], rank=ranked.index(name)))
+                    for name in self.s.calibration_parameters if name in ranked)
+
+    def create_calibrator(self, algorithm, checkpoint=None):
+        return optimizer.Optimizer(
+            model=self.calibration_model,
+            algorithm=algorithm,
+            cal_params=self.calibrated_parameters(),
+            obj_fun=self.calibration_objective,
+            temp_folder=self.dir,
+            parallel=getattr(self.s, 'parallel', 'seq'),
+            processes=getattr(self.s, 'processes', None),
+            iterations_format=getattr(self.s, 'iterations_format', 'csv'),
+            checkpoint=checkpoint,
+            distributed=getattr(self.s, 'distributed', None))
+
+    def check_fixed_parameters(self, fixed_parameters):
+        for name, value in fixed_parameters.items():
+            if name not in self.s.calibration_parameters:
+                raise ValueError('Fixed parameter {} is not a calibration parameter'.format(name))
+            low, high = self.s.calibration_parameters[name]['bounds']
+            if not low <= value <= high:
+                raise ValueError('Fixed parameter {} = {} is outside of its bounds [{}, {}]'.format(name, value, low, high))
+        if set(self.s.calibration_parameters) <= set(fixed_parameters):
+            raise ValueError('All calibration parameters are fixed')
+
+    def fix_parameters(self, fixed_parameters):
+        """
+        Holds calibration parameters at a value, e.g. those found insensitive by analyse_sensitivity, so that only
+        the others are calibrated. The fixed values are used in every run and saved with the results. To resume
+        the experiment in another process, give the same values in `fixed_parameters` of the settings
+        :param fixed_parameters: dictionary of parameter names and values, replaces the parameters fixed before
+        """
+        self.check_fixed_parameters(fixed_parameters)
+        self.fixed_parameters = dict(fixed_parameters)
+        for model in [self.model_cal] + list(self.event_models.values()):
+            model.fix_parameters(self.fixed_parameters)
+        self.calibrator = self.create_calibrator(self.s.calibration_algorithm, checkpoint=self.checkpoint)
+
+    def run(self, validation=True, **kwargs):
+        """
+        :param validation: False to not evaluate the calibrated parameter sets on the validation events, e.g. to
+        evaluate them later with validate
+        :param kwargs: arguments of Optimizer.run
+        """
         self.calibrator.run(**kwargs)
-        self.calibrator.plot()
-        # return the 50 best model parameter sets, inlcuding run number for each
+        self.evaluate_calibration(validation)
+
+    def resume(self, validation=True, **kwargs):
+        """
+        Continues an experiment that was stopped where it stopped: the calibration continues from its
+        checkpoint and evaluations that have been saved are not done again. Needs `checkpoint` in the settings
+        :param validation: as in run
+        :param kwargs: arguments of run, used if there is no checkpoint to resume
+        """
+        if self.checkpoint is None or not self.checkpoint.load():
+            print('No checkpoint in {}, starting the experiment'.format(self.dir))
+            self.run(validation, **kwargs)
+            return
+        self.calibrator.resume()
+        self.evaluate_calibration(validation)
+
+    def validate(self, events=None):
+        """
+        Evaluates the calibrated parameter sets on validation events, with the calibration found in the
+        experiment directory. Used to validate in another process than the one that calibrated
+        :param events: list of events, defaults to the validation events of the settings
+        """
         self.params_opt, self.params_opt_run_numbers, self.calibration_errors = self.calibrator.getOptimalParams(how_many=self.evaluation_count)
+        self.evaluate(events)
+
+    def is_complete(self, stage):
+        return self.checkpoint is not None and self.checkpoint.is_complete(stage)
 
-        # run calibration model for all parameter sets and print output for first (supposedly best one)
-        for idx, (paramset, run_number, cal_err) in enumerate(zip(self.params_opt, self.params_opt_run_numbers, self.calibration_errors)):
-            sim = self.model_cal.run(named_model_params=paramset,
-                                     plot_results=(idx == 0),
-                                     plot_title='{} - Cal {}'.format(self.experiment_name, self.s.calibration_event['name']),
-                                     obs_list=self.s.obs_config_validation, run_type='validation')
+    def complete(self, stage):
+        if self.checkpoint is not None:
+            self.checkpoint.complete(stage)
 
-            # The performance here is different from the cost in the iterations file
-            # because we are using validation observations: usually just sensor data
-            performance = self.obj_fun.evaluate(simulation=sim,
-                                                evaluation=self.model_cal.obs_validation)
+    def evaluate_calibration(self, validation=True):
+        self.terminate_events()
+        self.calibrator.plot()
+        # return the 50 best model parameter sets, inlcuding run number for each
+        self.params_opt, self.params_opt_run_numbers, self.calibration_errors = self.calibrator.getOptimalParams(how_many=self.evaluation_count)
 
-            self.save_results(performance=performance, params=paramset, event_type='calibration', event_name=self.s.calibration_event['name'], run_count=run_number, cal_err=cal_err)
+        # run calibration model for all parameter sets and plot output for first (supposedly best one)
+        # The performance here is different from the cost in the iterations file
+        # because we are using validation observations: usually just sensor data
+        if not self.is_complete('calibration_evaluation'):
+            results = self.evaluate_batch(
+                self.params_opt, self.calibration_events, run_counts=self.params_opt_run_numbers,
+                cal_errs=self.calibration_errors,
+                plot_titles=['{} - Cal {}'.format(self.experiment_name, event['name'])
+                             for event in self.calibration_events])
+            self.save_batch(results, event_type='calibration')
+            self.complete('calibration_evaluation')
 
-        self.evaluate()
+        if validation and not self.is_complete('validation'):
+            self.evaluate()
+            self.complete('validation')
+        self.dump_instrumentation()
 
     def evaluate_uncalibrated(self, count=50):
         # evaluate model performance with parameter ranges provided
         # define sampler
-        self.calibrator = optimizer.Optimizer(
-            model=self.model_cal,
-            algorithm='lhs',  # USE LATIN HYPERCUBE SAMPLING
-            cal_params=self.s.calibration_parameters,
-            obj_fun=self.obj_fun.evaluate,
-            temp_folder=self.dir)
+        self.calibrator = self.create_calibrator('lhs')  # USE LATIN HYPERCUBE SAMPLING
 
         # sample (and run)
         self.calibrator.run(repetitions=count)
+        self.terminate_events()
         # plot sampling
         self.calibrator.plot()
 
         # return the 50 best model parameter sets, including run number for each
         self.params_opt, self.params_opt_run_numbers, self.calibration_errors = self.calibrator.getOptimalParams(how_many=count)
-        # run calibration model for all parameter sets and print output for first (supposedly best one)
-        for idx, (paramset, run_number, cal_err) in enumerate(zip(self.params_opt, self.params_opt_run_numbers, self.calibration_errors)):
-            sim = self.model_cal.run(named_model_params=paramset,
-                                     plot_results=(idx == 0), plot_title='Uncalibrated '+self.s.calibration_event['name'],
-                                     obs_list=self.s.obs_config_validation, run_type='validation')
+        # run calibration model for all parameter sets and plot output for first (supposedly best one)
+        results = self.evaluate_batch(
+            self.params_opt, self.calibration_events, run_counts=self.params_opt_run_numbers,
+            cal_errs=self.calibration_errors,
+            plot_titles=['Uncalibrated ' + event['name'] for event in self.calibration_events])
+        self.save_batch(results, event_type='uncalibrated')
+        self.dump_instrumentation()
+
+    def analyse_sensitivity(self, method='morris', count=10, freeze=False, threshold=0.05):
+        """
+        Global sensitivity analysis of the objective function of each observation to the calibration parameters,
+        on the calibration events. Indices are saved to sensitivity.csv, the runs to sensitivity_runs.csv
+        :param method: 'morris' for the elementary effects of Morris trajectories ((parameters + 1) * count
+        runs), 'fast' for first order and total indices of the extended FAST method (parameters * count runs,
+        count > 64)
+        :param count: number of trajectories (Morris) or of samples per parameter (FAST)
+        :param freeze: fix the parameters whose importance is below the threshold for every calibration
+        observation at their nominal value ('nominal' in the parameter settings, otherwise the middle of their
+        bounds), see fix_parameters
+        :param threshold: importance (mu_star or total index, relative to the most important parameter of the
+        observation) below which a parameter is insensitive
+        :return: data frame of the indices, see sensitivity.indices
+        """
+        cal_params = self.s.calibration_parameters
+        names = sensitivity.ordered_parameters(cal_params)
+        unit_samples = sensitivity.samples(method, len(names), count)
+        paramsets = sensitivity.scale(unit_samples, cal_params)
+        print('Sensitivity analysis ({}) with {} runs per event'.format(method, len(paramsets)))
 
-            # The performance here is different from the cost in the iterations file
-            # because we are using validation observations: usually just sensor data
-            performance = self.obj_fun.evaluate(simulation=sim,
-                                                evaluation=self.model_cal.obs_validation)
+        models = [self.event_model(event) for event in self.calibration_events]
+        jobs = [(i, params, False) for i in range(len(models)) for params in paramsets]
+        outcomes = parallel.run_batch(models, self.obj_fun, jobs, processes=getattr(self.s, 'processes', None),
+                                      terms=True)
+        # objective functions of each observation, summed over the events with their weights
+        observations = list(models[0].observations.columns)
+        values = np.zeros((len(paramsets), len(observations)))
+        for n, (terms, _) in enumerate(outcomes):
+            i, row = divmod(n, len(paramsets))
+            weight = self.calibration_events[i].get('weight', 1) if len(models) > 1 else 1
+            values[row] += weight * np.array([terms[obs_name] for obs_name in observations])
+        outputs = pd.DataFrame(values, columns=observations)
 
-            self.save_results(performance=performance, params=paramset, event_type='uncalibrated', event_name=self.s.calibration_event['name'], run_count=run_number, cal_err=cal_err)
+        indices = sensitivity.indices(method, cal_params, unit_samples, outputs)
+        indices.to_csv(os.path.join(self.dir, 'sensitivity.csv'), index=False)
+        runs = pd.DataFrame(paramsets).rename(columns=lambda k: 'par_' + k)
+        pd.concat([runs, outputs], axis=1).to_csv(os.path.join(self.dir, 'sensitivity_runs.csv'), index=False)
+        print(indices.pivot(index='parameter', columns='observation', values='importance').round(3).to_string())
 
-    def evaluate(self):
+        if freeze:
+            insensitive = sensitivity.insensitive_parameters(indices, self.s.obs_config_calibration, threshold)
+            fixed = dict(self.fixed_parameters)
+            for name in insensitive:
+                if name not in fixed and len(fixed) < len(names) - 1:
+                    # the least important first, at least one parameter is calibrated
+                    fixed[name] = cal_params[name].get('nominal', sum(cal_params[name]['bounds']) / 2.)
+            print('Fixed parameters: {}'.format(fixed))
+            self.fix_parameters(fixed)
+        self.dump_instrumentation()
+        return indices
+
+    def evaluate(self, events=None):
         # evaluate calibrated model
-        # run validation models and print output and save to file
-        for val_event in self.s.validation_events:
-            # create validation model
-            model_val = swmm_model.SwmmModel(
-                swmm_model_template=self.s.swmm_model_template,
-                initial_conditions=val_event['initial_conditions'],
-                sim_start_dt=val_event['start_dt'],
-                sim_end_dt=val_event['end_dt'],
-                sim_event_name='{}_cal{}_val{}'.format(self.experiment_name, self.s.calibration_event['name'], val_event['name']),
-                sim_reporting_step_sec=self.s.sim_reporting_step_sec,
-                forcing_data_file=self.s.forcing_data_file,
-                obs_available=self.s.obs_available,
-                obs_config_calibration=self.s.obs_config_calibration,
-                obs_config_validation=self.s.obs_config_validation,
-                cal_params=self.s.calibration_parameters,
-                temp_folder=self.dir,
-                swmm_exexcutable=self.s.swmm_executable
-            )
-            # run simulation for each optimal parameter
-            for idx, (paramset, run_number, cal_err) in enumerate(zip(self.params_opt, self.params_opt_run_numbers, self.calibration_errors)):
-                sim = model_val.run(named_model_params=paramset, plot_results=(idx == 0),  # only plot first (best)
-                                    plot_title='{} - Val {} - Cal {}'.format(self.experiment_name, val_event['name'], self.s.calibration_event['name']),
-                                    obs_list=self.s.obs_config_validation, run_type='validation')
-                # evaluate simulation
-                performance = self.obj_fun.evaluate(simulation=sim,
-                                                    evaluation=model_val.obs_validation)
-                self.save_results(performance=performance, params=paramset, event_type='validation', event_name=val_event['name'], run_count=run_number, cal_err=cal_err)
-
-            del model_val
+        # run validation models for each optimal parameter set, plot output of the first (best) and save to file
+        if events is None:
+            events = self.s.validation_events
+        results = self.evaluate_batch(
+            self.params_opt, events, run_counts=self.params_opt_run_numbers,
+            cal_errs=self.calibration_errors,
+            plot_titles=['{} - Val {} - Cal {}'.format(self.experiment_name, val_event['name'], self.s.calibration_event['name'])
+                         for val_event in events])
+        self.save_batch(results, event_type='validation')
+
+        if self.cache is not None:
+            print('Simulation cache: {}'.format(self.cache.statistics()))
+        if self.watchdog is not None:
+            print('Run watchdog: {}'.format(self.watchdog.statistics()))
+
+    def check_hotstart(self):
+        """
+        Checks that runs started from a shared spin-up give the results of runs from the initial conditions: the
+        parameters that are not listed in the hotstart settings are at their lower bounds for the spin-up and at
+        their upper bounds for the compared runs. Done when the experiment is created if 'check' is set in the
+        hotstart settings
+        :raises ValueError: if the results differ by more than the tolerance of the hotstart settings
+        :return: largest absolute difference between the results
+        """
+        shared = self.s.hotstart.get('parameters', [])
+        spinup_params, model_params = {}, {}
+        for name, p in self.s.calibration_parameters.items():
+            if name in shared:
+                spinup_params[name] = model_params[name] = sum(p['bounds']) / 2.
+            else:
+                spinup_params[name], model_params[name] = p['bounds']
+        difference = self.model_cal.check_hotstart(model_params, spinup_params)
+        tolerance = self.s.hotstart.get('tolerance', 0.001)
+        if difference > tolerance:
+            raise ValueError('Runs started from a hotstart file differ from cold starts by {:.6g}, more than the '
+                             'tolerance of {}: the spin-up depends on parameters that are not listed in the hotstart '
+                             'settings'.format(difference, tolerance))
+        print('Hotstart check: largest difference to a cold start is {:.6g}'.format(difference))
+        return difference
+
+    def dump_instrumentation(self):
+        # timings and counters are written next to the iterations of the calibration
+        extra = {}
+        if self.cache is not None:
+            extra['simulation_cache'] = self.cache.statistics()
+        if self.watchdog is not None:
+            extra['run_watchdog'] = self.watchdog.statistics()
+        self.instrumentation.dump(self.dir, **extra)
+
+    def terminate_events(self):
+        # the processes running the events of a multi-event calibration are not needed for evaluation
+        if isinstance(self.calibration_model, multi_event_model.MultiEventModel):
+            self.calibration_model.terminate()
+
+    def event_model(self, event):
+        """Returns the model of an event: the calibration model, or a model created once per event"""
+        if event is self.s.calibration_event:
+            return self.model_cal
+        key = (event['name'], event['start_dt'], event['end_dt'])
+        if key in self.event_models:
+            return self.event_models[key]
+        if any(event is e for e in self.calibration_events):
+            name = '{}_cal{}'.format(self.experiment_name, event['name'])
+        else:
+            name = '{}_cal{}_val{}'.format(self.experiment_name, self.s.calibration_event['name'], event['name'])
+        model = swmm_model.SwmmModel(
+            swmm_model_template=self.s.swmm_model_template,
+            initial_conditions=event['initial_conditions'],
+            sim_start_dt=event['start_dt'],
+            sim_end_dt=event['end_dt'],
+            sim_event_name=name,
+            sim_reporting_step_sec=self.s.sim_reporting_step_sec,
+            forcing_data_file=self.s.forcing_data_file,
+            obs_available=self.s.obs_available,
+            obs_config_calibration=self.s.obs_config_calibration,
+            obs_config_validation=self.s.obs_config_validation,
+            cal_params=self.s.calibration_parameters,
+            temp_folder=self.dir,
+            swmm_exexcutable=self.s.swmm_executable,
+            backend=self.backend,
+            cache=self.cache,
+            watchdog=self.watchdog,
+            hotstart=getattr(self.s, 'hotstart', None),
+            fixed_params=self.fixed_parameters,
+            shared_data=getattr(self.s, 'shared_data', False),
+            float_format=getattr(self.s, 'template_float_format', '{:.6g}')
+        )
+        if self.obj_fun.compiled:
+            self.obj_fun.compile(model.obs_calibration, model.sim_index)
+            self.obj_fun.compile(model.obs_validation, model.sim_index)
+        self.event_models[key] = model
+        return model
+
+    def evaluate_batch(self, paramsets, events, run_counts=None, cal_errs=None, plot_titles=None, processes=None):
+        """
+        Simulates all combinations of parameter sets and events on a process pool and evaluates them
+        against the validation observations
+        :param paramsets: list of dictionaries of named model parameters
+        :param events: list of events, defined as the calibration and validation events in the settings
+        :param run_counts: run number of each parameter set in the calibration, added to the results
+        :param cal_errs: calibration error of each parameter set, added to the results
+        :param plot_titles: per event, title of the plot of the first parameter set. None to not plot
+        :param processes: number of worker processes. Defaults to `processes` in the settings or the number of cores
+        :return: data frame with one row per event and parameter set: par_* (parameters), error,
+        run_count, cal_err and event (name of the event)
+        """
+        # fixed parameters are saved with the results as well
+        paramsets = [dict(paramset, **self.fixed_parameters) for paramset in paramsets]
+        run_counts = list(run_counts) if run_counts is not None else [None] * len(paramsets)
+        cal_errs = list(cal_errs) if cal_errs is not None else [None] * len(paramsets)
+        plot_titles = plot_titles or [None] * len(events)
+        if processes is None:
+            processes = getattr(self.s, 'processes', None)
+
+        models = [self.event_model(event) for event in events]
+        runs = [(i, idx) for i in range(len(models)) for idx in range(len(paramsets))]
+        jobs = [(i, paramsets[idx], idx == 0 and plot_titles[i] is not None) for i, idx in runs]
+        outcomes = parallel.run_batch(models, self.obj_fun, jobs, processes=processes) if jobs else []
+
+        rows = []
+        for (i, idx), (performance, simulation) in zip(runs, outcomes):
+            if simulation is not None:
+                models[i].simulation = simulation
+                models[i].plot(plot_titles[i], run_type='validation')
+            row = dict(('par_' + key, value) for key, value in paramsets[idx].items())
+            row.update({'error': performance, 'run_count': run_counts[idx], 'cal_err': cal_errs[idx],
+                        'event': events[i]['name']})
+            rows.append(row)
+        return pd.DataFrame(rows)
+
+    def save_batch(self, results, event_type):
+        """Saves the results of evaluate_batch to the output file"""
+        if results.empty:
+            return
+        df = results[[c for c in results.columns if c.startswith('par_')] + ['error', 'run_count', 'cal_err']].copy()
+        df['type'] = event_type
+        df['time'] = datetime.datetime.now()
+        df['meta_event_val'] = results['event']
+        for key, value in self.experiment_metadata.items():
+            df['meta_'+key] = value
+        self.results.append(df, experiment=self.experiment_name)
+        self.results.flush()
 
     def save_results(self, performance, params, event_type, event_name, run_count=None, cal_err=None):
         # save params and cost to file
@@ -155,8 +461,5 @@ class ExperimentRunner(object):
         df['meta_event_val'] = event_name
         for key, value in self.experiment_metadata.items():
             df['meta_'+key] = [value]
-
-        if not os.path.isfile(self.output_file):
-            df.to_csv(self.output_file, mode='w', header=True, index=False)
-        else:
-            df.to_csv(self.output_file, mode='a', header=False, index=False)
+        self.results.append(df, experiment=self.experiment_name)
+        self.results.flush()
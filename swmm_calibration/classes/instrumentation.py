@@ -0,0 +1,128 @@
+import os
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+# edges of the duration histograms in seconds, four bins per decade from 1 microsecond to 1000 seconds
+HISTOGRAM_EDGES = 10 ** np.arange(-6, 3.001, 0.25)
+
+
+class Timer(object):
+    def __init__(self, instrumentation, stage):
+        self.instrumentation = instrumentation
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation.record(self.stage, time.perf_counter() - self.start)
+
+
+class NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+NULL_TIMER = NullTimer()
+
+
+class Instrumentation(object):
+    """Durations of the stages of model runs and counters, aggregated over the processes of an experiment"""
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.durations = OrderedDict()
+        self.counters = OrderedDict()
+
+    def reset(self):
+        self.durations = OrderedDict()
+        self.counters = OrderedDict()
+
+    def timer(self, stage):
+        """Context manager recording the duration of a stage"""
+        if not self.enabled:
+            return NULL_TIMER
+        return Timer(self, stage)
+
+    def record(self, stage, seconds):
+        if self.enabled:
+            self.durations.setdefault(stage, []).append(seconds)
+
+    def count(self, name, increment=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + increment
+
+    def collect(self):
+        """Returns what has been recorded since the last collect and starts over. Used in worker processes"""
+        if not self.enabled or not (self.durations or self.counters):
+            return None
+        recorded = (self.durations, self.counters)
+        self.reset()
+        return recorded
+
+    def merge(self, recorded):
+        """Adds what another process has recorded (see collect)"""
+        if not self.enabled or recorded is None:
+            return
+        durations, counters = recorded
+        for stage, seconds in durations.items():
+            self.durations.setdefault(stage, []).extend(seconds)
+        for name, value in counters.items():
+            self.count(name, value)
+
+    def summary(self):
+        """Returns a data frame with count, total and percentiles of the duration of each stage"""
+        rows = []
+        for stage, seconds in self.durations.items():
+            seconds = np.array(seconds)
+            p50, p90, p99 = np.percentile(seconds, [50, 90, 99])
+            rows.append(OrderedDict([
+                ('stage', stage), ('count', len(seconds)), ('total_s', seconds.sum()),
+                ('mean_ms', seconds.mean() * 1000), ('p50_ms', p50 * 1000), ('p90_ms', p90 * 1000),
+                ('p99_ms', p99 * 1000), ('max_ms', seconds.max() * 1000)]))
+        return pd.DataFrame(rows, columns=['stage', 'count', 'total_s', 'mean_ms', 'p50_ms', 'p90_ms', 'p99_ms',
+                                           'max_ms'])
+
+    def histograms(self):
+        histograms = OrderedDict()
+        for stage, seconds in self.durations.items():
+            counts, _ = np.histogram(np.clip(seconds, HISTOGRAM_EDGES[0], HISTOGRAM_EDGES[-1]), HISTOGRAM_EDGES)
+            used = np.nonzero(counts)[0]
+            histograms[stage] = {
+                'edges_s': HISTOGRAM_EDGES[used[0]:used[-1] + 2].tolist(),
+                'counts': counts[used[0]:used[-1] + 1].tolist()
+            }
+        return histograms
+
+    def dump(self, directory, **extra):
+        """
+        Writes the summary to instrumentation.csv and counters and histograms to instrumentation.json
+        :param directory: where to write the files
+        :param extra: further statistics to write to the json file, e.g. those of the simulation cache
+        """
+        if not self.enabled:
+            return
+        summary = self.summary()
+        summary.to_csv(os.path.join(directory, 'instrumentation.csv'), index=False)
+        content = OrderedDict([('counters', self.counters), ('histograms', self.histograms())])
+        content.update(extra)
+        with open(os.path.join(directory, 'instrumentation.json'), 'w') as f:
+            json.dump(content, f, indent=2)
+        print(summary.to_string(index=False, float_format='{:.3f}'.format))
+        print('Counters: {}'.format(dict(self.counters)))
+
+
+_instrumentation = Instrumentation()
+
+
+def get_instrumentation():
+    """Returns the instrumentation of this process"""
+    return _instrumentation
@@ -0,0 +1,122 @@
+import sqlite3
+
+import pandas as pd
+
+
+def read_iterations(filename):
+    """Reads all iterations of a calibration from an IterationsDatabase (.db) or the iterations.csv of spotpy"""
+    if not filename.endswith('.db'):
+        return pd.read_csv(filename, sep=',', float_precision='round_trip')
+    connection = sqlite3.connect(filename, timeout=60)
+    try:
+        data = pd.read_sql_query('SELECT * FROM iterations ORDER BY iteration', connection, index_col='iteration')
+    finally:
+        connection.close()
+    # number iterations from 0, as the rows of iterations.csv
+    data.index = data.index - 1
+    data.index.name = None
+    return data
+
+
+class IterationsDatabase(object):
+    """SQLite database of the iterations of a calibration, replacing the iterations.csv of spotpy"""
+
+    def __init__(self, filename, parameter_names, buffer_size=100, append=False):
+        """
+        :param filename: database file
+        :param parameter_names: names of the calibration parameters, in the order of the parameter vector
+        :param buffer_size: number of iterations buffered before they are written
+        :param append: add to the iterations of an earlier calibration instead of replacing them
+        """
+        self.filename = filename
+        self.columns = ['like1'] + ['par' + name for name in parameter_names] + ['chain']
+        self.buffer_size = buffer_size
+        self.buffer = []
+        connection = self.connect()
+        try:
+            existing = [row[1] for row in connection.execute('PRAGMA table_info(iterations)')][1:]
+            # iterations of other calibration parameters (e.g. with other fixed parameters) are not kept
+            if not append or (existing and existing != self.columns):
+                connection.execute('DROP TABLE IF EXISTS iterations')
+            connection.execute('CREATE TABLE IF NOT EXISTS iterations (iteration INTEGER PRIMARY KEY, {})'.format(
+                ', '.join('"{}" REAL'.format(c) for c in self.columns)))
+            connection.execute('CREATE INDEX IF NOT EXISTS iterations_like1 ON iterations (like1 DESC)')
+        finally:
+            connection.close()
+
+    def __getstate__(self):
+        # buffered iterations stay with the process that created them
+        state = self.__dict__.copy()
+        state['buffer'] = []
+        return state
+
+    def connect(self):
+        return sqlite3.connect(self.filename, timeout=60, isolation_level=None)
+
+    def clear(self):
+        """Removes all iterations, they are numbered from 0 again"""
+        self.buffer = []
+        connection = self.connect()
+        try:
+            connection.execute('DELETE FROM iterations')
+        finally:
+            connection.close()
+
+    def save(self, like, params, chains=1):
+        """Adds an iteration, with the arguments spotpy passes to the save method of a setup"""
+        if isinstance(like, (list, tuple)):
+            like = like[0]
+        self.buffer.append([float(like)] + [float(p) for p in params] + [float(chains)])
+        if len(self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes buffered iterations"""
+        if not self.buffer:
+            return
+        connection = self.connect()
+        try:
+            connection.execute('BEGIN')
+            connection.executemany('INSERT INTO iterations ({}) VALUES ({})'.format(
+                ', '.join('"{}"'.format(c) for c in self.columns), ', '.join(['?'] * len(self.columns))), self.buffer)
+            connection.execute('COMMIT')
+        finally:
+            connection.close()
+        self.buffer = []
+
+    def query(self, query, params=()):
+        self.flush()
+        connection = self.connect()
+        try:
+            data = pd.read_sql_query(query, connection, params=params, index_col='iteration')
+        finally:
+            connection.close()
+        # number iterations from 0, as the rows of iterations.csv
+        data.index = data.index - 1
+        data.index.name = None
+        return data
+
+    def count(self):
+        self.flush()
+        connection = self.connect()
+        try:
+            return connection.execute('SELECT COUNT(*) FROM iterations').fetchone()[0]
+        finally:
+            connection.close()
+
+    def read(self):
+        """Returns all iterations"""
+        return self.query('SELECT * FROM iterations ORDER BY iteration')
+
+    def best(self, how_many):
+        """Returns the iterations with the highest like1, best first"""
+        return self.query('SELECT * FROM iterations ORDER BY like1 DESC LIMIT ?', (int(how_many),))
+
+    def tail(self, how_many):
+        """Returns the last iterations, in the order they were saved"""
+        return self.query('SELECT * FROM iterations ORDER BY iteration DESC LIMIT ?', (int(how_many),)).iloc[::-1]
+
+    def export_csv(self, filename):
+        """Writes the iterations in the format of the spotpy CSV database"""
+        self.read().to_csv(filename, index=False)
+
@@ -0,0 +1,19 @@
+import os
+
+import seaborn as sns
+import matplotlib.pyplot as plt
+
+
+def plot_simulation(data, plot_title, temp_folder):
+    """
+    Plots simulated and observed time series of a model run, by location
+    :param data: long format data frame with the columns datetime, value, location and source
+    :param plot_title: title of the plot, also used in the file name
+    :param temp_folder: where the plot is saved
+    """
+    fig, ax = plt.subplots(figsize=(7, 5))
+    sns.lineplot(x='datetime', y='value', data=data, style='source', hue='location', ax=ax)
+    ax.set_title(plot_title)
+    plt.savefig(os.path.join(temp_folder, 'simulation_{title}.png'.format(title=plot_title.lower())))
+    plt.clf()
+    plt.close()
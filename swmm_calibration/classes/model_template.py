@@ -0,0 +1,129 @@
+import threading
+from string import Template
+
+import numpy as np
+
+
+def format_value(value, float_format=None):
+    """
+    Text of a value in the model input
+    :param value: value of a placeholder
+    :param float_format: format of floating point values, e.g. '{:.6f}'. None for the shortest text that reads back
+    as the same value, as str() of a Python float
+    """
+    if isinstance(value, (float, np.floating)):
+        if float_format is not None:
+            return float_format.format(value)
+        return repr(float(value))
+    return str(value)
+
+
+class CompiledTemplate(object):
+    """A SWMM input file template ($name placeholders, as string.Template), parsed once"""
+
+    def __init__(self, text, float_format=None):
+        """
+        :param text: content of the template
+        :param float_format: format of floating point values, see format_value
+        """
+        self.float_format = float_format
+        # static text and placeholder names, alternating: text, name, text, ..., text
+        self.parts = []
+        self.slots = []
+        text_start = 0
+        static = []
+        for match in Template.pattern.finditer(text):
+            static.append(text[text_start:match.start()])
+            text_start = match.end()
+            if match.group('escaped') is not None:
+                static.append('$')
+            elif match.group('invalid') is not None:
+                line = text.count('\n', 0, match.start()) + 1
+                raise ValueError('Invalid placeholder in line {} of the model template'.format(line))
+            else:
+                self.parts.append(''.join(static))
+                static = []
+                self.slots.append(len(self.parts))
+                self.parts.append(match.group('named') or match.group('braced'))
+        static.append(text[text_start:])
+        self.parts.append(''.join(static))
+        self.names = [self.parts[i] for i in self.slots]
+        self.encoded_parts = [part.encode() for part in self.parts]
+        # buffer of each thread, into which the model input is rendered
+        self.buffers = threading.local()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['buffers']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.buffers = threading.local()
+
+    @property
+    def placeholders(self):
+        """Names of the placeholders that remain to be filled"""
+        return set(self.names)
+
+    def validate(self, *available):
+        """
+        Checks that every placeholder of the template has a value
+        :param available: collections of the names for which values are given (e.g. calibration parameters)
+        :raises ValueError: listing the placeholders without values
+        """
+        names = set()
+        for a in available:
+            names.update(a)
+        missing = self.placeholders - names
+        if missing:
+            raise ValueError('The model template has placeholders without values: {}'.format(
+                ', '.join('$' + name for name in sorted(missing))))
+
+    def bind(self, values):
+        """
+        Returns a template with some of the placeholders filled
+        :param values: dictionary of values of placeholders
+        """
+        text = []
+        for i, part in enumerate(self.parts):
+            if i % 2 == 0:
+                text.append(part.replace('$', '$$'))
+            elif part in values:
+                text.append(format_value(values[part], self.float_format).replace('$', '$$'))
+            else:
+                text.append('${' + part + '}')
+        return CompiledTemplate(''.join(text), float_format=self.float_format)
+
+    def render(self, values):
+        """
+        Returns the content of the model input
+        :param values: dictionary of values of all remaining placeholders
+        """
+        # filled in a copy, so that the template stays intact and can be rendered by several threads
+        parts = list(self.parts)
+        for i, name in zip(self.slots, self.names):
+            parts[i] = format_value(values[name], self.float_format)
+        return ''.join(parts)
+
+    def render_bytes(self, values):
+        """
+        Renders the model input into a buffer of the template, which is reused by later renders in the same thread
+        :param values: dictionary of values of all remaining placeholders
+        :return: memoryview of the encoded model input. Its content changes with the next render_bytes of this
+        template in the thread
+        """
+        parts = list(self.encoded_parts)
+        for i, name in zip(self.slots, self.names):
+            parts[i] = format_value(values[name], self.float_format).encode()
+        size = sum(len(part) for part in parts)
+        buffer = getattr(self.buffers, 'buffer', None)
+        if buffer is None or len(buffer) < size:
+            # with room for longer values, earlier views keep the replaced buffer alive
+            buffer = self.buffers.buffer = bytearray(size + size // 8)
+        view = memoryview(buffer)
+        position = 0
+        for part in parts:
+            view[position:position + len(part)] = part
+            position += len(part)
+        return view[:size]
@@ -0,0 +1,75 @@
+from .parallel import EventPool
+
+
+class MultiEventModel(object):
+    """Several events of a model, calibrated jointly. Used by SpotpySwmmSetup in place of a SwmmModel"""
+
+    def __init__(self, models, weights=None, processes=None):
+        """
+        :param models: list of SwmmModel, one per event, with the same calibration parameters
+        :param weights: weight of each event in the objective function. Defaults to 1 for every event
+        :param processes: number of processes running events at once. Defaults to the number of events,
+        1 to run them one after the other
+        """
+        self.models = models
+        self.weights = list(weights) if weights is not None else [1] * len(models)
+        self.cal_params = models[0].cal_params
+        self.obs_calibration = [model.obs_calibration for model in models]
+        self.obs_validation = [model.obs_validation for model in models]
+        self.eval_dates = [model.eval_dates for model in models]
+        self.pool = EventPool(models, processes=processes)
+        self.simulation = None
+
+    def run(self, *params, named_model_params=None, obs_list=None):
+        """
+        Runs the model with specific parameters on all events
+        :param params: unnamed parameters, in the order of their rank
+        :param named_model_params: dictionary of named model parameters. Replaces unnamed params
+        :param obs_list: list of measurement points that should be returned
+        :return: list of the simulations of the events
+        """
+        simulations = self.pool.run(params, named_model_params=named_model_params, obs_list=obs_list)
+        for model, simulation in zip(self.models, simulations):
+            # share the time axis of the model again, so that observations stay aligned once
+            if simulation.index is not model.sim_index and simulation.index.equals(model.sim_index):
+                simulation.index = model.sim_index
+        self.simulation = simulations
+        return simulations
+
+    def terminate(self):
+        self.pool.terminate()
+
+    def __getstate__(self):
+        # the observations are those of the models, which may share them (see SwmmModel.share_data)
+        state = self.__dict__.copy()
+        state['obs_calibration'] = state['obs_validation'] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.obs_calibration = [model.obs_calibration for model in self.models]
+        self.obs_validation = [model.obs_validation for model in self.models]
+
+    def relocate(self, temp_folder):
+        """Moves the files of the runs of all events to another directory, see SwmmModel.relocate"""
+        for model in self.models:
+            model.relocate(temp_folder)
+
+
+class MultiEventObjective(object):
+    """Weighted sum of the objective function over the events of a MultiEventModel"""
+
+    def __init__(self, obj_fun, weights):
+        """
+        :param obj_fun: ObjectiveFunction evaluating a single event
+        :param weights: weight of each event
+        """
+        self.obj_fun = obj_fun
+        self.weights = weights
+
+    def evaluate(self, simulation, evaluation):
+        """
+        :param simulation: list of simulations, one per event
+        :param evaluation: list of observations, one per event
+        """
+        return sum(weight * self.obj_fun.evaluate(s, e) for weight, s, e in zip(self.weights, simulation, evaluation))
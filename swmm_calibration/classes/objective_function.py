@@ -1,19 +1,180 @@
-import random
 import math
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from .instrumentation import get_instrumentation
+
+
+def rank(x):
+    # ranks with ties replaced by their average, as used by pandas for spearman correlation
+    sorter = np.argsort(x, kind='mergesort')
+    x = x[sorter]
+    new_value = np.empty(len(x), dtype=bool)
+    new_value[:1] = True
+    np.not_equal(x[1:], x[:-1], out=new_value[1:])
+    dense = np.cumsum(new_value)
+    bounds = np.append(np.flatnonzero(new_value), len(x))
+    ranks = np.empty(len(x))
+    ranks[sorter] = .5 * (bounds[dense] + bounds[dense - 1] + 1)
+    return ranks
+
+
+def correlation(x, y):
+    # pearson correlation, nan if there is no data or one of the series is constant
+    if len(x) == 0:
+        return np.nan
+    x = x - x.mean()
+    y = y - y.mean()
+    divisor = math.sqrt((x * x).sum() * (y * y).sum())
+    if divisor == 0:
+        return np.nan
+    return (x * y).sum() / divisor
+
+
+def spearman_correlation(x, y):
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return correlation(rank(x[valid]), rank(y[valid]))
+
+
+def rmse_kernel(sim, obs):
+    difference = sim - obs
+    difference = difference[~np.isnan(difference)]
+    if len(difference) == 0:
+        return np.nan
+    return math.sqrt(np.dot(difference, difference) / len(difference))
+
+
+def spearman_kernel(sim, obs):
+    both_zeros = (sim <= 0) & (obs <= 0)
+    no_zeros = (sim > 0) & (obs > 0)
+    count_no_zeros = np.count_nonzero(no_zeros)
+    if count_no_zeros < 10:
+        spearman = 0
+    else:
+        spearman = correlation(rank(sim[no_zeros]), rank(obs[no_zeros]))
+        if math.isnan(spearman):
+            spearman = 0
+    return (np.count_nonzero(both_zeros) + spearman * count_no_zeros) / len(sim)
+
+
+def spearman_zero_kernel(sim, obs):
+    return spearman_kernel(sim, obs) - 1
+
+
+def spearman_simple_zero_kernel(sim, obs):
+    spearman = spearman_correlation(sim, obs)
+    if math.isnan(spearman):
+        sim_stable = math.isnan(spearman_correlation(sim, sim))
+        obs_stable = math.isnan(spearman_correlation(obs, obs))
+        if sim_stable and obs_stable:
+            return 0
+        if sim_stable != obs_stable:
+            return np.count_nonzero((sim == 0) & (obs == 0)) / len(sim) - 1
+        return None
+    return spearman - 1
+
+
+# array versions of the objective functions, used by the compiled evaluation
+KERNELS = {
+    'rmse': rmse_kernel,
+    'spearman': spearman_kernel,
+    'spearman_zero': spearman_zero_kernel,
+    'spearman_simple_zero': spearman_simple_zero_kernel
+}
+
+
+class Alignment(object):
+    """Observations as arrays, aligned with a simulation time axis"""
+
+    def __init__(self, obs_config, evaluation, sim_index):
+        self.evaluation = evaluation
+        self.sim_index = sim_index
+        positions = pd.Index(sim_index).get_indexer(evaluation.index)
+        found = positions >= 0
+        self.rows = positions[found]
+        # observations that are all on the time axis are used as views, e.g. of memory-mapped data
+        rows = slice(None) if found.all() else found
+        self.terms = []
+        for obs_name in list(evaluation.columns.values):
+            calibration = obs_config[obs_name]['calibration']
+            obs = np.asarray(evaluation[obs_name].values[rows], dtype=np.float64)
+            sim_threshold = None
+            # set any values below thresholds to zero if objective function is spearman
+            if calibration['obj_fun'] == 'spearman_zero':
+                obs = np.where(obs > calibration['zero_threshold_obs'], obs, 0)
+                sim_threshold = calibration['zero_threshold_sim']
+            self.terms.append((obs_name, KERNELS[calibration['obj_fun']], calibration['weight'], obs, sim_threshold))
 
 
 class ObjectiveFunction(object):
-    def __init__(self, obs_config):
+    def __init__(self, obs_config, compiled=False):
+        """
+        :param obs_config: dictionary describing observation data, including the objective function of each
+        :param compiled: evaluate on arrays aligned once per observation data and time axis. Gives the same
+        results as evaluating on data frames
+        """
         self.obs_config = obs_config
+        self.compiled = compiled
+        self.alignments = {}
         # for key, obs in obs_config.items():
         #     if not obs['calibration']['obj_fun'] in dir(spotpy.objectivefunctions):
         #         raise Exception('Objective function {} not defined in spotpy'.format(obs['calibration']['obj_fun']))
 
+    def __getstate__(self):
+        # alignments are found by the id of the observations in this process, other processes align them again
+        state = self.__dict__.copy()
+        state['alignments'] = {}
+        return state
+
+    def compile(self, evaluation, sim_index):
+        """
+        Aligns observations with the time axis of simulations, to be done once when a model is created
+        :param evaluation: observations, as SwmmModel.obs_calibration or SwmmModel.obs_validation
+        :param sim_index: time axis of the simulations, SwmmModel.sim_index
+        """
+        alignment = Alignment(self.obs_config, evaluation, sim_index)
+        # keep a few time axes per observation data (e.g. that of penalty results)
+        alignments = [alignment] + [a for a in self.alignments.get(id(evaluation), [])
+                                    if a.evaluation is evaluation][:3]
+        self.alignments[id(evaluation)] = alignments
+        return alignment
+
+    def alignment(self, simulation, evaluation):
+        alignments = [a for a in self.alignments.get(id(evaluation), []) if a.evaluation is evaluation]
+        for alignment in alignments:
+            if alignment.sim_index is simulation.index:
+                return alignment
+        for alignment in alignments:
+            if alignment.sim_index.equals(simulation.index):
+                return alignment
+        return self.compile(evaluation, simulation.index)
+
     def evaluate(self, simulation, evaluation):
-        # decide whether to print of values:
-        print_fitness = False
-        if random.choices([True, False], weights=[1, 100])[0]:
-            print_fitness = True
+        with get_instrumentation().timer('objective_function'):
+            if not self.compiled:
+                return self.evaluate_frames(simulation, evaluation)
+            return self.evaluate_compiled(simulation, evaluation)
+
+    def evaluate_compiled(self, simulation, evaluation):
+        objfun = 0
+        for term in self.terms(simulation, evaluation).values():
+            objfun += term
+        return objfun
+
+    def terms(self, simulation, evaluation):
+        """Weighted objective function of each observation, which evaluate adds up"""
+        alignment = self.alignment(simulation, evaluation)
+        values = simulation.values
+        terms = OrderedDict()
+        for obs_name, kernel, weight, obs, sim_threshold in alignment.terms:
+            sim = values[alignment.rows, simulation.columns.get_loc(obs_name)].astype(np.float64)
+            if sim_threshold is not None:
+                sim = np.where(sim > sim_threshold, sim, 0)
+            terms[obs_name] = weight * kernel(sim, obs)
+        return terms
+
+    def evaluate_frames(self, simulation, evaluation):
         # compute similarity
         objfun = []
         for obs_name in list(evaluation.columns.values):
@@ -24,8 +185,8 @@ class ObjectiveFunction(object):
 
             # set any values below thresholds to zero if objective function is spearman
             if self.obs_config[obs_name]['calibration']['obj_fun'] == 'spearman_zero':
-                sim.where((sim > self.obs_config[obs_name]['calibration']['zero_threshold_sim']), inplace=True, other=0)
-                evalu.where((evalu > self.obs_config[obs_name]['calibration']['zero_threshold_obs']), inplace=True, other=0)
+                sim = sim.where((sim > self.obs_config[obs_name]['calibration']['zero_threshold_sim']), other=0)
+                evalu = evalu.where((evalu > self.obs_config[obs_name]['calibration']['zero_threshold_obs']), other=0)
 
             # Guarantee same time and data is compared
             data = sim.join(evalu, how='inner', lsuffix='_sim', rsuffix='_eval')
@@ -85,4 +246,4 @@ class ObjectiveFunction(object):
                 return fraction_matching_zeros - 1
         # if spearman is successful, return it
         else:
-            return spearman.iloc[0, 1] - 1
\ No newline at end of file
+            return spearman.iloc[0, 1] - 1
@@ -1,43 +1,83 @@
 import os
 from os.path import join
 
+import numpy as np
 import pandas as pd
 import spotpy
 from .spotpy_setup import SpotpySwmmSetup
 from .swmm_model import SwmmModel
-
-from .optimizer_plotting_utils import plot_chain, plot_density
+from .parallel import ForEach
+from .distributed import Broker
+from .iterations_database import IterationsDatabase
+from .checkpoint import Checkpoint
+from .surrogate_sampler import SurrogateSampler
+from .async_sampler import AsyncSampler
+from .plot_queue import get_plot_queue
 
 
 class Optimizer(object):
     """Optimizes a model with given objective functions, parameter ranges
     """
 
-    def __init__(self, model: SwmmModel, algorithm, cal_params, obj_fun, temp_folder):
+    def __init__(self, model: SwmmModel, algorithm, cal_params, obj_fun, temp_folder, parallel='seq', processes=None,
+                 iterations_format='csv', checkpoint: Checkpoint = None, distributed=None):
         """
         creates an optimizer that is ready to optimize
         :param model: initialized SwmmModel
-        :param algorithm: optimization algorithm used
+        :param algorithm: optimization algorithm used: the name of a spotpy algorithm (e.g. 'sceua', 'lhs'),
+        'surrogate' for the SurrogateSampler or 'async_de' for the AsyncSampler
         :param cal_params: definition of calibration parameters including ranges
         :param obj_fun: objective function to be used for calibration
         :param temp_folder: where to store intermediate results
+        :param parallel: 'pool' to run the models on a process pool, 'distributed' to send them to workers that connect
+        over TCP (see distributed.Broker), otherwise passed on to spotpy ('seq', 'mpi', ...)
+        :param processes: size of the process pool (defaults to the number of cores), or number of distributed workers
+        :param iterations_format: 'csv' to store iterations in iterations.csv (spotpy), 'sqlite' for an
+        IterationsDatabase in iterations.db
+        :param checkpoint: Checkpoint in which runs are logged, so that the calibration can be resumed. None to not log
+        :param distributed: dictionary of keyword arguments of the Broker (address, authkey, heartbeat_timeout, ...)
         """
 
         # where to store optimization results
         self.temp_folder = temp_folder
-        self.database_path = join(temp_folder, 'iterations.csv')
+        self.database = None
+        self.algorithm = algorithm
+        self.parallel = parallel
+        self.checkpoint = checkpoint
+        if iterations_format == 'sqlite':
+            self.database_path = join(temp_folder, 'iterations.db')
+            # with a checkpoint, the iterations of a completed calibration are kept until it is run again
+            self.database = IterationsDatabase(self.database_path,
+                                               sorted(cal_params, key=lambda k: cal_params[k]['rank']),
+                                               append=checkpoint is not None)
+        else:
+            self.database_path = join(temp_folder, 'iterations.csv')
+        # iterations loaded for plotting and finding optimal parameters
+        self.iteration_data = None
         # set up spotpy calibrator
         self.cal_params = cal_params
-        self.spotpy_setup = SpotpySwmmSetup(model, cal_params, obj_fun)
+        self.spotpy_setup = SpotpySwmmSetup(model, cal_params, obj_fun, database=self.database,
+                                            run_log=checkpoint.runs if checkpoint is not None else None)
         # do not save the simulation because simulation results are data frames
         # and do not support saving at this point
-        self.sampler = getattr(spotpy.algorithms, algorithm)(
+        samplers = {'surrogate': SurrogateSampler, 'async_de': AsyncSampler}
+        sampler = samplers[algorithm] if algorithm in samplers else getattr(spotpy.algorithms, algorithm)
+        self.sampler = sampler(
             self.spotpy_setup,
             dbname=os.path.splitext(self.database_path)[0],
-            dbformat=os.path.splitext(self.database_path)[1][1:],  # result should be 'csv'
-            parallel='seq',
+            # result should be 'csv', or 'custom' to save iterations through the setup into the database
+            dbformat='custom' if self.database is not None else os.path.splitext(self.database_path)[1][1:],
+            parallel='seq' if parallel in ['pool', 'distributed'] else parallel,
             alt_objfun=None,  # https://github.com/thouska/spotpy/issues/161
-            save_sim=False)
+            save_sim=False,
+            # store parameters exactly, so that re-running the best parameter sets reproduces (and can reuse)
+            # the simulations of the calibration
+            db_precision=np.float64)
+        if parallel == 'pool':
+            # replace the sequential repeater with a process pool of the requested size
+            self.sampler.repeat = ForEach(self.sampler.simulate, processes=processes)
+        elif parallel == 'distributed':
+            self.sampler.repeat = Broker(self.sampler.simulate, workers=processes, **(distributed or {}))
         # store convergence criteria
         self.convergence_criteria = None
 
@@ -48,14 +88,65 @@ class Optimizer(object):
         not be accepted
         :param kwargs: keyword arguments as defined in spotpy.algorithms.sceua.sample
         """
+        self.iteration_data = None
+        if self.checkpoint is not None:
+            self.checkpoint.start(np.random.get_state(), self.algorithm, self.cal_params, repetitions, kwargs,
+                                  workers=getattr(self.sampler.repeat, 'size', 1))
+        self.sample(repetitions, **kwargs)
+
+    def resume(self):
+        """
+        Continues the calibration of the checkpoint where it stopped: runs logged before are replayed
+        without simulating them, see Checkpoint. The sampler reaches the state in which it stopped only if it does
+        not depend on the order in which runs complete
+        :raises ValueError: if there is no checkpoint, it was made with other settings, or the asynchronous sampler
+        runs on several processes
+        """
+        if self.algorithm == 'async_de' and self.parallel in ['pool', 'distributed']:
+            raise ValueError('The asynchronous sampler depends on the order in which runs complete on the {} '
+                             'workers, its calibrations can only be resumed with parallel = \'seq\''.format(
+                                 self.parallel))
+        if not self.checkpoint.load():
+            raise ValueError('There is no checkpoint to resume in {}'.format(self.temp_folder))
+        self.checkpoint.check(self.algorithm, self.cal_params, workers=getattr(self.sampler.repeat, 'size', 1))
+        if self.checkpoint.is_complete('calibration'):
+            print('The calibration is complete')
+            return
+        self.iteration_data = None
+        self.spotpy_setup.replayed_runs = self.checkpoint.runs.read()
+        print('Resuming the calibration, {} logged runs are replayed'.format(len(self.spotpy_setup.replayed_runs)))
+        np.random.set_state(self.checkpoint.state['random_state'])
+        self.sample(self.checkpoint.state['repetitions'], **self.checkpoint.state['kwargs'])
+        self.spotpy_setup.replayed_runs = {}
+
+    def sample(self, repetitions, **kwargs):
+        if self.database is not None and self.checkpoint is not None:
+            self.database.clear()
         self.convergence_criteria = self.sampler.sample(repetitions, **kwargs)
+        if self.database is not None:
+            self.database.flush()
+        if self.checkpoint is not None:
+            self.checkpoint.complete('calibration')
+
+    def iterations(self):
+        """Returns all iterations, loaded once after each run"""
+        if self.iteration_data is None:
+            if self.database is not None:
+                self.iteration_data = self.database.read()
+            else:
+                self.iteration_data = pd.read_csv(self.database_path, sep=',', float_precision='round_trip')
+        return self.iteration_data
 
     def plot(self):
-        """plots scatter and time series of calibration run
+        """plots scatter and time series of calibration run, drawn from the iterations file (see PlotQueue)
 
         """
-        plot_chain(self.database_path, self.temp_folder)
-        plot_density(self.database_path, self.temp_folder, self.cal_params)
+        plots = get_plot_queue()
+        database_path = os.path.abspath(self.database_path)
+        temp_folder = os.path.abspath(self.temp_folder)
+        plots.submit('chain', temp_folder, database_path=database_path, temp_folder=temp_folder)
+        plots.submit('density', temp_folder, database_path=database_path, temp_folder=temp_folder,
+                     cal_params=self.cal_params)
 
     def getOptimalParams(self, how_many:int=50):
         """Returns optimal parameters and cost as dictionary
@@ -64,13 +155,16 @@ class Optimizer(object):
         :return:
         """
         # Load calibration chain and find optimal for like1
-        cal_data = pd.read_csv(self.database_path, sep=',')
-        # sort by cost and retain best
-        cal_data = cal_data.sort_values('like1', ascending=False)[:how_many]
+        if self.database is not None and self.iteration_data is None:
+            # the database sorts by cost and returns the best
+            cal_data = self.database.best(how_many)
+        else:
+            # sort by cost and retain best
+            cal_data = self.iterations().sort_values('like1', ascending=False)[:how_many]
         run_numbers = list(cal_data.index)
         calibration_errors = list(cal_data['like1'])
         # drop cost
-        cal_data.drop(['like1', 'chain'], axis=1, inplace=True)
+        cal_data = cal_data.drop(['like1', 'chain'], axis=1)
         # rename columns
         rename_dict = {}
         for k, p in self.cal_params.items():
@@ -7,12 +7,17 @@ from os.path import join
 # self is an optimizer as defined in optimizer.py
 
 
-def plot_chain(database_path, temp_folder):
+def plot_chain(database_path, temp_folder, data=None, max_points=1000):
     sns.set(style="ticks")
 
-    data = pd.read_csv(database_path, sep=',')
+    # data: iterations if already loaded, otherwise they are read from the database
+    data = pd.read_csv(database_path, sep=',') if data is None else data.copy()
 
     data['iteration'] = data.index
+    # long chains are thinned to every n-th iteration, keeping the last one
+    step = -(-len(data) // max_points)
+    if step > 1:
+        data = data.iloc[sorted(set(range(0, len(data), step)) | {len(data) - 1})]
 
     # reshape data
     data_reshaped = data.melt(id_vars=['iteration', 'chain'], value_name='param_value', var_name='param_name')
@@ -34,14 +39,18 @@ def plot_chain(database_path, temp_folder):
 
 
 # plot parameter distributions
-def plot_density(database_path, temp_folder, cal_params, uselast: int = 200):
+def plot_density(database_path, temp_folder, cal_params, uselast: int = 200, data=None, max_points=500):
     sns.set(style="dark")
 
-    # read data
-    data = pd.read_csv(database_path, sep=',')
+    # read data, unless already loaded
+    data = pd.read_csv(database_path, sep=',') if data is None else data.copy()
     data['iteration'] = data.index
-    # remove burn-in
-    data = data.iloc[-uselast:]
+    # remove burn-in, None to keep all iterations
+    if uselast is not None:
+        data = data.iloc[-uselast:]
+    # the density estimates take time in proportion to the number of points, they are estimated from a sample
+    if len(data) > max_points:
+        data = data.sample(max_points, random_state=0).sort_index()
 
     variables = ['par' + k for k, p in cal_params.items()]
     names = [p['display_name'] for k, p in cal_params.items()]
@@ -0,0 +1,243 @@
+import copy
+import multiprocessing
+import queue
+
+import numpy as np
+from .instrumentation import get_instrumentation
+from .spotpy_setup import attach_evaluation
+
+# the process function (bound simulate method of a spotpy sampler) held by each worker process
+_worker_process = None
+
+
+def _init_worker(process):
+    global _worker_process
+    _worker_process = process
+    attach_evaluation(process.__self__)
+    # forked workers start with what the parent recorded so far
+    get_instrumentation().reset()
+
+
+def _run_job(task):
+    phase, seed, job = task
+    # the sampler in the worker is a copy, so the phase has to travel with every job
+    _worker_process.__self__.repeat.phase = phase
+    # seed per job so that random draws inside a job (e.g. SCE-UA complex evolution)
+    # do not depend on which worker happens to pick it up
+    np.random.seed(seed)
+    result = _worker_process(job)
+    # send timings and counters of the job to the parent process
+    return result, get_instrumentation().collect()
+
+
+class _WorkerProcess(multiprocessing.Process):
+    """Pool worker that is not a daemon, so that it can start processes of its own (e.g. the EventPool of a
+    MultiEventModel)"""
+
+    @property
+    def daemon(self):
+        return False
+
+    @daemon.setter
+    def daemon(self, daemon):
+        pass
+
+
+def _worker_context():
+    # the default context, starting pool workers that are not daemons. They exit when the pool is closed
+    context = copy.copy(multiprocessing.get_context())
+    context.Process = _WorkerProcess
+    return context
+
+
+class ForEach(object):
+    """Repeater that runs spotpy jobs on a process pool of user defined size, as those of spotpy.parallel"""
+
+    def __init__(self, process, processes=None):
+        """
+        :param process: function processing a job, usually the simulate method of a spotpy sampler
+        :param processes: number of worker processes. Defaults to the number of cores
+        """
+        self.process = process
+        self.size = processes or multiprocessing.cpu_count()
+        self.phase = None
+        self.pool = None
+        self.seed = None
+        self.job_count = 0
+        # results of submitted jobs, in the order in which they complete
+        self.completed = None
+        self.in_flight = 0
+
+    def __getstate__(self):
+        # the pool and the queue cannot be sent to the workers
+        state = self.__dict__.copy()
+        state['pool'] = None
+        state['completed'] = None
+        return state
+
+    def is_idle(self):
+        return False
+
+    def start(self):
+        if self.pool is None:
+            # the sampler is sent once. On Windows, scripts using the pool need `if __name__ == '__main__':`
+            self.pool = _worker_context().Pool(self.size, initializer=_init_worker, initargs=(self.process,))
+        if self.seed is None:
+            # derive seeds from the sampler's random state without consuming any draws
+            self.seed = int(np.random.get_state()[1][0])
+
+    def terminate(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def setphase(self, phasename):
+        self.phase = phasename
+
+    def tasks(self, jobs):
+        for job in jobs:
+            self.job_count += 1
+            yield self.phase, (self.seed + self.job_count) % 2 ** 32, job
+
+    def __call__(self, jobs):
+        self.start()
+        instrumentation = get_instrumentation()
+        for result, recorded in self.pool.imap(_run_job, self.tasks(jobs)):
+            instrumentation.merge(recorded)
+            yield result
+
+    def submit(self, job):
+        """Starts a job without waiting for it, its result is returned by next_completed"""
+        self.start()
+        if self.completed is None:
+            self.completed = queue.Queue()
+        # the callbacks run in a thread of the pool, they only hand the outcome to the sampler's thread
+        self.pool.apply_async(_run_job, (next(self.tasks([job])),),
+                              callback=self.completed.put, error_callback=self.completed.put)
+        self.in_flight += 1
+
+    def next_completed(self):
+        """Waits for the next submitted job to complete and returns its result"""
+        outcome = self.completed.get()
+        self.in_flight -= 1
+        if isinstance(outcome, BaseException):
+            raise outcome
+        result, recorded = outcome
+        get_instrumentation().merge(recorded)
+        return result
+
+
+# the models and objective function of a batch, held by each worker process
+_batch_models = None
+_batch_obj_fun = None
+_batch_terms = False
+
+
+def _init_batch(models, obj_fun, terms=False):
+    global _batch_models, _batch_obj_fun, _batch_terms
+    _batch_models, _batch_obj_fun, _batch_terms = models, obj_fun, terms
+    get_instrumentation().reset()
+
+
+def evaluate_run(model, obj_fun, params, keep_simulation=False):
+    """Simulates a model with named parameters and evaluates it against its validation observations"""
+    simulation = model.run(named_model_params=params, obs_list=model.obs_config_validation)
+    performance = obj_fun.evaluate(simulation=simulation, evaluation=model.obs_validation)
+    return performance, simulation if keep_simulation else None
+
+
+def evaluate_terms(model, obj_fun, params, keep_simulation=False):
+    """Simulates a model with named parameters and evaluates it against each of the available observations"""
+    simulation = model.run(named_model_params=params, obs_list=list(model.observations.columns))
+    terms = obj_fun.terms(simulation=simulation, evaluation=model.observations)
+    return terms, simulation if keep_simulation else None
+
+
+def _run_batch_job(job):
+    model_index, params, keep_simulation = job
+    evaluate = evaluate_terms if _batch_terms else evaluate_run
+    performance, simulation = evaluate(_batch_models[model_index], _batch_obj_fun, params, keep_simulation)
+    return performance, simulation, get_instrumentation().collect()
+
+
+def run_batch(models, obj_fun, jobs, processes=None, terms=False):
+    """
+    Evaluates simulation jobs, on a process pool if there is more than one process
+    :param models: list of SwmmModel, sent to each worker once
+    :param obj_fun: ObjectiveFunction used to evaluate the simulations
+    :param jobs: list of (model index, named parameters, whether to return the simulation)
+    :param processes: number of worker processes. Defaults to the number of cores
+    :param terms: True to evaluate each observation of the models separately (see evaluate_terms) instead of
+    the validation observations
+    :return: list of (performance, simulation or None), in the order of the jobs. With terms, the performance
+    is a dictionary of the objective function value of each observation
+    """
+    processes = min(processes or multiprocessing.cpu_count(), len(jobs))
+    if processes <= 1:
+        evaluate = evaluate_terms if terms else evaluate_run
+        return [evaluate(models[i], obj_fun, params, keep) for i, params, keep in jobs]
+    # models and objective function are sent together, the workers align the observations of the models once
+    with multiprocessing.Pool(processes, initializer=_init_batch, initargs=(models, obj_fun, terms)) as pool:
+        outcomes = pool.map(_run_batch_job, jobs, chunksize=1)
+    instrumentation = get_instrumentation()
+    for _, _, recorded in outcomes:
+        instrumentation.merge(recorded)
+    return [(performance, simulation) for performance, simulation, _ in outcomes]
+
+
+# the event models of a MultiEventModel, held by each worker process
+_event_models = None
+
+
+def _init_events(models):
+    global _event_models
+    _event_models = models
+    get_instrumentation().reset()
+
+
+def _run_event(job):
+    model_index, params, named_model_params, obs_list = job
+    simulation = _event_models[model_index].run(*params, named_model_params=named_model_params, obs_list=obs_list)
+    return simulation, get_instrumentation().collect()
+
+
+class EventPool(object):
+    """Process pool that runs one parameter set on several event models at once"""
+
+    def __init__(self, models, processes=None):
+        """
+        :param models: list of SwmmModel
+        :param processes: number of worker processes. Defaults to the number of models
+        """
+        self.models = models
+        self.size = processes or len(models)
+        self.pool = None
+
+    def __getstate__(self):
+        # the pool cannot be sent to other processes
+        state = self.__dict__.copy()
+        state['pool'] = None
+        return state
+
+    def terminate(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def run(self, params, named_model_params=None, obs_list=None):
+        """Returns the simulation of each model, in the order of the models"""
+        jobs = [(i, params, named_model_params, obs_list) for i in range(len(self.models))]
+        # daemon processes (e.g. workers of run_batch) cannot start processes, they run the events one by one
+        if self.size <= 1 or multiprocessing.current_process().daemon:
+            return [model.run(*params, named_model_params=named_model_params, obs_list=obs_list)
+                    for model in self.models]
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(self.size, initializer=_init_events, initargs=(self.models,))
+        instrumentation = get_instrumentation()
+        simulations = []
+        for simulation, recorded in self.pool.map(_run_event, jobs, chunksize=1):
+            instrumentation.merge(recorded)
+            simulations.append(simulation)
+        return simulations
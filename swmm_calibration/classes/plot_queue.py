@@ -0,0 +1,140 @@
+import os
+import json
+import traceback
+import multiprocessing
+from multiprocessing import util
+
+import pandas as pd
+
+from .iterations_database import read_iterations
+
+PLOT_MODES = ['inline', 'background', 'data']
+# requests of plots that are rendered later, in the directory of the plots
+REQUESTS_FILE = 'plot_requests.jsonl'
+
+
+def render(request):
+    """
+    Draws a requested plot from the data files it refers to
+    :param request: dictionary with the kind of plot ('simulation', 'chain' or 'density') and the arguments
+    of the plotting function
+    """
+    kind, args = request['kind'], request['args']
+    try:
+        if kind == 'simulation':
+            from .model_plotting_utils import plot_simulation
+        else:
+            from .optimizer_plotting_utils import plot_chain, plot_density
+    except ImportError as e:
+        print('## {} not plotted: {}'.format(kind, e))
+        return
+    if kind == 'simulation':
+        data = pd.read_csv(args['data_file'], index_col=0, parse_dates=['datetime'])
+        plot_simulation(data, args['plot_title'], args['temp_folder'])
+    elif kind == 'chain':
+        plot_chain(args['database_path'], args['temp_folder'], data=read_iterations(args['database_path']))
+    elif kind == 'density':
+        plot_density(args['database_path'], args['temp_folder'], args['cal_params'],
+                     data=read_iterations(args['database_path']))
+    else:
+        raise ValueError('Unknown plot {}'.format(kind))
+
+
+def render_safely(request):
+    try:
+        render(request)
+    except Exception:
+        print('## {} plot failed:\n{}'.format(request['kind'], traceback.format_exc()))
+
+
+def _render_queue(queue):
+    # runs in the renderer process until it receives None
+    while True:
+        request = queue.get()
+        if request is None:
+            return
+        render_safely(request)
+
+
+def render_requests(directory):
+    """
+    Renders the plots requested in a directory with plot_mode = 'data', and in its subdirectories
+    :return: number of rendered plots
+    """
+    count = 0
+    for folder, _, files in os.walk(directory):
+        if REQUESTS_FILE not in files:
+            continue
+        filename = os.path.join(folder, REQUESTS_FILE)
+        with open(filename) as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        # a plot requested several times (e.g. by a resumed experiment) is drawn once, from its latest data
+        unique = {}
+        for request in requests:
+            unique[json.dumps(request, sort_keys=True)] = request
+        for request in unique.values():
+            render_safely(request)
+            count += 1
+        os.remove(filename)
+    return count
+
+
+class PlotQueue(object):
+    """Where models and optimizers request their plots, drawn 'inline', in the 'background' or saved as 'data'"""
+
+    def __init__(self, mode='inline'):
+        self.mode = mode
+        self.queue = None
+        self.process = None
+        # process that started the renderer, forked processes start their own
+        self.pid = None
+
+    def submit(self, kind, directory, **args):
+        """
+        Requests a plot
+        :param kind: 'simulation', 'chain' or 'density', see render
+        :param directory: where the plot is saved
+        :param args: arguments of the plotting function, with absolute paths
+        """
+        if self.mode not in PLOT_MODES:
+            raise ValueError('Unknown plot mode {}, use one of {}'.format(self.mode, ', '.join(PLOT_MODES)))
+        request = {'kind': kind, 'args': args}
+        if self.mode == 'data':
+            with open(os.path.join(directory, REQUESTS_FILE), 'a') as f:
+                f.write(json.dumps(request) + '\n')
+        elif self.mode == 'inline' or multiprocessing.current_process().daemon:
+            # processes of a pool cannot start a renderer
+            render(request)
+        else:
+            self.start()
+            self.queue.put(request)
+
+    def start(self):
+        if self.process is not None and self.pid == os.getpid():
+            return
+        self.queue = multiprocessing.Queue()
+        self.process = multiprocessing.Process(target=_render_queue, args=(self.queue,), name='plot renderer')
+        self.process.start()
+        self.pid = os.getpid()
+        # called when the process exits, also in processes of the multiprocessing module. Before the finalizer of
+        # the queue (priority 10), after which nothing more is sent to the renderer
+        util.Finalize(self, self.close, exitpriority=20)
+
+    def close(self):
+        """Waits until the requested plots are drawn and stops the renderer"""
+        if self.process is None or self.pid != os.getpid():
+            return
+        self.queue.put(None)
+        self.process.join()
+        self.process = None
+
+
+_plot_queue = None
+
+
+def get_plot_queue():
+    """Returns the plot queue of this process"""
+    global _plot_queue
+    if _plot_queue is None:
+        _plot_queue = PlotQueue()
+    return _plot_queue
@@ -0,0 +1,226 @@
+import os
+import abc
+import csv
+import time
+import sqlite3
+
+import numpy as np
+import pandas as pd
+from .atomic_file import atomic_write
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+# columns written for every result, followed by parameters (par_*) and metadata (meta_*)
+RESULT_COLUMNS = ['error', 'run_count', 'cal_err', 'type', 'time', 'meta_event_val']
+SQLITE_EXTENSIONS = ['.db', '.sqlite', '.sqlite3']
+
+
+class ResultsStore(abc.ABC):
+    """Where ExperimentRunner saves the evaluation results of an experiment, buffered and written in bulk"""
+
+    def __init__(self, filename, buffer_size=1000):
+        """
+        :param filename: file in which results are stored
+        :param buffer_size: number of rows buffered before they are written
+        """
+        self.filename = filename
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.buffer_experiments = []
+
+    def __getstate__(self):
+        # buffered rows stay with the process that created them
+        state = self.__dict__.copy()
+        state['buffer'] = []
+        state['buffer_experiments'] = []
+        return state
+
+    def append(self, results, experiment=None):
+        """
+        Adds results to the store
+        :param results: data frame, one row per evaluation
+        :param experiment: name of the experiment the results belong to
+        """
+        self.buffer.append(results)
+        self.buffer_experiments.append(experiment)
+        if sum(len(df) for df in self.buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Writes all buffered results"""
+        if not self.buffer:
+            return
+        buffer, experiments = self.buffer, self.buffer_experiments
+        self.buffer, self.buffer_experiments = [], []
+        self.write(buffer, experiments)
+
+    @abc.abstractmethod
+    def write(self, results, experiments):
+        """Writes a list of result data frames, with the name of the experiment of each"""
+
+    @abc.abstractmethod
+    def read(self, experiment=None, event_type=None, event_name=None):
+        """
+        Reads stored results, optionally only those of an experiment, event type or event
+        :param experiment: name of the experiment
+        :param event_type: 'calibration', 'validation' or 'uncalibrated'
+        :param event_name: name of the event (meta_event_val)
+        :return: data frame of results
+        """
+
+    def export_csv(self, filename, **filters):
+        """Writes (filtered, see read) results to a CSV file in the format of CsvResultsStore"""
+        self.read(**filters).to_csv(filename, index=False)
+
+
+class CsvResultsStore(ResultsStore):
+    """Results in a CSV file"""
+
+    def __init__(self, filename, buffer_size=1000):
+        ResultsStore.__init__(self, filename, buffer_size)
+        self.lock_file = filename + '.lock'
+
+    def lock(self):
+        """Waits for the lock and returns its handle, see unlock"""
+        # a lock of the operating system, which is released when a writer crashes
+        handle = open(self.lock_file, 'a')
+        try:
+            if fcntl is not None:
+                fcntl.flock(handle, fcntl.LOCK_EX)
+                return handle
+            while True:
+                try:
+                    handle.seek(0)
+                    msvcrt.locking(handle.fileno(), msvcrt.LK_NBLCK, 1)
+                    return handle
+                except OSError:
+                    time.sleep(0.05)
+        except BaseException:
+            handle.close()
+            raise
+
+    def unlock(self, handle):
+        # the lock file is kept: removing it would let the next writer lock a different file
+        if fcntl is not None:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_UNLCK, 1)
+        handle.close()
+
+    def write(self, results, experiments):
+        df = pd.concat(results, ignore_index=True, sort=False)
+        handle = self.lock()
+        try:
+            if not os.path.isfile(self.filename):
+                df.to_csv(self.filename, mode='w', header=True, index=False)
+                return
+            with open(self.filename, 'r', newline='') as f:
+                header = next(csv.reader(f), [])
+            if set(df.columns).issubset(header):
+                df.reindex(columns=header).to_csv(self.filename, mode='a', header=False, index=False)
+            else:
+                # rewrite the file with the new columns
+                existing = pd.read_csv(self.filename)
+                combined = pd.concat([existing, df], ignore_index=True, sort=False)
+                with atomic_write(self.filename, 'w', newline='') as f:
+                    combined.to_csv(f, header=True, index=False)
+        finally:
+            self.unlock(handle)
+
+    def read(self, experiment=None, event_type=None, event_name=None):
+        if experiment is not None:
+            raise ValueError('CSV results are not labelled by experiment, use a SQLite store')
+        if not os.path.isfile(self.filename):
+            return pd.DataFrame()
+        df = pd.read_csv(self.filename)
+        if event_type is not None:
+            df = df[df['type'] == event_type]
+        if event_name is not None:
+            df = df[df['meta_event_val'].astype(str) == str(event_name)]
+        return df
+
+
+class SqliteResultsStore(ResultsStore):
+    """Results in a SQLite database, labelled by experiment"""
+
+    def __init__(self, filename, buffer_size=1000, timeout=60):
+        """
+        :param timeout: seconds a writer waits for other writers
+        """
+        ResultsStore.__init__(self, filename, buffer_size)
+        self.timeout = timeout
+        with self.connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, experiment TEXT, '
+                               'error REAL, run_count INTEGER, cal_err REAL, type TEXT, time TEXT, '
+                               'meta_event_val TEXT)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_experiment ON results '
+                               '(experiment, type, meta_event_val)')
+            connection.execute('CREATE INDEX IF NOT EXISTS results_event ON results (type, meta_event_val)')
+        connection.close()
+
+    def connect(self):
+        connection = sqlite3.connect(self.filename, timeout=self.timeout, isolation_level=None)
+        connection.execute('PRAGMA busy_timeout = {}'.format(int(self.timeout * 1000)))
+        return connection
+
+    def columns(self, connection):
+        return [row[1] for row in connection.execute('PRAGMA table_info(results)')]
+
+    def write(self, results, experiments):
+        df = pd.concat([r.assign(experiment=e) for r, e in zip(results, experiments)], ignore_index=True, sort=False)
+        for column in df.columns:
+            if np.issubdtype(df[column].dtype, np.datetime64):
+                df[column] = df[column].astype(str)
+        rows = df.astype(object).where(df.notnull(), None).values.tolist()
+
+        connection = self.connect()
+        try:
+            # an immediate transaction keeps other writers out while columns are added
+            connection.execute('BEGIN IMMEDIATE')
+            existing = self.columns(connection)
+            for column in df.columns:
+                if column not in existing:
+                    column_type = 'REAL' if column.startswith('par_') else ''
+                    connection.execute('ALTER TABLE results ADD COLUMN "{}" {}'.format(column.replace('"', '""'),
+                                                                                     column_type))
+            connection.executemany('INSERT INTO results ({}) VALUES ({})'.format(
+                ', '.join('"{}"'.format(c.replace('"', '""')) for c in df.columns),
+                ', '.join(['?'] * len(df.columns))), rows)
+            connection.execute('COMMIT')
+        except BaseException:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            raise
+        finally:
+            connection.close()
+
+    def read(self, experiment=None, event_type=None, event_name=None):
+        conditions = []
+        values = []
+        for column, value in [('experiment', experiment), ('type', event_type), ('meta_event_val', event_name)]:
+            if value is not None:
+                conditions.append('{} = ?'.format(column))
+                values.append(str(value))
+        query = 'SELECT * FROM results'
+        if conditions:
+            query += ' WHERE ' + ' AND '.join(conditions)
+        connection = self.connect()
+        try:
+            df = pd.read_sql_query(query + ' ORDER BY id', connection, params=values)
+        finally:
+            connection.close()
+        return df.drop(columns='id')
+
+
+def open_results_store(filename, **kwargs):
+    """Opens the results store of a file: SQLite for .db, .sqlite and .sqlite3 files, otherwise CSV"""
+    if os.path.splitext(filename)[1].lower() in SQLITE_EXTENSIONS:
+        return SqliteResultsStore(filename, **kwargs)
+    return CsvResultsStore(filename, **kwargs)
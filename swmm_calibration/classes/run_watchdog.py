@@ -0,0 +1,132 @@
+import os
+import json
+import hashlib
+import datetime
+from collections import deque
+
+import numpy as np
+
+
+class Quarantine(object):
+    """Parameter sets whose simulations failed, so that they are rejected without running SWMM again"""
+
+    def __init__(self, filename=None, max_failures=1):
+        """
+        :param filename: where failures are recorded. None to keep them in memory only
+        :param max_failures: number of failures after which a parameter set is quarantined
+        """
+        self.filename = filename
+        self.max_failures = max_failures
+        self.failures = {}
+        self.loaded_size = 0
+
+    def refresh(self):
+        # read failures recorded since the last time, by this or other processes
+        if self.filename is None:
+            return
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            return
+        if size == self.loaded_size:
+            return
+        with open(self.filename, 'rb') as f:
+            f.seek(self.loaded_size)
+            content = f.read()
+        # only complete lines, a line may still be being written
+        complete = content[:content.rfind(b'\n') + 1]
+        for line in complete.decode().splitlines():
+            try:
+                key = json.loads(line)['key']
+            except (ValueError, KeyError):
+                continue
+            self.failures[key] = self.failures.get(key, 0) + 1
+        self.loaded_size += len(complete)
+
+    def is_quarantined(self, key):
+        self.refresh()
+        return self.failures.get(key, 0) >= self.max_failures
+
+    def record(self, key, kind, message, params, event_name=''):
+        """
+        Records a failed simulation
+        :param key: identifies the simulation, see RunWatchdog.key
+        :param kind: kind of failure, as RunFailure.kind
+        :param message: description of the failure
+        :param params: dictionary of the parameters of the simulation
+        :param event_name: name of the simulated event
+        """
+        if self.filename is None:
+            self.failures[key] = self.failures.get(key, 0) + 1
+            return
+        line = json.dumps({'key': key, 'kind': kind, 'message': message, 'event': event_name,
+                           'params': dict((k, float(v)) for k, v in params.items()),
+                           'time': str(datetime.datetime.now())})
+        # a single short write per line, so that lines of several processes are not mixed
+        with open(self.filename, 'a') as f:
+            f.write(line + '\n')
+        self.refresh()
+
+    def __len__(self):
+        self.refresh()
+        return sum(1 for count in self.failures.values() if count >= self.max_failures)
+
+
+class RunWatchdog(object):
+    """Supervises simulations: limits their run time, classifies failures and quarantines parameter sets"""
+
+    def __init__(self, timeout_factor=10, min_timeout=10, max_timeout=3600, warmup_runs=5, window=100,
+                 penalty=-10000, max_failures=1, quarantine_file=None):
+        """
+        :param timeout_factor: runs are stopped after this multiple of the median run time
+        :param min_timeout: lower limit of the time budget in seconds
+        :param max_timeout: upper limit of the time budget in seconds, also used until the median is known.
+        None for no limit
+        :param warmup_runs: number of successful runs after which the median run time is used
+        :param window: number of recent successful runs of which the median is taken
+        :param penalty: failed runs return the observations multiplied by this factor, as for rejected parameters
+        :param max_failures: number of failures after which a parameter set is rejected without simulating it
+        :param quarantine_file: where failed parameter sets are recorded. None to keep them in memory only
+        """
+        self.timeout_factor = timeout_factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.warmup_runs = warmup_runs
+        self.durations = deque(maxlen=window)
+        self.penalty = penalty
+        self.quarantine = Quarantine(quarantine_file, max_failures=max_failures)
+
+    def key(self, input_mod, forcing_digest):
+        """
+        Identifies a simulation by its model input and forcing data
+        :param input_mod: encoded content of the model input file
+        """
+        digest = hashlib.sha1(input_mod)
+        digest.update(forcing_digest.encode())
+        return digest.hexdigest()
+
+    def timeout(self):
+        """Time budget of the next run in seconds, None for no limit"""
+        if len(self.durations) < self.warmup_runs:
+            return self.max_timeout
+        timeout = max(self.timeout_factor * float(np.median(self.durations)), self.min_timeout)
+        if self.max_timeout is not None:
+            timeout = min(timeout, self.max_timeout)
+        return timeout
+
+    def succeeded(self, duration):
+        self.durations.append(duration)
+
+    def check(self, data):
+        """Returns the kind of failure of simulation results, None if they are valid"""
+        if not np.isfinite(data.values).all():
+            return 'non_finite'
+        return None
+
+    def failed(self, key, kind, message, params, event_name=''):
+        print('## failed ({}): {}'.format(kind, message))
+        self.quarantine.record(key, kind, message, params, event_name)
+
+    def statistics(self):
+        # failures per kind are counted by the instrumentation, which also covers worker processes
+        return {'quarantined': len(self.quarantine), 'timeout': self.timeout()}
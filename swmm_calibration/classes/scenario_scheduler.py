@@ -0,0 +1,212 @@
+import os
+import copy
+import json
+import hashlib
+import datetime
+import traceback
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from . import data_store
+from .experiment_runner import ExperimentRunner
+
+
+class Scenario(object):
+    """An experiment of a ScenarioScheduler: settings with overrides, metadata and arguments of the calibration"""
+
+    def __init__(self, spec, settings, directory, seed):
+        """
+        :param spec: dictionary with the name of the scenario, and optionally 'settings' (attributes of the
+        settings that are replaced), 'metadata' (experiment metadata saved with the results), 'run' (keyword
+        arguments of ExperimentRunner.run, e.g. repetitions), 'evaluation_count' and 'seed'
+        :param settings: settings class (or instance) the overrides are applied to
+        :param directory: directory of the scheduler, the experiment is run in a subdirectory named after the scenario
+        :param seed: seed of the random numbers of the calibration, if the specification has none
+        """
+        self.name = spec['name']
+        self.spec = spec
+        # the calibration does not depend on the process it runs in, or on the other scenarios
+        self.seed = spec.get('seed', seed)
+        self.directory = os.path.join(directory, str(self.name))
+        # an instance, so that overrides do not change the settings class and it can be pickled
+        self.settings = settings() if isinstance(settings, type) else copy.deepcopy(settings)
+        for key, value in spec.get('settings', {}).items():
+            setattr(self.settings, key, copy.deepcopy(value))
+        # tasks of the scenario may run in different processes, they find the calibration through its checkpoint
+        self.settings.checkpoint = True
+        cache = getattr(self.settings, 'simulation_cache', None)
+        if cache is not None and cache.get('directory') is None:
+            # simulations are shared by all scenarios
+            self.settings.simulation_cache = dict(cache, directory=os.path.join(directory, 'simulation_cache'))
+        self.digest = hashlib.sha1(repr(sorted((str(k), repr(v)) for k, v in spec.items())).encode()).hexdigest()
+
+    def runner(self, output_file, processes):
+        """Creates the ExperimentRunner of the scenario, with `processes` worker processes"""
+        settings = copy.deepcopy(self.settings)
+        settings.processes = processes
+        return ExperimentRunner(data_directory=self.directory, output_file=output_file, settings=settings,
+                                experiment_metadata=self.spec.get('metadata', {}), experiment_name=self.name,
+                                evaluation_count=self.spec.get('evaluation_count', 50))
+
+    def data_files(self):
+        """Forcing and observation data files read by the experiment"""
+        return [self.settings.forcing_data_file] + sorted(set(obs['data_file']
+                                                              for obs in self.settings.obs_available.values()))
+
+
+class ScenarioTask(object):
+    """Calibration of a scenario, or the validation on one of its events, which depends on the calibration"""
+
+    def __init__(self, scenario, kind, event=None, dependencies=()):
+        self.scenario = scenario
+        self.kind = kind
+        self.event = event
+        self.dependencies = list(dependencies)
+
+    @property
+    def key(self):
+        return self.scenario.name, self.kind, self.event['name'] if self.event is not None else None
+
+    def __str__(self):
+        return '{} of {}'.format(self.kind if self.event is None else '{} on event {}'.format(self.kind, self.event['name']),
+                                 self.scenario.name)
+
+
+def _run_task(task, output_file, processes):
+    # runs in a process of the scheduler
+    runner = task.scenario.runner(output_file, processes)
+    if task.kind == 'calibration':
+        # continues a calibration that was stopped, with the random state of its checkpoint
+        np.random.seed(task.scenario.seed)
+        runner.resume(validation=False, **task.scenario.spec.get('run', {}))
+    else:
+        runner.validate([task.event])
+    return task.key
+
+
+class ScenarioManifest(object):
+    """Finished tasks of a ScenarioScheduler, by scenario specification, in a JSON lines file"""
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def finished(self):
+        """Returns the set of (task key, scenario digest) of the finished tasks"""
+        finished = set()
+        if not os.path.isfile(self.filename):
+            return finished
+        with open(self.filename) as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                    finished.add(((entry['scenario'], entry['task'], entry['event']), entry['digest']))
+                except (ValueError, KeyError):
+                    continue
+        return finished
+
+    def record(self, task):
+        scenario, kind, event = task.key
+        line = json.dumps({'scenario': scenario, 'task': kind, 'event': event, 'digest': task.scenario.digest,
+                           'time': datetime.datetime.now().isoformat()})
+        with open(self.filename, 'a') as f:
+            f.write(line + '\n')
+
+
+class ScenarioScheduler(object):
+    """Runs the experiments of several scenarios concurrently"""
+
+    def __init__(self, settings, scenarios, directory, output_file, workers=None, concurrent=None):
+        """
+        :param settings: settings class shared by the scenarios
+        :param scenarios: list of scenario specifications, see Scenario
+        :param directory: where the experiments are run, each in a subdirectory named after its scenario
+        :param output_file: where the results of all scenarios are saved (see results_store)
+        :param workers: number of processes used at most, defaults to the number of cores
+        :param concurrent: number of tasks run at the same time, defaults to the number of scenarios, at most
+        `workers`. Scenarios calibrated with parallel = 'distributed' need different broker addresses
+        """
+        names = [spec['name'] for spec in scenarios]
+        if len(set(names)) != len(names):
+            raise ValueError('Scenario names are not unique: {}'.format(names))
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.directory = directory
+        self.output_file = output_file
+        # seeds are derived from the random state without consuming any draws, as in ForEach
+        seed = int(np.random.get_state()[1][0])
+        self.scenarios = [Scenario(spec, settings, directory, (seed + i) % 2 ** 32)
+                          for i, spec in enumerate(scenarios)]
+        self.workers = workers or os.cpu_count() or 1
+        self.concurrent = max(min(concurrent or len(self.scenarios), self.workers), 1)
+        self.manifest = ScenarioManifest(os.path.join(directory, 'manifest.jsonl'))
+
+    def plan(self):
+        """Returns the tasks of all scenarios, each after the tasks it depends on"""
+        tasks = []
+        for scenario in self.scenarios:
+            calibration = ScenarioTask(scenario, 'calibration')
+            tasks.append(calibration)
+            for event in scenario.settings.validation_events:
+                tasks.append(ScenarioTask(scenario, 'validation', event, dependencies=[calibration.key]))
+        return tasks
+
+    def load_data(self):
+        # parsed in this process, which the task processes are forked from, and cached on disk otherwise
+        store = data_store.get_data_store()
+        for scenario in self.scenarios:
+            store.persist = getattr(scenario.settings, 'data_cache', True)
+            for filename in scenario.data_files():
+                store.read(filename)
+
+    def run(self):
+        """
+        Runs all tasks that are not finished
+        :return: dictionary of the keys (scenario, task, event) of the tasks that finished, failed and were skipped
+        because a task they depend on failed
+        """
+        tasks = self.plan()
+        finished = self.manifest.finished()
+        done = set(task.key for task in tasks if (task.key, task.scenario.digest) in finished)
+        if done:
+            print('{} of {} tasks are finished already'.format(len(done), len(tasks)))
+        failed = set()
+        processes = max(self.workers // self.concurrent, 1)
+        print('Running {} scenarios, {} tasks at a time with {} processes each'.format(
+            len(self.scenarios), self.concurrent, processes))
+        self.load_data()
+
+        running = {}
+        with ProcessPoolExecutor(max_workers=self.concurrent) as executor:
+            while True:
+                started = set(task.key for task in running.values())
+                for task in tasks:
+                    if len(running) >= self.concurrent:
+                        break
+                    if task.key in done or task.key in failed or task.key in started:
+                        continue
+                    if all(key in done for key in task.dependencies):
+                        print('Starting the {}'.format(task))
+                        running[executor.submit(_run_task, task, self.output_file, processes)] = task
+                        started.add(task.key)
+                if not running:
+                    break
+                completed, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                for future in completed:
+                    task = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        print('## the {} failed:\n{}'.format(task, traceback.format_exc()))
+                        failed.add(task.key)
+                    else:
+                        print('Finished the {}'.format(task))
+                        self.manifest.record(task)
+                        done.add(task.key)
+
+        skipped = set(task.key for task in tasks) - done - failed
+        if failed or skipped:
+            print('## {} tasks failed, {} were skipped because a task they depend on failed'.format(
+                len(failed), len(skipped)))
+        return {'finished': sorted(done, key=str), 'failed': sorted(failed, key=str),
+                'skipped': sorted(skipped, key=str)}
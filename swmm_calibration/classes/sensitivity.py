@@ -0,0 +1,177 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+METHODS = ['morris', 'fast']
+
+
+def ordered_parameters(cal_params):
+    """Names of the calibration parameters, in the order of their rank"""
+    return sorted(cal_params, key=lambda k: cal_params[k]['rank'])
+
+
+def scale(unit_samples, cal_params):
+    """
+    Maps samples of the unit hypercube to the bounds of the parameters
+    :param unit_samples: array with one row per sample and one column per parameter, in the order of their rank
+    :return: list of dictionaries of named model parameters
+    """
+    names = ordered_parameters(cal_params)
+    low = np.array([cal_params[name]['bounds'][0] for name in names], dtype=np.float64)
+    high = np.array([cal_params[name]['bounds'][1] for name in names], dtype=np.float64)
+    values = low + unit_samples * (high - low)
+    return [dict(zip(names, (float(v) for v in row))) for row in values]
+
+
+def morris_samples(parameter_count, trajectories=10, levels=4):
+    """
+    One-at-a-time trajectories of the Morris method, on a grid of `levels` values per parameter of the unit
+    hypercube. Each trajectory changes every parameter once, by delta = levels / (2 (levels - 1))
+    :return: array of trajectories * (parameter_count + 1) rows, the points of each trajectory one after the other
+    """
+    delta = levels / (2. * (levels - 1))
+    # starting values from which a step of delta stays in the unit interval
+    grid = np.arange(levels) / (levels - 1.)
+    grid = grid[grid <= 1 - delta + 1e-9]
+    points = []
+    for _ in range(trajectories):
+        x = np.random.choice(grid, parameter_count)
+        directions = np.random.choice([-1, 1], parameter_count)
+        # steps downwards start at the upper value
+        x = np.where(directions < 0, x + delta, x)
+        points.append(x.copy())
+        for i in np.random.permutation(parameter_count):
+            x[i] += directions[i] * delta
+            points.append(x.copy())
+    return np.array(points)
+
+
+def morris_indices(unit_samples, outputs):
+    """
+    Elementary effects of the parameters on an output, see morris_samples. Effects are changes of the output
+    over the whole range of a parameter
+    :param unit_samples: array returned by morris_samples
+    :param outputs: output of each sample
+    :return: per parameter (in the order of the columns), arrays of mu (mean effect), mu_star (mean absolute
+    effect, the measure of importance) and sigma (standard deviation, large for interactions and non-linear effects)
+    """
+    parameter_count = unit_samples.shape[1]
+    points = unit_samples.reshape(-1, parameter_count + 1, parameter_count)
+    outputs = np.asarray(outputs, dtype=np.float64).reshape(-1, parameter_count + 1)
+    effects = np.empty((points.shape[0], parameter_count))
+    for t in range(points.shape[0]):
+        steps = np.diff(points[t], axis=0)
+        changed = np.argmax(np.abs(steps), axis=1)
+        effects[t, changed] = np.diff(outputs[t]) / steps[np.arange(parameter_count), changed]
+    return effects.mean(axis=0), np.abs(effects).mean(axis=0), effects.std(axis=0, ddof=1 if len(effects) > 1 else 0)
+
+
+def fast_frequencies(parameter_count, sample_count, harmonics=4):
+    # frequency of the studied parameter, and frequencies of the others, low enough not to interfere with its harmonics
+    omega = np.zeros(parameter_count, dtype=int)
+    omega[0] = math.floor((sample_count - 1) / (2. * harmonics))
+    m = math.floor(omega[0] / (2. * harmonics))
+    if m >= parameter_count - 1:
+        omega[1:] = np.floor(np.linspace(1, m, parameter_count - 1))
+    else:
+        omega[1:] = np.arange(parameter_count - 1) % max(m, 1) + 1
+    return omega
+
+
+def fast_samples(parameter_count, sample_count=65, harmonics=4):
+    """
+    Search curves of the extended FAST method (Saltelli et al. 1999), one per parameter, through the unit hypercube
+    :param sample_count: samples per curve, more than 4 * harmonics ** 2
+    :return: array of parameter_count * sample_count rows, the curve of each parameter after the other
+    """
+    if sample_count <= 4 * harmonics ** 2:
+        raise ValueError('FAST needs more than {} samples per parameter'.format(4 * harmonics ** 2))
+    omega = fast_frequencies(parameter_count, sample_count, harmonics)
+    s = (2 * math.pi / sample_count) * np.arange(sample_count)
+    samples = np.empty((parameter_count * sample_count, parameter_count))
+    for i in range(parameter_count):
+        frequencies = np.empty(parameter_count, dtype=int)
+        frequencies[i] = omega[0]
+        frequencies[np.arange(parameter_count) != i] = omega[1:]
+        phase = 2 * math.pi * np.random.rand(parameter_count)
+        curve = .5 + np.arcsin(np.sin(np.outer(s, frequencies) + phase)) / math.pi
+        samples[i * sample_count:(i + 1) * sample_count] = curve
+    return samples
+
+
+def fast_indices(parameter_count, outputs, harmonics=4):
+    """
+    First order and total sensitivity indices of the extended FAST method, see fast_samples
+    :return: per parameter, arrays of the first order indices (share of the output variance explained by the
+    parameter alone) and total indices (including its interactions)
+    """
+    outputs = np.asarray(outputs, dtype=np.float64).reshape(parameter_count, -1)
+    sample_count = outputs.shape[1]
+    omega = fast_frequencies(parameter_count, sample_count, harmonics)[0]
+    first, total = np.empty(parameter_count), np.empty(parameter_count)
+    for i in range(parameter_count):
+        spectrum = (np.abs(np.fft.fft(outputs[i])[1:int(math.ceil(sample_count / 2.))]) / sample_count) ** 2
+        variance = 2 * spectrum.sum()
+        if variance == 0:
+            # the output does not change along the curve
+            first[i] = total[i] = 0
+            continue
+        first[i] = 2 * spectrum[np.arange(1, harmonics + 1) * omega - 1].sum() / variance
+        total[i] = 1 - 2 * spectrum[np.arange(int(omega // 2))].sum() / variance
+    return first, total
+
+
+def samples(method, parameter_count, count):
+    """
+    Points of the unit hypercube at which the model is run
+    :param method: 'morris' or 'fast'
+    :param count: number of trajectories (Morris) or samples per parameter (FAST)
+    """
+    if method == 'morris':
+        return morris_samples(parameter_count, trajectories=count)
+    if method == 'fast':
+        return fast_samples(parameter_count, sample_count=count)
+    raise ValueError('Unknown sensitivity analysis method {}, use one of {}'.format(method, ', '.join(METHODS)))
+
+
+def indices(method, cal_params, unit_samples, outputs):
+    """
+    Sensitivity indices of each parameter on each output
+    :param outputs: data frame with one row per sample and one column per output (e.g. the objective function
+    of each observation)
+    :return: data frame with the columns parameter, observation and the indices of the method: mu, mu_star,
+    sigma (Morris), first_order, total (FAST). 'importance' (mu_star or total) is normalized by its largest
+    value for the observation, so that observations of different units can be compared
+    """
+    names = ordered_parameters(cal_params)
+    rows = []
+    for observation in outputs.columns:
+        values = outputs[observation].values
+        if method == 'morris':
+            mu, mu_star, sigma = morris_indices(unit_samples, values)
+            columns = {'mu': mu, 'mu_star': mu_star, 'sigma': sigma}
+            importance = mu_star
+        else:
+            first, total = fast_indices(len(names), values)
+            columns = {'first_order': first, 'total': total}
+            importance = total
+        largest = np.max(np.abs(importance))
+        for i, name in enumerate(names):
+            row = {'parameter': name, 'observation': observation}
+            row.update((key, value[i]) for key, value in columns.items())
+            row['importance'] = abs(importance[i]) / largest if largest > 0 else 0.
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def insensitive_parameters(sensitivity, observations, threshold=0.05):
+    """
+    Parameters whose importance (see indices) is below the threshold for every given observation
+    :param sensitivity: data frame returned by indices
+    :param observations: observations that are considered, e.g. those of the calibration
+    :return: list of parameter names, the least important first
+    """
+    selected = sensitivity[sensitivity['observation'].isin(observations)]
+    largest = selected.groupby('parameter', sort=False)['importance'].max().sort_values(kind='mergesort')
+    return [name for name, importance in largest.items() if importance < threshold]
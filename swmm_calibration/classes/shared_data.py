@@ -0,0 +1,71 @@
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+from .atomic_file import atomic_write
+
+
+class SharedArray(object):
+    """NumPy array in a memory-mapped .npy file, of which only the name is pickled"""
+
+    def __init__(self, filename):
+        """
+        :param filename: absolute path of the .npy file, see create
+        """
+        self.filename = filename
+        self.mapped = None
+
+    @classmethod
+    def create(cls, array, directory):
+        """
+        Writes an array to a file in a directory, if it is not there yet
+        :raises OSError: if the file cannot be written
+        """
+        array = np.ascontiguousarray(array)
+        directory = os.path.abspath(directory)
+        digest = hashlib.sha1(repr((array.dtype.str, array.shape)).encode())
+        digest.update(array.tobytes())
+        filename = os.path.join(directory, '{}.npy'.format(digest.hexdigest()[:16]))
+        if not os.path.exists(filename):
+            os.makedirs(directory, exist_ok=True)
+            # other processes never map a partial file
+            with atomic_write(filename) as f:
+                np.save(f, array, allow_pickle=False)
+        return cls(filename)
+
+    def __getstate__(self):
+        return {'filename': self.filename}
+
+    def __setstate__(self, state):
+        self.__init__(state['filename'])
+
+    def array(self):
+        """Read-only view of the array, None if the file cannot be mapped here (e.g. on another machine)"""
+        if self.mapped is None:
+            try:
+                self.mapped = np.load(self.filename, mmap_mode='r', allow_pickle=False).view(np.ndarray)
+            except (IOError, OSError, ValueError):
+                return None
+        return self.mapped
+
+
+class SharedFrame(object):
+    """Data frame with its values in a SharedArray. The labels are pickled with it, they are small next to
+    the values"""
+
+    def __init__(self, frame, directory):
+        """
+        :param frame: data frame with values of a single numeric type, e.g. observations
+        :param directory: where the values are kept, see SharedArray.create
+        """
+        self.values = SharedArray.create(frame.values, directory)
+        self.index = frame.index
+        self.columns = frame.columns
+
+    def frame(self):
+        """Data frame on a read-only view of the values, None if they cannot be mapped"""
+        values = self.values.array()
+        if values is None:
+            return None
+        return pd.DataFrame(values, index=self.index, columns=self.columns, copy=False)
@@ -0,0 +1,125 @@
+import os
+import hashlib
+import pickle
+from collections import OrderedDict
+from .atomic_file import atomic_write
+
+
+class SimulationCache(object):
+    """Content-addressed cache of simulation results. Cached results must not be modified"""
+
+    def __init__(self, max_items=1000, directory=None, max_disk_mb=500, quantize=None):
+        """
+        :param max_items: number of results kept in memory
+        :param directory: where results are also stored on disk. None to only cache in memory
+        :param max_disk_mb: size limit of the disk cache in megabytes. The least recently used results are removed
+        :param quantize: if given, parameter values are rounded to a grid with this fraction of the width of their
+        bounds (e.g. 0.01 for 100 steps) before simulating, so that nearly identical parameter sets share results.
+        The sampler records the parameters it proposed, which differ from the simulated ones by up to half a step
+        """
+        self.max_items = max_items
+        self.directory = directory
+        self.max_disk_bytes = max_disk_mb * 2 ** 20
+        self.quantize = quantize
+        self.memory = OrderedDict()
+        self.disk_bytes = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if directory is not None and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def quantize_parameters(self, model_params, cal_params):
+        """Rounds parameter values to the quantization grid of their bounds, keeping them within the bounds"""
+        if self.quantize is None:
+            return model_params
+        quantized = {}
+        for name, value in model_params.items():
+            low, high = cal_params[name]['bounds']
+            step = self.quantize * (high - low)
+            quantized[name] = min(max(low + round((value - low) / step) * step, low), high) if step > 0 else value
+        return quantized
+
+    def key(self, *parts):
+        digest = hashlib.sha1()
+        for part in parts:
+            if not isinstance(part, bytes):
+                part = repr(part).encode()
+            digest.update(part)
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.pickle')
+
+    def get(self, key):
+        """Returns the cached result for the key, or None"""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.memory_hits += 1
+            return self.memory[key]
+        if self.directory is not None:
+            try:
+                with open(self.path(key), 'rb') as f:
+                    data = pickle.load(f)
+                os.utime(self.path(key))  # mark as recently used
+            except (IOError, OSError, EOFError, pickle.UnpicklingError):
+                pass
+            else:
+                self.disk_hits += 1
+                self.remember(key, data)
+                return data
+        self.misses += 1
+        return None
+
+    def put(self, key, data):
+        self.remember(key, data)
+        if self.directory is not None:
+            # other processes never read a partial result
+            content = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+            with atomic_write(self.path(key)) as f:
+                f.write(content)
+            if self.disk_bytes is None:
+                self.disk_bytes = self.disk_usage()
+            self.disk_bytes += len(content)
+            if self.disk_bytes > self.max_disk_bytes:
+                self.evict()
+
+    def remember(self, key, data):
+        self.memory[key] = data
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items:
+            self.memory.popitem(last=False)
+
+    def entries(self):
+        return [e for e in os.scandir(self.directory) if e.name.endswith('.pickle')]
+
+    def disk_usage(self):
+        return sum(e.stat().st_size for e in self.entries())
+
+    def evict(self):
+        """Removes the least recently used results until the disk cache uses 90% of its limit"""
+        entries = sorted(self.entries(), key=lambda e: e.stat().st_mtime)
+        self.disk_bytes = sum(e.stat().st_size for e in entries)
+        for entry in entries:
+            if self.disk_bytes <= 0.9 * self.max_disk_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.disk_bytes -= size
+            except OSError:
+                # already removed by another process
+                pass
+
+    def statistics(self):
+        requests = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'requests': requests,
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / requests if requests else 0,
+            'memory_items': len(self.memory),
+            'disk_mb': (self.disk_bytes or 0) / 2 ** 20
+        }
@@ -1,22 +1,75 @@
+import numpy as np
 import spotpy
 
+from .instrumentation import get_instrumentation
+
+
+class EvaluatedRun(object):
+    """Stands in for the simulation of a run whose objective function value is already known: replayed from
+    the run log of a checkpoint, or evaluated by the remote worker that simulated it"""
+
+    def __init__(self, like):
+        self.like = like
+
+
+def attach_evaluation(sampler):
+    """
+    Replaces the observations of a sampler received from another process by those of its model, which map the
+    shared data of the sending process (see SwmmModel.share_data) instead of holding a copy
+    """
+    setup = getattr(sampler, 'setup', None)
+    if isinstance(setup, SpotpySwmmSetup) and hasattr(sampler, 'evaluation'):
+        sampler.evaluation = setup.evaluation()
+
 
 class SpotpySwmmSetup(object):
-    def __init__(self, model, calib_params, objective_function):
+    def __init__(self, model, calib_params, objective_function, database=None, run_log=None):
         self.model = model
-        self.objectivefunction = objective_function
+        self.objective_function = objective_function
+        # IterationsDatabase used by spotpy if the database format is 'custom'
+        self.database = database
+        # RunLog of a checkpoint, to which every run is added
+        self.run_log = run_log
+        # objective function values of the runs of an interrupted calibration, by parameter tuple
+        self.replayed_runs = {}
         self.prior_dist = [None]*len(calib_params)
         # remap calibration parameters into list format
         for key, value in calib_params.items():
-            self.prior_dist[value['rank']] = spotpy.parameter.Uniform(key, value['bounds'][0], value['bounds'][1])
+            # the bounds are given, otherwise spotpy estimates them from random draws, which makes samplers
+            # that use them depend on the random state at this point
+            low, high = value['bounds']
+            self.prior_dist[value['rank']] = spotpy.parameter.Uniform(key, low, high, minbound=low, maxbound=high)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # the parameters draw with bound methods of numpy's global random state, which are unpickled (e.g. in
+        # remote workers) as methods of a copy of it: they are bound again, so that seeding numpy applies to them
+        for distribution in self.prior_dist:
+            distribution.rndfunc = getattr(np.random, distribution.rndfunc.__name__)
 
     def parameters(self):
         return spotpy.parameter.generate(self.prior_dist)
 
+    def save(self, objectivefunctions, parameter, simulations, chains=1):
+        self.database.save(objectivefunctions, parameter, chains=chains)
+
     def simulation(self, vector):
+        like = self.replayed_runs.get(tuple(float(v) for v in vector))
+        if like is not None:
+            get_instrumentation().count('replayed_runs')
+            return EvaluatedRun(like)
         simulations = self.model.run(*vector)
         return simulations
 
+    def objectivefunction(self, simulation, evaluation, params=None):
+        if isinstance(simulation, EvaluatedRun):
+            # logged where it was evaluated
+            return simulation.like
+        like = self.objective_function(simulation=simulation, evaluation=evaluation)
+        if self.run_log is not None and params is not None:
+            self.run_log.record(params[0], like)
+        return like
+
     def evaluation(self, evaldates=False, validation=False):
         if evaldates:
             return self.model.eval_dates
@@ -0,0 +1,159 @@
+import numpy as np
+import scipy.linalg
+from scipy.spatial.distance import cdist
+from spotpy.algorithms import _algorithm
+
+
+class RbfSurrogate(object):
+    """Cubic radial basis function interpolant with a linear tail, on parameters scaled to [0, 1]"""
+
+    def __init__(self, points, values, smoothing=1e-8):
+        """
+        :param points: array (points x parameters) of evaluated parameter sets, scaled to [0, 1]
+        :param values: objective function value of each point
+        :param smoothing: added to the diagonal, so that (nearly) duplicate points can be fitted
+        """
+        self.points = np.asarray(points, dtype=np.float64)
+        count, dimensions = self.points.shape
+        tail = np.hstack([np.ones((count, 1)), self.points])
+        system = np.zeros((count + dimensions + 1, count + dimensions + 1))
+        system[:count, :count] = cdist(self.points, self.points) ** 3 + smoothing * np.eye(count)
+        system[:count, count:] = tail
+        system[count:, :count] = tail.T
+        right_side = np.concatenate([values, np.zeros(dimensions + 1)])
+        try:
+            solution = scipy.linalg.solve(system, right_side, assume_a='sym')
+        except scipy.linalg.LinAlgError:
+            solution = np.linalg.lstsq(system, right_side, rcond=None)[0]
+        self.weights = solution[:count]
+        self.coefficients = solution[count:]
+
+    def __call__(self, points):
+        """Predicted objective function values at the points (array points x parameters, scaled)"""
+        return cdist(points, self.points) ** 3 @ self.weights + self.coefficients[0] + points @ self.coefficients[1:]
+
+
+class SurrogateSampler(_algorithm):
+    """Surrogate-assisted optimization with a stochastic RBF and DYCORS candidates (Regis & Shoemaker)"""
+
+    # weights of the predicted value against the distance to evaluated points, cycled through
+    score_weights = [0.3, 0.5, 0.8, 0.95]
+
+    def __init__(self, *args, **kwargs):
+        super(SurrogateSampler, self).__init__(*args, **kwargs)
+        self.points = []
+        self.values = []
+        self.surrogate = None
+
+    def evaluate(self, parameter_sets, lower, upper, chain):
+        """Runs the model for parameter sets scaled to [0, 1] and stores their objective function values"""
+        first = len(self.points)
+        jobs = ((first + i, lower + x * (upper - lower)) for i, x in enumerate(parameter_sets))
+        results = {}
+        for rep, randompar, simulations in self.repeat(jobs):
+            results[rep] = self.postprocessing(rep, randompar, simulations, chains=chain)
+        for i, x in enumerate(parameter_sets):
+            self.points.append(x)
+            like = results.get(first + i)
+            self.values.append(np.nan if like is None else like)
+
+    def fit(self):
+        values = np.array(self.values, dtype=np.float64)
+        # large values (e.g. penalties of failed runs) are clipped to the median, so they do not dominate the fit
+        finite = np.isfinite(values)
+        median = np.median(values[finite]) if finite.any() else 0.
+        values = np.where(finite, np.minimum(values, median), median)
+        self.surrogate = RbfSurrogate(np.array(self.points), values)
+
+    def candidates(self, count, sigma, best, evaluated, budget, initial):
+        """Perturbations of the best point, in a random subset of the parameters, and uniform points"""
+        dimensions = len(best)
+        # fewer parameters are perturbed as the budget is used up (DYCORS)
+        progress = np.log(evaluated - initial + 1) / np.log(max(budget - initial, 2))
+        probability = max(min(20. / dimensions, 1.) * (1 - progress), 1. / dimensions)
+        perturbed = np.random.rand(count, dimensions) < probability
+        perturbed[np.arange(count), np.random.randint(dimensions, size=count)] = True
+        points = best + perturbed * np.random.randn(count, dimensions) * sigma
+        # reflect at the bounds
+        points = np.abs(points)
+        points = np.where(points > 1, 2 - points, points).clip(0, 1)
+        uniform = np.random.rand(max(count // 10, 1), dimensions)
+        return np.vstack([points, uniform])
+
+    def select(self, candidates, batch_size, weight):
+        """Candidates with the best weighted score of predicted value and distance to evaluated points"""
+        predicted = self.surrogate(candidates)
+        spread = predicted.max() - predicted.min()
+        value_score = (predicted - predicted.min()) / spread if spread > 0 else np.zeros(len(candidates))
+        distances = cdist(candidates, np.array(self.points)).min(axis=1)
+        selected = []
+        for _ in range(min(batch_size, len(candidates))):
+            spread = distances.max() - distances.min()
+            distance_score = (distances.max() - distances) / spread if spread > 0 else np.zeros(len(candidates))
+            score = weight * value_score + (1 - weight) * distance_score
+            # candidates at evaluated or selected points are never chosen
+            score[distances < 1e-9] = np.inf
+            choice = int(np.argmin(score))
+            if not np.isfinite(score[choice]):
+                break
+            selected.append(candidates[choice])
+            distances = np.minimum(distances, np.linalg.norm(candidates - candidates[choice], axis=1))
+        return np.array(selected)
+
+    def sample(self, repetitions, initial_points=None, batch_size=None, candidates=None, refit_every=1,
+               sigma=0.2, **ignored):
+        """
+        :param repetitions: number of model runs
+        :param initial_points: size of the latin hypercube design. Defaults to 2 * (parameters + 1), at least 10
+        :param batch_size: parameter sets run per iteration. Defaults to the number of worker processes
+        :param candidates: parameter sets screened on the surrogate per iteration. Defaults to 100 per parameter
+        :param refit_every: number of iterations after which the surrogate is fitted again
+        :param sigma: initial standard deviation of the perturbations, relative to the parameter ranges
+        :param ignored: options of other algorithms (e.g. kstop, ngs of SCE-UA), not used
+        """
+        self.set_repetiton(repetitions)
+        if ignored:
+            print('## options not used by the surrogate sampler: {}'.format(', '.join(sorted(ignored))))
+        lower = np.array(self.parameter()['minbound'], dtype=np.float64)
+        upper = np.array(self.parameter()['maxbound'], dtype=np.float64)
+        dimensions = len(lower)
+        initial_points = min(initial_points or max(2 * (dimensions + 1), 10), repetitions)
+        batch_size = batch_size or getattr(self.repeat, 'size', 1)
+        candidates = candidates or min(100 * dimensions, 5000)
+        print('Starting the surrogate sampler with {} repetitions...'.format(repetitions))
+
+        # latin hypercube design
+        design = (np.random.rand(initial_points, dimensions) + np.arange(initial_points).reshape(-1, 1)) \
+            / initial_points
+        for column in design.T:
+            np.random.shuffle(column)
+        self.evaluate(design, lower, upper, chain=0)
+
+        sigma_max, sigma_min = sigma, sigma * 0.5 ** 6
+        successes = failures = iteration = 0
+        tolerance_failures = max(dimensions // batch_size, 4)
+        while len(self.points) < repetitions:
+            if self.surrogate is None or iteration % refit_every == 0:
+                self.fit()
+            values = np.array(self.values, dtype=np.float64)
+            best_value = np.nanmin(values) if np.isfinite(values).any() else np.inf
+            best = self.points[int(np.nanargmin(values))] if np.isfinite(values).any() else np.full(dimensions, .5)
+
+            pool = self.candidates(candidates, sigma, best, len(self.points), repetitions, initial_points)
+            batch = self.select(pool, min(batch_size, repetitions - len(self.points)),
+                                self.score_weights[iteration % len(self.score_weights)])
+            if len(batch) == 0:
+                break
+            self.evaluate(batch, lower, upper, chain=1)
+            iteration += 1
+
+            # adapt the perturbations: smaller after repeated failures to improve, larger after successes
+            batch_values = np.array(self.values[-len(batch):], dtype=np.float64)
+            improved = np.isfinite(batch_values).any() and \
+                np.nanmin(batch_values) < best_value - 1e-3 * abs(best_value)
+            successes, failures = (successes + 1, 0) if improved else (0, failures + 1)
+            if successes >= 3:
+                sigma, successes = min(2 * sigma, sigma_max), 0
+            if failures >= tolerance_failures:
+                sigma, failures = max(sigma / 2, sigma_min), 0
+        self.final_call()
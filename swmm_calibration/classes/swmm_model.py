@@ -1,32 +1,22 @@
 import os
-import subprocess
-from string import Template
+import time
+import hashlib
+from collections import OrderedDict
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
 from os.path import join
 from datetime import datetime
 from datetime import timedelta
-from swmmtoolbox import swmmtoolbox
+from .simulation_backend import SubprocessBackend, RunFailure
+from .model_template import CompiledTemplate
+from .data_store import get_data_store, read_floodx_file, resample_interpolate
+from .instrumentation import get_instrumentation
+from .plot_queue import get_plot_queue
+from .shared_data import SharedArray, SharedFrame
+from .atomic_file import atomic_write
 
-
-def read_floodx_file(evaluation_data_file):
-    return pd.read_csv(
-        filepath_or_buffer=evaluation_data_file,
-        index_col=0,
-        parse_dates=[0],
-        infer_datetime_format=True,
-        dayfirst=True,
-        sep=';')
-
-
-def resample_interpolate(data, period):
-    # aggregate per second, interpolate
-    data = data.resample(period)
-    data = data.mean()
-    data = data.resample(period)
-    return data.interpolate(method='linear')
+# observations that are kept in memory-mapped files, see share_data
+SHARED_FRAMES = ['observations', 'obs_validation', 'obs_calibration']
 
 
 class SwmmModel(object):
@@ -39,14 +29,16 @@ class SwmmModel(object):
     simulation = None  # where simulation is stored
     eval_data = None
     eval_dates = None
-    temp_model_counter = 0 # counter to ensure that swmm models run in parallel do not use the same .inp file
+    forcing_digest = None  # hash of the forcing data, part of the key of cached simulations
 
     def __init__(self, swmm_model_template, sim_start_dt, sim_end_dt,
                  forcing_data_file, initial_conditions,
                  obs_available, obs_config_calibration, obs_config_validation,
                  cal_params, temp_folder, sim_event_name='',
                  sim_reporting_step_sec=5, dt_format='%Y/%m/%d %H:%M:%S',
-                 swmm_exexcutable="C:/Program Files (x86)/EPA SWMM 5.1/swmm5.exe"):
+                 swmm_exexcutable="C:/Program Files (x86)/EPA SWMM 5.1/swmm5.exe", backend=None, cache=None,
+                 data_store=None, watchdog=None, hotstart=None, fixed_params=None, shared_data=False,
+                 float_format='{:.6g}'):
         """
         Initialized model instance with forcing data (inflow to experiment site)
         and evaluation data (water level in basement of house)
@@ -61,54 +53,127 @@ class SwmmModel(object):
         - cal_params: dict describing which parameters should be calibrated
         - sim_reporting_step: resolution at which simulation should be reported (simulation step is 1 second)
         - cal_params: physical parameter boundaries
+        - backend: SimulationBackend used to run the model. By default the SWMM executable is run as a subprocess
+        - cache: SimulationCache to reuse results of identical simulations. None to always simulate
+        - data_store: DataStore from which forcing and observation data are read. By default the store of the process
+        - watchdog: RunWatchdog that limits run times and penalizes failed runs. None to let failures raise RunFailure
+        - hotstart: dictionary with spinup_sec, parameters and max_files (see settings) to start runs from a hotstart
+          file saved after the spin-up. The spin-up is simulated once per combination of values of the listed
+          parameters and its results are reused. None to simulate every run from the initial conditions
+        - fixed_params: dictionary of calibration parameters that are held at a value, see fix_parameters
+        - shared_data: keep the observations and the forcing in memory-mapped files, which processes the model is
+          sent to map instead of receiving copies, see share_data
+        - float_format: format of the parameter values in the model input, e.g. '{:.6g}'. None for all digits
         """
         with open(swmm_model_template, 'r') as t:
-            self.swmm_model_template = Template(t.read())
+            self.template_text = t.read()
+        self.float_format = float_format
+        self.swmm_model_template = CompiledTemplate(self.template_text, float_format=float_format)
         self.sim_start_dt = datetime.strptime(sim_start_dt, dt_format)
         self.sim_end_dt = datetime.strptime(sim_end_dt, dt_format)
         self.sim_reporting_step = timedelta(seconds=sim_reporting_step_sec)
+        # time axis of the simulation results, the first report is one reporting step after the start
+        self.sim_datetimes = pd.date_range(self.sim_start_dt + self.sim_reporting_step, self.sim_end_dt,
+                                           freq=self.sim_reporting_step)
+        self.sim_index = pd.Index([str(t) for t in self.sim_datetimes], name='datetime')
         self.sim_event_name = sim_event_name
         self.cal_params = cal_params
+        self.fix_parameters(fixed_params)
         self.initial_conditions = initial_conditions
         self.obs_available = obs_available
         self.obs_config_calibration = obs_config_calibration
         self.obs_config_validation = obs_config_validation
         self.swmm_executable = swmm_exexcutable
+        self.backend = backend or SubprocessBackend(swmm_exexcutable)
+        self.cache = cache
+        self.data_store = data_store or get_data_store()
+        self.watchdog = watchdog
 
         # define where temporary results should be saved
         self.temp_folder = temp_folder
         self.temp_forcing_data_file = join(temp_folder, 'forcing_data_{}.txt'.format(self.sim_event_name))
+        self.created_run_directory = None
+
+        # fill in what is the same for every run, leaving only the calibration parameters to be rendered
+        self.template = self.compile_template()
+
+        # spin-up simulations, by event and values of the parameters that determine them
+        self.hotstart = hotstart
+        self.hotstarts = OrderedDict()
+        if hotstart is not None:
+            steps = int(hotstart['spinup_sec'] // self.sim_reporting_step.total_seconds())
+            self.spinup_end_dt = self.sim_start_dt + steps * self.sim_reporting_step
+            if not self.sim_start_dt < self.spinup_end_dt < self.sim_end_dt:
+                raise ValueError('The spin-up of {} s does not fit in the event'.format(hotstart['spinup_sec']))
+            self.spinup_template = self.compile_template(self.sim_start_dt, self.spinup_end_dt, hotstart='SAVE')
+            self.hotstart_template = self.compile_template(self.spinup_end_dt, self.sim_end_dt, hotstart='USE')
 
         # Read observation data and filter to fit experiment duration
         self.read_observations(obs_available)
 
         # Read forcing data and reformat
+        self.forcing_data_file = forcing_data_file
         self.read_forcing(forcing_data_file)
 
+        # memory-mapped files of the observations and the forcing, by name
+        self.shared = {}
+        if shared_data:
+            self.share_data()
+
+    def fix_parameters(self, fixed_params):
+        """
+        Holds some of the calibration parameters at a value (e.g. those the model is not sensitive to). Unnamed
+        parameters of run are then only the other parameters, in the order of their rank, and named parameters
+        may leave out the fixed ones
+        :param fixed_params: dictionary of parameter names and values, None to vary all parameters
+        """
+        self.fixed_params = dict(fixed_params or {})
+        calibrated = sorted((k for k in self.cal_params if k not in self.fixed_params),
+                            key=lambda k: self.cal_params[k]['rank'])
+        # position of each varied parameter among the unnamed parameters
+        self.param_positions = dict((key, i) for i, key in enumerate(calibrated))
+
+    def relocate(self, temp_folder):
+        """
+        Moves the files of the runs and the forcing data to another directory, e.g. on the machine of a
+        remote worker. The forcing data file has to be available there at the same path. Failed parameter
+        sets are then quarantined in that directory as well
+        """
+        self.temp_folder = temp_folder
+        self.temp_forcing_data_file = join(temp_folder, 'forcing_data_{}.txt'.format(self.sim_event_name))
+        self.created_run_directory = None
+        if not os.path.exists(temp_folder):
+            os.makedirs(temp_folder)
+        forcing = self.shared['forcing'].array() if 'forcing' in self.shared else None
+        if forcing is not None:
+            # the forcing of the process that sent the model, without reading the data file again
+            self.write_forcing(forcing.tobytes().decode())
+        else:
+            self.read_forcing(self.forcing_data_file)
+        if self.watchdog is not None and self.watchdog.quarantine.filename is not None:
+            self.watchdog.quarantine.filename = join(temp_folder, 'quarantine.jsonl')
+        # the templates contain the path of the forcing data
+        self.template = self.compile_template()
+        if self.hotstart is not None:
+            self.spinup_template = self.compile_template(self.sim_start_dt, self.spinup_end_dt, hotstart='SAVE')
+            self.hotstart_template = self.compile_template(self.spinup_end_dt, self.sim_end_dt, hotstart='USE')
+
     def read_forcing(self, forcing_data_file):
-        data = read_floodx_file(forcing_data_file)
-        data = resample_interpolate(data, 'S')
-        data['datetime'] = data.index
-        data['date'] = data['datetime'].apply(lambda x: x.strftime('%m/%d/%Y'))
-        data['time'] = data['datetime'].apply(lambda x: x.strftime('%H:%M:%S'))
-        # clip data
-        data = data.loc[self.sim_start_dt: self.sim_end_dt]
-        data.to_csv(self.temp_forcing_data_file,
-                    sep=' ',
-                    columns=['date', 'time', 'value'],
-                    # quoting=3,  #csv.QUOTE_NONE,
-                    index=False,
-                    header=False)
+        # clipped to the simulation time and formatted for SWMM
+        self.write_forcing(self.data_store.forcing(forcing_data_file, self.sim_start_dt, self.sim_end_dt))
+
+    def write_forcing(self, content):
+        # replaced at once, runs of other processes in the same directory may be reading it
+        with atomic_write(self.temp_forcing_data_file, 'w') as f:
+            f.write(content)
+        self.forcing_digest = hashlib.sha1(content.encode()).hexdigest()
 
     def read_observations(self, obs_config):
         for obs_name, obs in obs_config.items():
-            # read data
-            obs_data = read_floodx_file(obs['data_file'])
-            # scale data (for units)
-            obs_data.value = obs_data.value * obs['scale_factor']
-            # resample: aggregate per second, interpolate
+            # read data, scale it (for units) and resample: aggregate per second, interpolate
             period = '{0}S'.format(int(self.sim_reporting_step.total_seconds()))
-            obs_data = resample_interpolate(obs_data, period)
+            obs_data = self.data_store.resampled(obs['data_file'], period, scale_factor=obs['scale_factor'],
+                                                 start=self.sim_start_dt, end=self.sim_end_dt)
             # clip to simulation time
             shift = timedelta(seconds=int(self.sim_reporting_step.total_seconds()))
             obs_data = obs_data.loc[self.sim_start_dt + shift: self.sim_end_dt - shift]
@@ -124,6 +189,25 @@ class SwmmModel(object):
         self.obs_validation = self.observations[self.obs_config_validation]
         self.obs_calibration = self.observations[self.obs_config_calibration]
 
+    def share_data(self, directory=None):
+        """
+        Places the observations and the forcing in memory-mapped files (see SharedArray), which processes the
+        model is sent to map instead of receiving copies. The model then works on read-only views of the files
+        :param directory: where the files are kept, by default shared_data in the temporary folder
+        """
+        directory = directory or join(self.temp_folder, 'shared_data')
+        try:
+            shared = dict((name, SharedFrame(getattr(self, name), directory)) for name in SHARED_FRAMES)
+            content = self.data_store.forcing(self.forcing_data_file, self.sim_start_dt, self.sim_end_dt)
+            shared['forcing'] = SharedArray.create(np.frombuffer(content.encode(), dtype=np.uint8), directory)
+        except (IOError, OSError) as e:
+            print('## data of {} not shared with other processes: {}'.format(self.sim_event_name, e))
+            return
+        frames = dict((name, shared[name].frame()) for name in SHARED_FRAMES)
+        if all(frame is not None for frame in frames.values()):
+            self.shared = shared
+            self.__dict__.update(frames)
+
     def run(self, *params, named_model_params=None, obs_list=None, plot_results=False, plot_title=None, run_type='calibration'):
         """
         Runs the SWMM model with specific parameters. The following parameters can be passed.
@@ -136,38 +220,105 @@ class SwmmModel(object):
         :return: the simulation of the model
         """
 
+        instrumentation = get_instrumentation()
+        started = time.perf_counter()
         if obs_list is None:
             obs_list = self.obs_config_calibration
 
         # if only unnamed params are given, change how parameters are stored in order to feed to swmm model
         model_params = {}
         if named_model_params is None:
-            for key, value in self.cal_params.items():
-                model_params[key] = params[value['rank']]
+            for key in self.cal_params:
+                model_params[key] = self.fixed_params[key] if key in self.fixed_params \
+                    else params[self.param_positions[key]]
         else:
             model_params = named_model_params
+            if self.fixed_params:
+                model_params = dict(named_model_params)
+                for key, value in self.fixed_params.items():
+                    model_params.setdefault(key, value)
 
         # Check model params
         if not self.check_parameters(model_params):
+            instrumentation.count('rejected_parameter_sets')
             return self.observations * -10000
 
-        # Apply model params to model and return filenames for run
-        temp_model, output_file, report_file = self.apply_parameters(model_params)
-
-        # Run model
-        # Todo: What happens if the model is run in parallel?
-        with open(os.devnull, "w") as f:
-            subprocess.call([self.swmm_executable, temp_model, report_file, output_file],
-                            stdout=f)
-
-        # read simulation output
-        data = swmmtoolbox.extract(output_file, *[','.join(self.obs_available[o]['swmm_node']) for o in obs_list])
-        # rename index
-        data.index.rename('datetime', inplace=True)
-
-        # renaming data columns
-        rename_dict = dict(('_'.join(self.obs_available[o]['swmm_node']), o) for o in obs_list)
-        self.simulation = data.rename(index=str, columns=rename_dict)
+        # Apply model params to model
+        with instrumentation.timer('render'):
+            if self.cache is not None:
+                model_params = self.cache.quantize_parameters(model_params, self.cal_params)
+            input_mod = self.render(model_params)
+
+        # all observations are simulated at once, so that calibration and validation runs can share results
+        outputs = self.obs_config_calibration + [o for o in self.obs_config_validation
+                                                 if o not in self.obs_config_calibration]
+        if not set(obs_list).issubset(outputs):
+            outputs = obs_list
+
+        # Reuse the result of an identical simulation if available
+        data = None
+        if self.cache is not None:
+            # the path of the forcing data differs between experiments, its content is in the key with forcing_digest
+            key = self.cache.key(bytes(input_mod).replace(self.temp_forcing_data_file.encode(), b''),
+                                 self.forcing_digest, outputs,
+                                 [self.obs_available[o]['swmm_node'] for o in outputs],
+                                 type(self.backend).__name__)
+            with instrumentation.timer('cache_get'):
+                data = self.cache.get(key)
+            instrumentation.count('cache_misses' if data is None else 'cache_hits')
+
+        if data is None:
+            # parameter sets that failed before are penalized without simulating them again
+            timeout = None
+            if self.watchdog is not None:
+                run_key = self.watchdog.key(input_mod, self.forcing_digest)
+                if self.watchdog.quarantine.is_quarantined(run_key):
+                    instrumentation.count('quarantined_runs')
+                    return self.observations * self.watchdog.penalty
+                timeout = self.watchdog.timeout()
+
+            # write model and return filenames for run
+            if self.hotstart is None:
+                with instrumentation.timer('write_model'):
+                    temp_model, output_file, report_file = self.write_model(input_mod)
+
+            # Run model and read simulation output
+            simulation_started = time.perf_counter()
+            try:
+                with instrumentation.timer('simulate'):
+                    if self.hotstart is None:
+                        data = self.backend.run(temp_model, report_file, output_file,
+                                                [self.obs_available[o]['swmm_node'] for o in outputs], timeout=timeout)
+                    else:
+                        data = self.simulate_hotstart(model_params, outputs, timeout=timeout)
+                if self.watchdog is not None:
+                    kind = self.watchdog.check(data)
+                    if kind is not None:
+                        raise RunFailure(kind, 'simulation results are not finite')
+            except RunFailure as failure:
+                if self.watchdog is None:
+                    raise
+                instrumentation.count('failed_runs_' + failure.kind)
+                self.watchdog.failed(run_key, failure.kind, str(failure), model_params, self.sim_event_name)
+                return self.observations * self.watchdog.penalty
+            if self.watchdog is not None:
+                self.watchdog.succeeded(time.perf_counter() - simulation_started)
+            with instrumentation.timer('format_results'):
+                # name data columns (one per output, in order) after the observations
+                data.columns = outputs
+                if data.index.equals(self.sim_datetimes):
+                    # share the time axis of the model, so that observations are aligned with it only once
+                    data.index = self.sim_index
+                else:
+                    data.index.rename('datetime', inplace=True)
+                    data = data.rename(index=str)
+            if self.cache is not None:
+                with instrumentation.timer('cache_put'):
+                    self.cache.put(key, data)
+        if outputs != obs_list:
+            data = data[obs_list]
+        self.simulation = data
+        instrumentation.record('model_run', time.perf_counter() - started)
 
         # plot results if necessary
         if plot_title is None:
@@ -178,39 +329,156 @@ class SwmmModel(object):
         return self.simulation
 
     def apply_parameters(self, model_params):
+        # apply parameters to input and write it for a run
+        return self.write_model(self.render(model_params))
+
+    def compile_template(self, sim_start_dt=None, sim_end_dt=None, hotstart=None):
+        """
+        Checks the placeholders of the template and fills in the simulation period and initial conditions
+        :param sim_start_dt: start of the simulation, by default that of the event
+        :param sim_end_dt: end of the simulation, by default that of the event
+        :param hotstart: 'SAVE' or 'USE' to add a hotstart file to the model, left as the placeholder hotstart_file
+        :raises ValueError: if the template has placeholders that are not defined
+        """
+        sim_start_dt = sim_start_dt or self.sim_start_dt
+        sim_end_dt = sim_end_dt or self.sim_end_dt
+        template = self.swmm_model_template
+        if hotstart is not None:
+            template = CompiledTemplate('{}\n[FILES]\n{} HOTSTART "$hotstart_file"\n'.format(
+                self.template_text.rstrip(), hotstart), float_format=self.float_format)
         # apply simulation params to model
         params = {
             'forcing_data_file': self.temp_forcing_data_file,
-            'sim_start_time': datetime.strftime(self.sim_start_dt, '%H:%M:%S'),
-            'sim_end_time': datetime.strftime(self.sim_end_dt, '%H:%M:%S'),
-            'sim_start_date': datetime.strftime(self.sim_start_dt, '%m/%d/%Y'),
-            'sim_end_date': datetime.strftime(self.sim_end_dt, '%m/%d/%Y'),
+            'sim_start_time': datetime.strftime(sim_start_dt, '%H:%M:%S'),
+            'sim_end_time': datetime.strftime(sim_end_dt, '%H:%M:%S'),
+            'sim_start_date': datetime.strftime(sim_start_dt, '%m/%d/%Y'),
+            'sim_end_date': datetime.strftime(sim_end_dt, '%m/%d/%Y'),
             'sim_report_step': str(self.sim_reporting_step)
         }
         # add initial conditions
         params.update(self.initial_conditions)
-        # add model parameters
-        params.update(model_params)
+        template.validate(params, self.cal_params, ['hotstart_file'] if hotstart is not None else [])
+        unused = set(self.cal_params) - template.placeholders
+        if unused and hotstart is None:
+            print('## calibration parameters not used in the model template: {}'.format(', '.join(sorted(unused))))
+        return template.bind(params)
 
-        # apply parameters to input
-        input_mod = self.swmm_model_template.substitute(params)
+    def render(self, model_params):
+        """
+        Returns the encoded content of the model input file for the given parameters, see
+        CompiledTemplate.render_bytes. It is valid until the next render in the same thread
+        """
+        return self.template.render_bytes(model_params)
 
-        # generate temporary files for run
-        if self.temp_model_counter >= 10:
-            self.temp_model_counter = 0
+    def simulate_hotstart(self, model_params, outputs, timeout=None):
+        """
+        Simulates the event from the hotstart file of its spin-up, simulating the spin-up first if needed
+        :param model_params: dictionary of named model parameters
+        :param outputs: names of the observations to simulate
+        :param timeout: seconds after which each simulation is stopped
+        :return: results of the spin-up and of the rest of the event, as returned by the backend
+        """
+        instrumentation = get_instrumentation()
+        labels = [self.obs_available[o]['swmm_node'] for o in outputs]
+        key = hashlib.sha1(repr(([float(model_params[p]) for p in self.hotstart.get('parameters', [])],
+                                 labels)).encode()).hexdigest()[:16]
+        if key in self.hotstarts and os.path.exists(self.hotstarts[key][0]):
+            instrumentation.count('hotstart_hits')
+            self.hotstarts.move_to_end(key)
         else:
-            self.temp_model_counter += 1
-        current_dir = join(self.temp_folder, 'model_runs', str(self.temp_model_counter))
+            instrumentation.count('hotstart_misses')
+            hotstart_file = join(self.run_directory(), 'hotstart_{}_{}.hsf'.format(self.sim_event_name, key))
+            with instrumentation.timer('spinup'):
+                temp_model, output_file, report_file = self.write_model(
+                    self.spinup_template.render_bytes(dict(model_params, hotstart_file=hotstart_file)))
+                spinup = self.backend.run(temp_model, report_file, output_file, labels, timeout=timeout)
+            self.hotstarts[key] = (hotstart_file, spinup)
+            # keep a limited number of hotstart files, removing the least recently used
+            while len(self.hotstarts) > self.hotstart.get('max_files', 100):
+                old_file, _ = self.hotstarts.popitem(last=False)[1]
+                if os.path.exists(old_file):
+                    os.remove(old_file)
+        hotstart_file, spinup = self.hotstarts[key]
+        temp_model, output_file, report_file = self.write_model(
+            self.hotstart_template.render_bytes(dict(model_params, hotstart_file=hotstart_file)))
+        data = self.backend.run(temp_model, report_file, output_file, labels, timeout=timeout)
+        return pd.concat([spinup, data])
+
+    def check_hotstart(self, model_params, spinup_params):
+        """
+        Compares a run started from a hotstart file with a run from the initial conditions
+        :param model_params: dictionary of named model parameters of the compared runs
+        :param spinup_params: parameters with which the spin-up is simulated. Should only differ from model_params
+        in parameters that are not listed in the hotstart settings, to check that they do not change the spin-up
+        :return: largest absolute difference between the results of the two runs
+        """
+        outputs = self.obs_config_calibration + [o for o in self.obs_config_validation
+                                                 if o not in self.obs_config_calibration]
+        labels = [self.obs_available[o]['swmm_node'] for o in outputs]
+        hotstarts = self.hotstarts
+        self.hotstarts = OrderedDict()
+        try:
+            self.simulate_hotstart(spinup_params, outputs)
+            hot = self.simulate_hotstart(model_params, outputs)
+            for hotstart_file, _ in self.hotstarts.values():
+                os.remove(hotstart_file)
+        finally:
+            self.hotstarts = hotstarts
+        temp_model, output_file, report_file = self.write_model(self.render(model_params))
+        cold = self.backend.run(temp_model, report_file, output_file, labels)
+        return float(np.nanmax(np.abs(hot.values - cold.values)))
+
+    def __getstate__(self):
+        # hotstart files are kept in the run directory of each process
+        state = self.__dict__.copy()
+        state['hotstarts'] = OrderedDict()
+        # shared observations are mapped again by the receiving process
+        for name in SHARED_FRAMES:
+            if name in self.shared:
+                state[name] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if not self.shared:
+            return
+        frames = dict((name, self.shared[name].frame()) for name in SHARED_FRAMES)
+        if all(frame is not None for frame in frames.values()):
+            self.__dict__.update(frames)
+            return
+        # the files are not available in this process (e.g. on another machine), the observations are read again
+        print('## shared data of {} not found, reading the observations'.format(self.sim_event_name))
+        self.shared = {}
+        self.observations = None
+        self.read_observations(self.obs_available)
+
+    def write_model(self, input_mod):
+        """
+        Writes the model input to the run directory and returns the files of the run
+        :param input_mod: encoded content of the model input file, as returned by render
+        """
+        # generate temporary files for run
+        current_dir = self.run_directory()
         temp_model = join(current_dir, 'model_{}.inp'.format(self.sim_event_name))
         output_file = join(current_dir, 'output_{}.out'.format(self.sim_event_name))
         report_file = join(current_dir, 'report_{}.rpt'.format(self.sim_event_name))
-        if not os.path.exists(current_dir):
-            os.makedirs(current_dir)
-        with open(temp_model, 'w') as f:
+        if self.created_run_directory != current_dir:
+            if not os.path.exists(current_dir):
+                os.makedirs(current_dir)
+            self.created_run_directory = current_dir
+        # written unbuffered, in a single call
+        with open(temp_model, 'wb', buffering=0) as f:
             f.write(input_mod)
 
         return temp_model, output_file, report_file
 
+    def run_directory(self):
+        """
+        Directory for the files of a run. Each process gets its own directory, so that models run in
+        parallel worker processes never write to the same .inp or .out file
+        """
+        return join(self.temp_folder, 'model_runs', str(os.getpid()))
+
     def check_parameters(self, model_params):
         # check that parameters are within acceptable bounds
         for param_name, value in model_params.items():
@@ -256,14 +524,11 @@ class SwmmModel(object):
         # assign as sensor data
         df_sim['source'] = 'simulation'
 
-        # combine data and plot
+        # combine data, save it and request the plot, which is drawn from the saved data (see PlotQueue)
         df = df_sim.append(df_obs, ignore_index=True)
-        fig, ax = plt.subplots(figsize=(7, 5))
-        sns.lineplot(x='datetime', y='value', data=df, style='source', hue='location', ax=ax)
-        ax.set_title(plot_title)
-        plt.savefig(os.path.join(self.temp_folder, 'simulation_{title}.png'.format(title=plot_title.lower())))
-        plt.clf()
-        plt.close()
-
-        # save data for plot
-        df.to_csv(os.path.join(self.temp_folder, 'simulation_{title}_data.csv'.format(title=plot_title.lower())))
+        data_file = os.path.abspath(os.path.join(self.temp_folder,
+                                                 'simulation_{title}_data.csv'.format(title=plot_title.lower())))
+        df.to_csv(data_file)
+        temp_folder = os.path.abspath(self.temp_folder)
+        get_plot_queue().submit('simulation', temp_folder, data_file=data_file, plot_title=plot_title,
+                                temp_folder=temp_folder)
@@ -0,0 +1,222 @@
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+MAGIC_NUMBER = 516114522
+RECORDSIZE = 4
+VERSION = 51000
+SWMM_EPOCH = pd.Timestamp('1899-12-30')  # dates are stored as days since this date
+
+ITEM_TYPES = ['subcatchment', 'node', 'link', 'pollutant', 'system']
+
+# names of the reported variables per item type (SWMM 5.1.10 and later), as used by swmmtoolbox
+VARIABLES = {
+    0: ['Rainfall', 'Snow_depth', 'Evaporation_loss', 'Infiltration_loss', 'Runoff_rate',
+        'Groundwater_outflow', 'Groundwater_elevation', 'Soil_moisture'],
+    1: ['Depth_above_invert', 'Hydraulic_head', 'Volume_stored_ponded', 'Lateral_inflow',
+        'Total_inflow', 'Flow_lost_flooding'],
+    2: ['Flow_rate', 'Flow_depth', 'Flow_velocity', 'Froude_number', 'Capacity'],
+    4: ['Air_temperature', 'Rainfall', 'Snow_depth', 'Evaporation_infiltration', 'Runoff',
+        'Dry_weather_inflow', 'Groundwater_inflow', 'RDII_inflow', 'User_direct_inflow',
+        'Total_lateral_inflow', 'Flow_lost_to_flooding', 'Flow_leaving_outfalls',
+        'Volume_stored_water', 'Evaporation_rate', 'Potential_PET']
+}
+
+
+class InvalidOutputError(ValueError):
+    """The output file is missing results, truncated or flagged with an error by SWMM"""
+
+
+class OutputLayout(object):
+    """Object index and result layout of a SWMM binary output file"""
+
+    def __init__(self, fp, header, closing, start_date, report_step):
+        self.names_position, self.properties_position, self.results_position, self.period_count = closing
+        self.version, self.flow_units, self.subcatchment_count, self.node_count, self.link_count, \
+            self.pollutant_count = header
+        counts = [self.subcatchment_count, self.node_count, self.link_count, self.pollutant_count]
+
+        # read object names
+        fp.seek(self.names_position, 0)
+        self.names = {}
+        for item_type, count in enumerate(counts):
+            names = []
+            for _ in range(count):
+                size = struct.unpack('i', fp.read(RECORDSIZE))[0]
+                names.append(fp.read(size).decode('ascii', 'replace'))
+            self.names[item_type] = dict((name, i) for i, name in enumerate(names))
+
+        # read the number of reported variables per item type, skipping the object properties
+        fp.seek(RECORDSIZE * self.pollutant_count, 1)
+        for count in [self.subcatchment_count, self.node_count, self.link_count]:
+            property_count = struct.unpack('i', fp.read(RECORDSIZE))[0]
+            fp.seek(RECORDSIZE * property_count * (1 + count), 1)
+        self.variable_counts = {}
+        for item_type in [0, 1, 2, 4]:
+            self.variable_counts[item_type] = struct.unpack('i', fp.read(RECORDSIZE))[0]
+            fp.seek(RECORDSIZE * self.variable_counts[item_type], 1)
+
+        # variables of subcatchments, nodes and links are followed by one per pollutant
+        pollutants = sorted(self.names[3], key=self.names[3].get)
+        self.variables = dict((t, dict((v, i) for i, v in enumerate(VARIABLES[t] + (pollutants if t < 4 else []))))
+                              for t in VARIABLES)
+
+        # position of each item type within a period, in 4 byte records after the date
+        self.item_offsets = {0: 2}
+        self.item_offsets[1] = self.item_offsets[0] + self.subcatchment_count * self.variable_counts[0]
+        self.item_offsets[2] = self.item_offsets[1] + self.node_count * self.variable_counts[1]
+        self.item_offsets[4] = self.item_offsets[2] + self.link_count * self.variable_counts[2]
+        self.records_per_period = self.item_offsets[4] + self.variable_counts[4]
+
+        # time axis of the results: the first report is one reporting step after the report start
+        self.start_date = start_date
+        self.report_step = report_step
+        seconds = np.round((start_date + np.arange(1, self.period_count + 1) * report_step / 86400.) * 86400)
+        self.index = SWMM_EPOCH + pd.to_timedelta(seconds, unit='s')
+
+    def column(self, label):
+        """Position of a label such as 'node,s6,Depth_above_invert' within the records of a period"""
+        words = label.split(',')
+        if len(words) != 3 or words[0] not in ITEM_TYPES or words[0] == 'pollutant':
+            raise ValueError('The label "{}" should have the format TYPE,NAME,VAR'.format(label))
+        item_type = ITEM_TYPES.index(words[0])
+        variables = self.variables[item_type]
+        try:
+            variable = int(words[2])
+        except ValueError:
+            if words[2] not in variables:
+                raise ValueError('Variable "{}" is not available for {}'.format(words[2], words[0]))
+            variable = variables[words[2]]
+        if item_type == 4:
+            return self.item_offsets[4] + variable
+        if words[1] not in self.names[item_type]:
+            raise ValueError('{} was not found in "{}" list'.format(words[1], words[0]))
+        return self.item_offsets[item_type] + self.names[item_type][words[1]] * self.variable_counts[item_type] \
+            + variable
+
+    def column_name(self, label):
+        item_type, name, variable = label.split(',')
+        if item_type == 'system':
+            name = ''
+        try:
+            variable = sorted(self.variables[ITEM_TYPES.index(item_type)].items(), key=lambda v: v[1])[int(variable)][0]
+        except ValueError:
+            pass
+        return '{0}_{1}_{2}'.format(item_type, name, variable)
+
+
+class SwmmOutputReader(object):
+    """Reads results from SWMM binary output files, replacing swmmtoolbox.extract"""
+
+    def __init__(self):
+        self.layouts = {}
+        self.columns = {}
+
+    def layout(self, filename):
+        with open(filename, 'rb') as fp:
+            header = struct.unpack('7i', fp.read(7 * RECORDSIZE))
+            fp.seek(-6 * RECORDSIZE, 2)
+            closing = struct.unpack('6i', fp.read(6 * RECORDSIZE))
+            if header[0] != MAGIC_NUMBER or closing[5] != MAGIC_NUMBER:
+                raise InvalidOutputError('{} is not a valid SWMM output file'.format(filename))
+            if closing[4] != 0:
+                raise InvalidOutputError('Error code "{}" in output file indicates a problem with the run'.format(
+                    closing[4]))
+            if closing[3] == 0:
+                raise InvalidOutputError('There are zero time periods in the output file')
+            # the start date and reporting step directly precede the results
+            fp.seek(closing[2] - 3 * RECORDSIZE, 0)
+            start_date, report_step = struct.unpack('di', fp.read(3 * RECORDSIZE))
+
+            key = header[1:] + closing[:4] + (start_date, report_step)
+            if key not in self.layouts:
+                self.layouts[key] = OutputLayout(fp, header[1:], closing[:4], start_date, report_step)
+        return self.layouts[key]
+
+    def read(self, filename, labels):
+        layout = self.layout(filename)
+        key = (id(layout), labels)
+        if key not in self.columns:
+            self.columns[key] = [layout.column(label) for label in labels]
+        if os.path.getsize(filename) < layout.results_position + \
+                RECORDSIZE * layout.period_count * layout.records_per_period:
+            raise InvalidOutputError('{} is truncated'.format(filename))
+        results = np.memmap(filename, dtype=np.float32, mode='r', offset=layout.results_position,
+                            shape=(layout.period_count, layout.records_per_period))
+        values = np.array(results[:, self.columns[key]], dtype=np.float64)
+        # release the file, so that the next run can overwrite it
+        del results
+        return layout, values
+
+    def extract_array(self, filename, *labels):
+        """
+        Reads results into a contiguous array
+        :param filename: SWMM binary output file
+        :param labels: outputs in the format TYPE,NAME,VAR, e.g. 'node,s6,Depth_above_invert'
+        :return: time axis and array with one column per label
+        """
+        layout, values = self.read(filename, labels)
+        return layout.index, values
+
+    def extract(self, filename, *labels):
+        """Same as swmmtoolbox.extract, returns a data frame with one column per label"""
+        layout, values = self.read(filename, labels)
+        return pd.DataFrame(values, index=layout.index, columns=[layout.column_name(label) for label in labels])
+
+
+def write_output(filename, start_date, report_step, node_names, node_results,
+                 subcatchment_names=(), link_names=(), flow_units=4, error_code=0):
+    """
+    Writes a SWMM binary output file. Used by stand-ins for the SWMM engine
+    :param filename: where to write the file
+    :param start_date: datetime at which the simulation starts
+    :param report_step: reporting step in seconds
+    :param node_names: list of node names
+    :param node_results: array (periods x nodes x 6) of node variables, in the order of VARIABLES[1]
+    :param subcatchment_names: list of subcatchment names, their results are zero
+    :param link_names: list of link names, their results are zero
+    :param flow_units: SWMM flow unit code (4: LPS)
+    :param error_code: error code written to the closing records
+    """
+    node_results = np.asarray(node_results, dtype=np.float32)
+    period_count = node_results.shape[0]
+    counts = [len(subcatchment_names), len(node_names), len(link_names), 0]
+    variable_counts = [len(VARIABLES[0]), len(VARIABLES[1]), len(VARIABLES[2]), len(VARIABLES[4])]
+    start = (pd.Timestamp(start_date) - SWMM_EPOCH).total_seconds() / 86400.
+
+    with open(filename, 'wb') as f:
+        f.write(struct.pack('7i', MAGIC_NUMBER, VERSION, flow_units, *counts))
+        names_position = f.tell()
+        for names in [subcatchment_names, node_names, link_names]:
+            for name in names:
+                f.write(struct.pack('i', len(name)) + name.encode('ascii'))
+        properties_position = f.tell()
+        # object properties: subcatchment area, node type/invert/max depth, link type/offsets/depth/length
+        for count, codes in zip(counts[:3], [[1], [0, 2, 3], [0, 4, 4, 3, 5]]):
+            f.write(struct.pack('{}i'.format(len(codes) + 1), len(codes), *codes))
+            f.write(np.zeros(count * len(codes), dtype=np.float32).tobytes())
+        for count in variable_counts:
+            f.write(struct.pack('{}i'.format(count + 1), count, *range(count)))
+        f.write(struct.pack('di', start, int(report_step)))
+        results_position = f.tell()
+
+        records = np.zeros((period_count, 2 + counts[0] * variable_counts[0] + counts[1] * variable_counts[1]
+                            + counts[2] * variable_counts[2] + variable_counts[3]), dtype=np.float32)
+        dates = start + np.arange(1, period_count + 1) * report_step / 86400.
+        records[:, :2] = dates.reshape(-1, 1).view(np.float32)
+        node_start = 2 + counts[0] * variable_counts[0]
+        records[:, node_start:node_start + counts[1] * variable_counts[1]] = node_results.reshape(period_count, -1)
+        f.write(records.tobytes())
+
+        f.write(struct.pack('6i', names_position, properties_position, results_position, period_count,
+                            error_code, MAGIC_NUMBER))
+
+
+_default_reader = SwmmOutputReader()
+
+
+def extract(filename, *labels):
+    """Drop-in for swmmtoolbox.extract using a process-wide SwmmOutputReader"""
+    return _default_reader.extract(filename, *labels)
@@ -2,6 +2,8 @@ import pandas as pd
 from datetime import datetime
 import csv
 
+from swmm_calibration.classes.data_store import read_floodx, resample_interpolate
+
 def format_resample(
         input_file,                 # full path to data file to be read
         output_file,                # path to file where data should be saved
@@ -12,23 +14,14 @@ def format_resample(
     # resamples the data to 1-second frequency
 
     # read data
-    data = pd.read_csv(input_file,
-                       parse_dates=[0],
-                       index_col=0,
-                       infer_datetime_format=True,
-                       dayfirst=True,
-                       # date_parser=date_parser,
-                       sep=';')
+    data = read_floodx(input_file)
 
     # aggregate per second, interpolate
-    data = data.resample('S')
-    data = data.mean()
-    data = data.resample('S')
-    data = data.interpolate(method='linear')
+    data = resample_interpolate(data, 'S')
 
     data['datetime'] = data.index
-    data['date'] = data['datetime'].apply(lambda x: x.strftime('%m/%d/%Y'))
-    data['time'] = data['datetime'].apply(lambda x: x.strftime('%H:%M:%S'))
+    data['date'] = data.index.strftime('%m/%d/%Y')
+    data['time'] = data.index.strftime('%H:%M:%S')
 
     data.to_csv(output_file,
                 sep=' ',
@@ -46,19 +39,10 @@ def resample(
 ):
     # converts pandas formatted file to SWMM formatted file
     # read data
-    data = pd.read_csv(input_file,
-                       parse_dates=[0],
-                       index_col=0,
-                       infer_datetime_format=True,
-                       dayfirst=True,
-                       # date_parser=date_parser,
-                       sep=';')
+    data = read_floodx(input_file)
 
     # aggregate per second, interpolate
-    data = data.resample(aggregation_period)
-    data = data.mean()
-    data = data.resample(aggregation_period)
-    data = data.interpolate(method='linear')
+    data = resample_interpolate(data, aggregation_period)
 
     data['datetime'] = data.index
 
@@ -78,17 +62,11 @@ def format(
 ):
     # converts pandas formatted file to SWMM formatted file
     # read data
-    data = pd.read_csv(input_file,
-                       parse_dates=[0],
-                       index_col=0,
-                       infer_datetime_format=True,
-                       dayfirst=True,
-                       # date_parser=date_parser,
-                       sep=';')
+    data = read_floodx(input_file)
 
     data['datetime'] = data.index
-    data['date'] = data['datetime'].apply(lambda x: x.strftime('%m/%d/%Y'))
-    data['time'] = data['datetime'].apply(lambda x: x.strftime('%H:%M:%S'))
+    data['date'] = data.index.strftime('%m/%d/%Y')
+    data['time'] = data.index.strftime('%H:%M:%S')
 
     data.to_csv(output_file,
                 sep=' ',
@@ -0,0 +1,33 @@
+"""Worker for calibrations with parallel = 'distributed'
+
+Start one worker per core on every machine that should run models, e.g.
+    python -m swmm_calibration.scripts.distributed_worker --address coordinator-host:6000 --authkey KEY
+The key is the one of the coordinator, given with --authkey or in the environment variable SWMM_CALIBRATION_AUTHKEY.
+The code, the SWMM executable and the forcing data have to be available at the same paths as on the
+coordinator (relative to the working directory).
+"""
+import argparse
+
+from swmm_calibration.classes.distributed import run_worker, AUTHKEY_VARIABLE
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--address', default='localhost:6000', help='host:port of the coordinator')
+    parser.add_argument('--authkey', default=None,
+                        help='key shared with the coordinator, defaults to the environment variable {}'.format(
+                            AUTHKEY_VARIABLE))
+    parser.add_argument('--directory', default=None,
+                        help='where the files of runs are written, defaults to the directories of the coordinator')
+    parser.add_argument('--wait', type=float, default=60,
+                        help='seconds to wait for a coordinator before the worker stops')
+    args = parser.parse_args()
+    host, port = args.address.rsplit(':', 1)
+    try:
+        run_worker((host, int(port)), args.authkey, directory=args.directory, wait=args.wait)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main()
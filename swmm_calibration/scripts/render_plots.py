@@ -0,0 +1,20 @@
+"""Draws the plots of experiments run with plot_mode = 'data'
+
+    python -m swmm_calibration.scripts.render_plots results/availability
+renders the plots requested in the given directories and their subdirectories.
+"""
+import argparse
+
+from swmm_calibration.classes.plot_queue import render_requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directories', nargs='+', help='directories of experiments')
+    args = parser.parse_args()
+    for directory in args.directories:
+        print('{}: {} plots'.format(directory, render_requests(directory)))
+
+
+if __name__ == '__main__':
+    main()
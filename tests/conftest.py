@@ -0,0 +1,68 @@
+import os
+import sys
+import copy
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLE = os.path.join(ROOT, 'example')
+sys.path.insert(0, ROOT)
+os.environ.setdefault('MPLBACKEND', 'Agg')
+
+from example.settings import Settings  # noqa: E402
+from swmm_calibration.classes import experiment_runner  # noqa: E402
+
+FORCING_FILE = os.path.join(EXAMPLE, Settings.forcing_data_file)
+# observation files shipped with the example, used in place of the sensor data
+OBSERVATION_FILES = {
+    's3': os.path.join(EXAMPLE, 'data', 'l5f16res_finetuned_FloodXCam1__FloodXCam1__signal.csv'),
+    's5': os.path.join(EXAMPLE, 'data', 'l5f16res_augmented__FloodXCam5__signal.csv'),
+    's6': os.path.join(EXAMPLE, 'data', 'l5f16res_finetuned_FloodXCam5__FloodXCam5__signal.csv'),
+}
+
+
+class FakeSettings(Settings):
+    """Example settings on the shipped data, simulated with the FakeBackend"""
+    swmm_backend = 'fake'
+    swmm_model_template = os.path.join(EXAMPLE, Settings.swmm_model_template)
+    forcing_data_file = FORCING_FILE
+    # periods with inflow that are covered by the observation files
+    calibration_event = dict(Settings.calibration_event, start_dt='2016/10/07 12:45:00', end_dt='2016/10/07 13:00:00')
+    validation_events = [dict(Settings.validation_events[0], start_dt='2016/10/07 13:15:00',
+                              end_dt='2016/10/07 13:30:00')]
+    obs_available = copy.deepcopy(Settings.obs_available)
+    for obs in obs_available.values():
+        obs['data_file'] = OBSERVATION_FILES[obs['location']]
+        obs['scale_factor'] = 1
+    del obs
+
+
+def create_runner(directory, seed=3, **settings):
+    """
+    ExperimentRunner with FakeSettings, after seeding the random numbers
+    :param settings: settings that differ from FakeSettings, e.g. parallel='pool'
+    """
+    # an instance, so that the overrides do not change FakeSettings and it can be pickled
+    s = FakeSettings()
+    for key, value in settings.items():
+        setattr(s, key, value)
+    np.random.seed(seed)
+    return experiment_runner.ExperimentRunner(
+        data_directory=str(directory), output_file=os.path.join(str(directory), 'experiments.csv'), settings=s,
+        experiment_metadata={}, experiment_name='test', evaluation_count=3)
+
+
+def iterations(directory):
+    """Iterations of the calibration in a directory"""
+    return pd.read_csv(os.path.join(str(directory), 'iterations.csv'))
+
+
+def calibrate(directory, repetitions=40, options=None, **settings):
+    """
+    Runs a seeded calibration with FakeSettings and returns its iterations, see create_runner
+    :param options: options of the sampler, in addition to those of SCE-UA
+    """
+    runner = create_runner(directory, **settings)
+    runner.calibrator.run(repetitions=repetitions, kstop=3, ngs=3, pcento=0.5, **(options or {}))
+    return iterations(directory)
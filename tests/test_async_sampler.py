@@ -0,0 +1,17 @@
+from conftest import calibrate, create_runner, iterations
+
+
+def test_async_de_improves_on_initial_population(tmp_path):
+    result = calibrate(tmp_path, repetitions=40, calibration_algorithm='async_de', options={'population_size': 10})
+    assert len(result) == 40
+    # like1 is minimized, the trials find better parameter sets than the latin hypercube design
+    assert result['like1'][10:].min() < result['like1'][:10].min()
+    assert ((result['pars_r'] >= 0) & (result['pars_r'] <= 0.03)).all()
+
+
+def test_async_de_pool_runs_every_repetition(tmp_path):
+    runner = create_runner(tmp_path, calibration_algorithm='async_de', parallel='pool', processes=2)
+    runner.calibrator.run(repetitions=30, population_size=10)
+    # runs are stored in the order in which they complete, which varies between runs
+    assert len(iterations(tmp_path)) == 30
+    assert 0 < runner.calibrator.sampler.utilisation <= 1
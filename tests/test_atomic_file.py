@@ -0,0 +1,19 @@
+import os
+
+import pytest
+
+from swmm_calibration.classes.atomic_file import atomic_write
+
+
+def test_atomic_write(tmp_path):
+    filename = str(tmp_path / 'data.txt')
+    with atomic_write(filename, 'w') as f:
+        f.write('first')
+    with pytest.raises(ValueError):
+        with atomic_write(filename, 'w') as f:
+            f.write('partial')
+            raise ValueError
+    # the previous file is kept and the temporary file removed
+    with open(filename) as f:
+        assert f.read() == 'first'
+    assert os.listdir(str(tmp_path)) == ['data.txt']
@@ -0,0 +1,48 @@
+import os
+
+import pandas as pd
+
+from swmm_calibration.classes import plot_queue
+from swmm_calibration.classes.simulation_backend import FakeBackend
+from conftest import FakeSettings, calibrate, create_runner, iterations
+
+
+def test_fake_backend_experiment(tmp_path):
+    runner = create_runner(tmp_path)
+    assert isinstance(runner.backend, FakeBackend)
+    runner.run(repetitions=40, kstop=3, ngs=3, pcento=0.5)
+    calibration = iterations(tmp_path)
+    assert len(calibration) >= 40
+    # the parameters change the simulations
+    assert calibration['like1'].nunique() > 1
+    assert calibration['like1'].notnull().all()
+    results = pd.read_csv(os.path.join(str(tmp_path), 'experiments.csv'))
+    assert set(results['type']) == {'calibration', 'validation'}
+    assert results['error'].notnull().all()
+
+
+def test_pool_matches_sequential(tmp_path):
+    sequential = calibrate(tmp_path / 'seq', parallel='seq')
+    pool = calibrate(tmp_path / 'pool', parallel='pool', processes=2)
+    assert sequential['like1'].nunique() > 1
+    pd.testing.assert_frame_equal(pool, sequential)
+
+
+def test_pool_runs_events_at_once(tmp_path):
+    events = [FakeSettings.calibration_event, FakeSettings.validation_events[0]]
+    sequential = calibrate(tmp_path / 'seq', repetitions=20, calibration_events=events)
+    # each pool worker runs the events of its parameter sets on processes of its own
+    pool = calibrate(tmp_path / 'pool', repetitions=20, calibration_events=events, parallel='pool', processes=2)
+    pd.testing.assert_frame_equal(pool, sequential)
+    # models are written in a directory per process, by the event processes of the two workers
+    assert len(os.listdir(str(tmp_path / 'pool' / 'model_runs'))) > 2
+
+
+def test_optional_features_are_off_by_default(tmp_path):
+    runner = create_runner(tmp_path)
+    assert runner.cache is None
+    assert not runner.obj_fun.compiled
+    assert not runner.instrumentation.enabled
+    assert runner.watchdog is None
+    assert runner.checkpoint is None
+    assert plot_queue.get_plot_queue().mode == 'inline'
@@ -0,0 +1,47 @@
+import os
+
+import pandas as pd
+import pytest
+
+from conftest import calibrate, create_runner, iterations
+
+
+def test_resume_matches_uninterrupted(tmp_path):
+    complete = calibrate(tmp_path / 'complete', checkpoint=True)
+    stopped = tmp_path / 'stopped'
+    calibrate(stopped, checkpoint=True)
+    # stops the calibration after 15 runs: the later runs and the completed stage are lost
+    run_log = os.path.join(str(stopped), 'checkpoint_runs.jsonl')
+    with open(run_log) as f:
+        runs = f.readlines()
+    with open(run_log, 'w') as f:
+        f.writelines(runs[:15])
+    runner = create_runner(stopped, seed=0, checkpoint=True)
+    runner.checkpoint.load()
+    runner.checkpoint.state['stages'] = []
+    runner.checkpoint.save()
+    os.remove(os.path.join(str(stopped), 'iterations.csv'))
+
+    runner.calibrator.resume()
+    # only the lost runs are simulated again
+    with open(run_log) as f:
+        assert len(f.readlines()) == len(runs)
+    pd.testing.assert_frame_equal(iterations(stopped), complete)
+
+
+def test_resume_without_checkpoint(tmp_path):
+    runner = create_runner(tmp_path, checkpoint=True)
+    with pytest.raises(ValueError, match='no checkpoint'):
+        runner.calibrator.resume()
+
+
+def test_resume_needs_the_same_order_of_runs(tmp_path):
+    runner = create_runner(tmp_path / 'async', calibration_algorithm='async_de', parallel='pool', processes=2,
+                           checkpoint=True)
+    with pytest.raises(ValueError, match='order in which runs complete'):
+        runner.calibrator.resume()
+    calibrate(tmp_path / 'pool', repetitions=20, parallel='pool', processes=2, checkpoint=True)
+    # the batches of the samplers depend on the number of workers
+    runner = create_runner(tmp_path / 'pool', parallel='pool', processes=3, checkpoint=True)
+    with pytest.raises(ValueError, match='other calibration settings'):
+        runner.calibrator.resume()
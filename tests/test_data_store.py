@@ -0,0 +1,132 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from swmm_calibration.classes import data_store
+from conftest import FORCING_FILE, OBSERVATION_FILES
+
+DATA_FILES = [FORCING_FILE] + sorted(OBSERVATION_FILES.values())
+PERIODS = ['S', '5S', '7S', 'T']
+
+
+def read_exact(filename):
+    # read_floodx_file with correctly rounded values, as parse_floodx reads them
+    return pd.read_csv(filename, index_col=0, parse_dates=[0], dayfirst=True, sep=';', float_precision='round_trip')
+
+
+@pytest.mark.parametrize('filename', DATA_FILES)
+def test_parse_floodx_matches_read_floodx_file(filename):
+    expected = read_exact(filename)
+    data = data_store.read_floodx(filename)
+    pd.testing.assert_frame_equal(data, expected.astype(float), check_freq=False)
+    # the default float parser of pandas may differ in the last digit
+    pd.testing.assert_frame_equal(data, data_store.read_floodx_file(filename).astype(float), check_freq=False,
+                                  rtol=1e-15)
+
+
+def test_parse_floodx_window():
+    data = data_store.read_floodx(FORCING_FILE)
+    window = data_store.read_floodx(FORCING_FILE, '2016-10-07 12:45:00', '2016-10-07 13:00:00')
+    pd.testing.assert_frame_equal(window, data.loc['2016-10-07 12:45:00':'2016-10-07 13:00:00'])
+
+
+def test_parse_floodx_window_decodes_its_rows():
+    # rows outside the window are only compared on the digits of their timestamps
+    content = b'datetime;value\n31.02.2016 12:45:00;1\n07.10.2016 12:45:00;2\n07.10.2016 12:45:05;3\n'
+    assert data_store.parse_floodx(content) is None
+    window = data_store.parse_floodx(content, '2016-10-07 12:45:00', '2016-10-07 12:45:04')
+    assert list(window['value']) == [2.]
+    # the invalid row is needed, to interpolate from or in the window
+    assert data_store.parse_floodx(content, '2016-10-07 12:45:00', '2016-10-07 12:45:04', period='5S') is None
+    assert data_store.parse_floodx(content, None, '2016-10-07 12:45:04') is None
+
+
+def test_parse_floodx_other_formats():
+    assert data_store.parse_floodx(b'datetime;value\n2016-10-07 12:45:00;1\n') is None
+    assert data_store.parse_floodx(b'datetime;value\n07.10.2016 12:45:00;x\n') is None
+
+
+def test_parse_floodx_invalid_day():
+    assert data_store.parse_floodx(b'datetime;value\n31.02.2016 12:45:00;1\n') is None
+    assert data_store.parse_floodx(b'datetime;value\n29.02.2016 12:45:00;1\n').index[0] == pd.Timestamp('2016-02-29 12:45')
+
+
+@pytest.mark.parametrize('filename', DATA_FILES)
+@pytest.mark.parametrize('period', PERIODS)
+def test_resample_interpolate_matches_pandas(filename, period):
+    data = data_store.read_floodx(filename)
+    expected = data.resample(period).mean().interpolate(method='linear')
+    pd.testing.assert_frame_equal(data_store.resample_interpolate(data, period), expected)
+
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_resample_window_matches_whole_file(period):
+    start, end = pd.Timestamp('2016-10-07 12:45:03'), pd.Timestamp('2016-10-07 13:00:00')
+    expected = data_store.resample_interpolate(data_store.read_floodx(FORCING_FILE), period).loc[start:end]
+    window = data_store.read_floodx(FORCING_FILE, start, end, period=period)
+    pd.testing.assert_frame_equal(data_store.resample_interpolate(window, period, start, end), expected,
+                                  check_freq=False)
+
+
+def test_data_store_window_matches_cached():
+    start, end = '2016-10-07 12:45:00', '2016-10-07 13:00:00'
+    pushed_down = data_store.DataStore(persist=False)
+    whole = data_store.DataStore(persist=False)
+    whole.read(FORCING_FILE)
+    pd.testing.assert_frame_equal(pushed_down.resampled(FORCING_FILE, '5S', start=start, end=end),
+                                  whole.resampled(FORCING_FILE, '5S', start=start, end=end), check_freq=False)
+    assert pushed_down.forcing(FORCING_FILE, start, end) == whole.forcing(FORCING_FILE, start, end)
+
+
+@pytest.mark.parametrize('period', PERIODS)
+def test_binary_cache_window(tmp_path, period):
+    filename = str(tmp_path / 'forcing.txt')
+    shutil.copy(FORCING_FILE, filename)
+    start, end = '2016-10-07 12:45:03', '2016-10-07 13:00:00'
+    expected = data_store.DataStore(persist=False).resampled(filename, period, start=start, end=end)
+    # windows of kept files are sliced from the binary cache, the first store creates it
+    for _ in range(2):
+        store = data_store.DataStore()
+        pd.testing.assert_frame_equal(store.resampled(filename, period, start=start, end=end), expected,
+                                      check_freq=False)
+        assert store.pushdown(store.digest(filename))
+        assert len([name for name in os.listdir(str(tmp_path)) if name.endswith('.npz')]) == 1
+
+
+def test_binary_cache(tmp_path):
+    filename = str(tmp_path / 'forcing.txt')
+    shutil.copy(FORCING_FILE, filename)
+    expected = data_store.DataStore(persist=False).read(filename)
+    data_store.DataStore().read(filename)
+    cache_files = [name for name in os.listdir(str(tmp_path)) if name.endswith('.npz')]
+    assert len(cache_files) == 1
+    # a new store reads the cache, not the file
+    pd.testing.assert_frame_equal(data_store.DataStore().load(str(tmp_path / cache_files[0])), expected,
+                                  check_freq=False)
+    pd.testing.assert_frame_equal(data_store.DataStore().read(filename), expected, check_freq=False)
+    # a changed file replaces its cache
+    with open(filename, 'a') as f:
+        f.write('07.10.2016 23:59:59;0.5\n')
+    assert data_store.DataStore().read(filename).iloc[-1]['value'] == 0.5
+    assert cache_files[0] not in os.listdir(str(tmp_path))
+    assert len([name for name in os.listdir(str(tmp_path)) if name.endswith('.npz')]) == 1
+
+
+@pytest.mark.parametrize('filename', DATA_FILES)
+def test_resampled_matches_read(filename):
+    store = data_store.DataStore(persist=False)
+    expected = data_store.read_floodx_file(filename).resample('5S').mean().interpolate(method='linear') * 2
+    pd.testing.assert_frame_equal(store.resampled(filename, '5S', scale_factor=2), expected, check_freq=False)
+    # computed once and shared
+    assert store.resampled(filename, '5S', scale_factor=2) is store.resampled(filename, '5S', scale_factor=2)
+
+
+def test_forcing_window():
+    store = data_store.DataStore(persist=False)
+    lines = store.forcing(FORCING_FILE, '2016-10-07 12:45:00', '2016-10-07 12:45:09').splitlines()
+    assert len(lines) == 10
+    assert lines[0].startswith('10/07/2016 12:45:00 ')
+    assert lines[-1].startswith('10/07/2016 12:45:09 ')
+    assert store.forcing(FORCING_FILE, '2000-01-01 00:00:00', '2000-01-01 01:00:00') == ''
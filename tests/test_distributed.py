@@ -0,0 +1,68 @@
+import os
+import sys
+import time
+import socket
+import threading
+import subprocess
+from multiprocessing.connection import Client
+
+import pandas as pd
+
+from conftest import ROOT, calibrate
+
+AUTHKEY = 'test-key'
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('localhost', 0))
+        return s.getsockname()[1]
+
+
+def start_workers(port, count, directory=None):
+    code = 'from swmm_calibration.classes.distributed import run_worker; run_worker({!r}, {!r}, directory={!r})'.format(
+        ('localhost', port), AUTHKEY, directory)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([ROOT, os.path.dirname(os.path.abspath(__file__))]))
+    return [subprocess.Popen([sys.executable, '-c', code], cwd=ROOT, env=env,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL) for _ in range(count)]
+
+
+def test_broker_with_two_workers(tmp_path):
+    port = free_port()
+    workers = start_workers(port, 2, directory=str(tmp_path / 'workers'))
+    try:
+        distributed = calibrate(tmp_path / 'distributed', parallel='distributed', processes=2, distributed={
+            'address': ('localhost', port), 'authkey': AUTHKEY, 'heartbeat_interval': 1, 'heartbeat_timeout': 10})
+    finally:
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+    pool = calibrate(tmp_path / 'pool', parallel='pool', processes=2)
+    assert distributed['like1'].nunique() > 1
+    pd.testing.assert_frame_equal(distributed, pool)
+
+
+def test_silent_client_does_not_block_workers(tmp_path):
+    # a client that connects first but never answers the handshake, the worker connects after it
+    port = free_port()
+    silent, workers = [], []
+
+    def connect_silent():
+        while not silent:
+            try:
+                silent.append(Client(('localhost', port), authkey=AUTHKEY.encode()))
+            except ConnectionRefusedError:
+                time.sleep(0.05)
+        workers.extend(start_workers(port, 1, directory=str(tmp_path / 'workers')))
+
+    thread = threading.Thread(target=connect_silent, daemon=True)
+    thread.start()
+    try:
+        iterations = calibrate(tmp_path / 'distributed', repetitions=20, parallel='distributed', distributed={
+            'address': ('localhost', port), 'authkey': AUTHKEY, 'heartbeat_interval': 1, 'heartbeat_timeout': 60})
+    finally:
+        thread.join()
+        for worker in workers:
+            worker.kill()
+            worker.wait()
+    assert len(iterations) >= 20
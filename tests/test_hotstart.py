@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from conftest import create_runner
+
+# the spin-up of the FakeBackend depends on the roughness of the conduits
+ROUGHNESS = ['s_r', 'r_p3', 'r_p7', 'r_px']
+
+
+def parameters(runner, **values):
+    params = dict((name, sum(p['bounds']) / 2.) for name, p in runner.s.calibration_parameters.items())
+    params.update(values)
+    return params
+
+
+def test_runs_share_the_spinup(tmp_path):
+    hot = create_runner(tmp_path / 'hot', hotstart={'spinup_sec': 120, 'parameters': ROUGHNESS})
+    cold = create_runner(tmp_path / 'cold')
+    for c_m1 in [0.2, 0.8]:
+        params = parameters(hot, c_m1=c_m1)
+        simulation = hot.model_cal.run(named_model_params=params).copy()
+        np.testing.assert_allclose(simulation.values, cold.model_cal.run(named_model_params=params).values,
+                                   atol=1e-6)
+    # c_m1 is not listed, both runs start from the same hotstart file
+    assert len(hot.model_cal.hotstarts) == 1
+    hot.model_cal.run(named_model_params=parameters(hot, r_p3=0.01))
+    assert len(hot.model_cal.hotstarts) == 2
+
+
+def test_check_hotstart(tmp_path):
+    listed = create_runner(tmp_path / 'listed', hotstart={'spinup_sec': 120, 'parameters': ROUGHNESS, 'tolerance': 1e-6,
+                                                          'check': True})
+    assert listed.check_hotstart() <= 1e-6
+    # the spin-up depends on the roughness, which is not listed. Only checked on request
+    unlisted = create_runner(tmp_path / 'unlisted', hotstart={'spinup_sec': 120, 'parameters': [], 'tolerance': 1e-6})
+    with pytest.raises(ValueError, match='more than the tolerance'):
+        unlisted.check_hotstart()
+    with pytest.raises(ValueError, match='more than the tolerance'):
+        create_runner(tmp_path / 'checked', hotstart={'spinup_sec': 120, 'parameters': [], 'tolerance': 1e-6,
+                                                      'check': True})
@@ -0,0 +1,68 @@
+import os
+from string import Template
+
+import pytest
+
+from swmm_calibration.classes.model_template import CompiledTemplate
+from conftest import FakeSettings, create_runner
+
+TEXT = '[OPTIONS]\nSTART_DATE $start_date\n[CONDUITS]\np3 m1 m2 10 ${r_p3} 0 0 0 0\nCOST $$5 $roughness\n'
+
+
+def test_render_matches_string_template():
+    values = {'start_date': '10/07/2016', 'r_p3': 0.0125, 'roughness': 0.1}
+    template = CompiledTemplate(TEXT)
+    assert template.placeholders == {'start_date', 'r_p3', 'roughness'}
+    bound = template.bind({'start_date': '10/07/2016'})
+    assert template.render(values) == Template(TEXT).substitute(values)
+    assert bound.placeholders == {'r_p3', 'roughness'}
+    assert bound.render(values) == Template(TEXT).substitute(values)
+
+
+def test_render_leaves_template_intact():
+    template = CompiledTemplate(TEXT)
+    template.render({'start_date': '10/07/2016', 'r_p3': 0.0125, 'roughness': 0.1})
+    assert template.placeholders == {'start_date', 'r_p3', 'roughness'}
+    values = {'start_date': '10/08/2016', 'r_p3': 0.02, 'roughness': 0.2}
+    assert template.bind({}).render(values) == Template(TEXT).substitute(values)
+
+
+def test_render_bytes_reuses_buffer():
+    template = CompiledTemplate(TEXT, float_format='{:.6g}').bind({'start_date': '10/07/2016'})
+    first = template.render_bytes({'r_p3': 0.0123456789, 'roughness': 0.1})
+    assert bytes(first) == template.render({'r_p3': 0.0123456789, 'roughness': 0.1}).encode()
+    assert b' 0.0123457 ' in bytes(first)
+    second = template.render_bytes({'r_p3': 0.02, 'roughness': 0.2})
+    assert bytes(second) == template.render({'r_p3': 0.02, 'roughness': 0.2}).encode()
+    # rendered into the same memory
+    assert first.obj is second.obj
+
+
+def test_invalid_placeholder():
+    with pytest.raises(ValueError, match='line 2'):
+        CompiledTemplate('[OPTIONS]\nSTART_DATE $1\n')
+
+
+def test_missing_values():
+    with pytest.raises(ValueError, match=r'\$roughness'):
+        CompiledTemplate(TEXT).validate(['start_date', 'r_p3'])
+
+
+def test_model_with_undefined_placeholder(tmp_path):
+    with open(FakeSettings.swmm_model_template) as f:
+        text = f.read()
+    template = str(tmp_path / 'template.inp')
+    with open(template, 'w') as f:
+        f.write(text.replace('[OPTIONS]', '[OPTIONS]\n;$undefined_parameter', 1))
+    with pytest.raises(ValueError, match=r'\$undefined_parameter'):
+        create_runner(tmp_path / 'experiment', swmm_model_template=template)
+    assert os.path.isfile(template)
+
+
+def test_model_input_float_format(tmp_path):
+    model = create_runner(tmp_path).model_cal
+    params = dict((name, 0.0123456789) for name in model.cal_params)
+    temp_model, _, _ = model.write_model(model.render(params))
+    with open(temp_model) as f:
+        content = f.read()
+    assert '0.0123457' in content and '0.0123456789' not in content
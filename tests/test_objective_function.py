@@ -0,0 +1,52 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from swmm_calibration.classes.objective_function import ObjectiveFunction
+
+OBJECTIVE_FUNCTIONS = ['rmse', 'spearman', 'spearman_zero', 'spearman_simple_zero']
+
+
+def obs_config(obj_fun):
+    return {'obs': {'calibration': {'obj_fun': obj_fun, 'weight': 1, 'zero_threshold_obs': 0.02,
+                                    'zero_threshold_sim': 0.02}}}
+
+
+def series(seed, count=180):
+    # water levels with dry periods, ties and gaps, on the string time axis of SwmmModel
+    random = np.random.RandomState(seed)
+    index = pd.Index([str(t) for t in pd.date_range('2016-10-07 12:45:05', periods=count, freq='5S')],
+                     name='datetime')
+    simulation = pd.DataFrame({'obs': np.round(np.clip(random.normal(0.05, 0.05, count), 0, None), 3)}, index=index)
+    observations = pd.DataFrame({'obs': np.round(np.clip(random.normal(0.05, 0.05, count), 0, None), 3)},
+                                index=index)
+    observations.iloc[random.choice(count, 10, replace=False), 0] = np.nan
+    # observations that are not on the time axis of the simulation
+    return simulation, pd.concat([observations.iloc[5:], observations.iloc[:5].rename(index=lambda t: t + '.5')])
+
+
+@pytest.mark.parametrize('obj_fun', OBJECTIVE_FUNCTIONS)
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_compiled_matches_frames(obj_fun, seed):
+    simulation, observations = series(seed)
+    frames = ObjectiveFunction(obs_config(obj_fun), compiled=False).evaluate(simulation, observations)
+    compiled = ObjectiveFunction(obs_config(obj_fun), compiled=True).evaluate(simulation, observations)
+    assert compiled == pytest.approx(frames, rel=1e-12, abs=1e-12, nan_ok=True)
+
+
+@pytest.mark.parametrize('obj_fun', OBJECTIVE_FUNCTIONS)
+def test_constant_series(obj_fun):
+    # spearman correlation is not defined for constant series
+    simulation, observations = series(0)
+    simulation['obs'] = 0.
+    frames = ObjectiveFunction(obs_config(obj_fun), compiled=False).evaluate(simulation, observations)
+    compiled = ObjectiveFunction(obs_config(obj_fun), compiled=True).evaluate(simulation, observations)
+    assert compiled == pytest.approx(frames, nan_ok=True)
+
+
+def test_evaluation_leaves_observations_unchanged():
+    simulation, observations = series(0)
+    expected = observations.copy()
+    for compiled in [False, True]:
+        ObjectiveFunction(obs_config('spearman_zero'), compiled=compiled).evaluate(simulation, observations)
+    pd.testing.assert_frame_equal(observations, expected)
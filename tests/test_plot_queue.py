@@ -0,0 +1,40 @@
+import os
+import json
+
+import pandas as pd
+
+from swmm_calibration.classes.plot_queue import PlotQueue, render_requests, REQUESTS_FILE
+
+
+def simulation_data(directory):
+    """Data file of a simulation plot, as written by SwmmModel"""
+    data = pd.DataFrame({'datetime': pd.date_range('2016-10-07 12:45', periods=10, freq='5S').repeat(2),
+                         'value': range(20), 'location': 's3', 'source': ['sim', 'obs'] * 10})
+    data_file = os.path.join(str(directory), 'simulation.csv')
+    data.to_csv(data_file)
+    return data_file
+
+
+def test_background_renderer(tmp_path):
+    queue = PlotQueue(mode='background')
+    queue.submit('simulation', str(tmp_path), data_file=simulation_data(tmp_path), plot_title='Test',
+                 temp_folder=str(tmp_path))
+    # drawn by the renderer process, not by this one
+    assert queue.process is not None and queue.process.pid != os.getpid()
+    queue.close()
+    assert queue.process is None
+    assert os.path.isfile(os.path.join(str(tmp_path), 'simulation_test.png'))
+
+
+def test_data_mode_renders_later(tmp_path):
+    queue = PlotQueue(mode='data')
+    for _ in range(2):
+        queue.submit('simulation', str(tmp_path), data_file=simulation_data(tmp_path), plot_title='Test',
+                     temp_folder=str(tmp_path))
+    with open(os.path.join(str(tmp_path), REQUESTS_FILE)) as f:
+        assert len([json.loads(line) for line in f]) == 2
+    assert not os.path.isfile(os.path.join(str(tmp_path), 'simulation_test.png'))
+    # the same plot requested twice is drawn once
+    assert render_requests(str(tmp_path)) == 1
+    assert os.path.isfile(os.path.join(str(tmp_path), 'simulation_test.png'))
+    assert not os.path.isfile(os.path.join(str(tmp_path), REQUESTS_FILE))
@@ -0,0 +1,36 @@
+import multiprocessing
+
+import pandas as pd
+import pytest
+
+from swmm_calibration.classes.results_store import ResultsStore, CsvResultsStore
+from swmm_calibration.classes.simulation_backend import SimulationBackend
+
+
+def test_abstract_base_classes():
+    with pytest.raises(TypeError):
+        ResultsStore('results.csv')
+    with pytest.raises(TypeError):
+        SimulationBackend()
+
+
+def append_rows(filename, writer, count=25):
+    store = CsvResultsStore(filename, buffer_size=1)
+    for i in range(count):
+        # writers with different columns make the file be rewritten
+        store.append(pd.DataFrame({'error': [i], 'type': ['calibration'], 'par_{}'.format(writer % 2): [writer]}))
+
+
+def test_csv_store_concurrent_writers(tmp_path):
+    filename = str(tmp_path / 'results.csv')
+    # left behind by a crashed writer
+    open(filename + '.lock', 'w').close()
+    processes = [multiprocessing.Process(target=append_rows, args=(filename, writer)) for writer in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    results = CsvResultsStore(filename).read()
+    assert len(results) == 100
+    assert sorted(results.columns) == ['error', 'par_0', 'par_1', 'type']
+    assert (results['error'].value_counts() == 4).all()
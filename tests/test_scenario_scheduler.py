@@ -0,0 +1,45 @@
+import os
+import json
+
+import pandas as pd
+
+from swmm_calibration.classes.scenario_scheduler import ScenarioScheduler
+from conftest import FakeSettings
+
+RUN = {'repetitions': 20, 'kstop': 3, 'ngs': 3, 'pcento': 0.5}
+
+
+def scheduler(directory, roughness=0.015):
+    scenarios = [{'name': 'a', 'run': RUN, 'evaluation_count': 2},
+                 {'name': 'b', 'run': RUN, 'evaluation_count': 2, 'metadata': {'roughness': roughness}}]
+    return ScenarioScheduler(FakeSettings, scenarios, str(directory), os.path.join(str(directory), 'results.csv'),
+                             workers=2)
+
+
+def manifest(directory):
+    with open(os.path.join(str(directory), 'manifest.jsonl')) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_scenarios_and_manifest(tmp_path):
+    result = scheduler(tmp_path).run()
+    # a calibration and a validation per scenario
+    assert len(result['finished']) == 4 and not result['failed'] and not result['skipped']
+    entries = manifest(tmp_path)
+    assert sorted((e['scenario'], e['task']) for e in entries) == [
+        ('a', 'calibration'), ('a', 'validation'), ('b', 'calibration'), ('b', 'validation')]
+    # validations are recorded after the calibration they depend on
+    for name in 'ab':
+        tasks = [e['task'] for e in entries if e['scenario'] == name]
+        assert tasks == ['calibration', 'validation']
+    results = pd.read_csv(os.path.join(str(tmp_path), 'results.csv'))
+    assert set(results['type']) == {'calibration', 'validation'}
+    # both scenarios write to the results file, only b has metadata
+    assert results['meta_roughness'].isnull().any() and (results['meta_roughness'] == 0.015).any()
+
+    # finished tasks are skipped when running again
+    scheduler(tmp_path).run()
+    assert len(manifest(tmp_path)) == 4
+    # the tasks of a changed scenario are run again
+    scheduler(tmp_path, roughness=0.02).run()
+    assert [(e['scenario'], e['task']) for e in manifest(tmp_path)[4:]] == [('b', 'calibration'), ('b', 'validation')]
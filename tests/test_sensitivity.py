@@ -0,0 +1,48 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from swmm_calibration.classes import sensitivity
+
+CAL_PARAMS = {'a': {'bounds': [0, 1], 'rank': 0}, 'b': {'bounds': [10, 20], 'rank': 1},
+              'c': {'bounds': [-1, 1], 'rank': 2}}
+
+
+def outputs(unit_samples, function):
+    return pd.DataFrame({'y': [function(**p) for p in sensitivity.scale(unit_samples, CAL_PARAMS)]})
+
+
+def test_morris_linear_function():
+    np.random.seed(0)
+    unit_samples = sensitivity.samples('morris', 3, 10)
+    assert unit_samples.shape == (40, 3)
+    assert unit_samples.min() >= 0 and unit_samples.max() <= 1
+    result = sensitivity.indices('morris', CAL_PARAMS, unit_samples,
+                                 outputs(unit_samples, lambda a, b, c: 2 * a + 0.1 * b)).set_index('parameter')
+    # effects over the whole range of each parameter
+    np.testing.assert_allclose(result['mu'], [2, 1, 0], atol=1e-9)
+    np.testing.assert_allclose(result['sigma'], 0, atol=1e-9)
+    np.testing.assert_allclose(result['importance'], [1, .5, 0], atol=1e-9)
+    assert sensitivity.insensitive_parameters(result.reset_index(), ['y']) == ['c']
+
+
+def test_fast_separates_parameters():
+    np.random.seed(0)
+    unit_samples = sensitivity.samples('fast', 3, 129)
+    assert unit_samples.shape == (3 * 129, 3)
+    result = sensitivity.indices('fast', CAL_PARAMS, unit_samples,
+                                 outputs(unit_samples, lambda a, b, c: np.sin(3 * a) + 0.05 * b)).set_index('parameter')
+    assert result.loc['a', 'first_order'] > 0.7
+    assert 0.1 < result.loc['b', 'first_order'] < 0.3
+    assert result.loc['c', 'total'] < 0.05
+    # the function is additive, the first order indices explain all of the variance
+    assert abs(result['first_order'].sum() - 1) < 0.05
+    assert (result['first_order'] <= result['total'] + 1e-9).all()
+    assert sensitivity.insensitive_parameters(result.reset_index(), ['y']) == ['c']
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError, match='Unknown sensitivity analysis method'):
+        sensitivity.samples('sobol', 3, 10)
+    with pytest.raises(ValueError, match='more than 64 samples'):
+        sensitivity.samples('fast', 3, 64)
@@ -0,0 +1,48 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from swmm_calibration.classes.shared_data import SharedArray, SharedFrame
+from conftest import create_runner
+
+
+def test_shared_array(tmp_path):
+    array = np.arange(4000, dtype=np.float64).reshape(1000, 4)
+    shared = SharedArray.create(array, str(tmp_path))
+    # named after the content, an equal array is written once
+    assert SharedArray.create(array.copy(), str(tmp_path)).filename == shared.filename
+    assert SharedArray.create(array + 1, str(tmp_path)).filename != shared.filename
+    assert len(os.listdir(str(tmp_path))) == 2
+    # only the file name is pickled
+    data = pickle.dumps(shared)
+    assert len(data) < array.nbytes
+    mapped = pickle.loads(data).array()
+    np.testing.assert_array_equal(mapped, array)
+    with pytest.raises(ValueError):
+        mapped[0, 0] = 1
+
+
+def test_missing_file(tmp_path):
+    shared = SharedArray.create(np.zeros(3), str(tmp_path))
+    os.remove(shared.filename)
+    assert pickle.loads(pickle.dumps(shared)).array() is None
+
+
+def test_shared_frame(tmp_path):
+    frame = pd.DataFrame({'s3': [0.1, 0.2, 0.3], 's5': [1., 2., 3.]},
+                         index=pd.date_range('2016-10-07 12:45', periods=3, freq='5S'))
+    shared = pickle.loads(pickle.dumps(SharedFrame(frame, str(tmp_path))))
+    pd.testing.assert_frame_equal(shared.frame(), frame, check_freq=False)
+
+
+def test_model_shares_data(tmp_path):
+    copies = create_runner(tmp_path / 'copies').model_cal
+    shared = create_runner(tmp_path / 'shared', shared_data=True).model_cal
+    assert not copies.shared and shared.shared
+    received = pickle.loads(pickle.dumps(shared))
+    pd.testing.assert_frame_equal(received.observations, copies.observations, check_freq=False)
+    params = dict((name, 0.01) for name in copies.cal_params)
+    pd.testing.assert_frame_equal(received.run(named_model_params=params), copies.run(named_model_params=params))
@@ -0,0 +1,44 @@
+import pytest
+
+from swmm_calibration.classes.simulation_backend import SharedLibraryBackend, RunFailure
+
+
+class EngineLibrary(object):
+    """Records the calls of SharedLibraryBackend to the SWMM library, the engine never finishes"""
+
+    def __init__(self, start_code=0):
+        self.calls = []
+        self.start_code = start_code
+
+    def __getattr__(self, name):
+        def call(*args):
+            self.calls.append(name)
+            if name == 'swmm_start':
+                return self.start_code
+            if name == 'swmm_step':
+                args[0]._obj.value += 1 / 86400.
+            return 0
+        return call
+
+
+def run(library, timeout=0):
+    backend = SharedLibraryBackend()
+    backend.swmm = library
+    return backend.run('model.inp', 'model.rpt', 'model.out', [('node', 's3', 'Depth_above_invert')], timeout=timeout)
+
+
+def test_timeout_ends_the_simulation():
+    library = EngineLibrary()
+    with pytest.raises(RunFailure) as failure:
+        run(library)
+    assert failure.value.kind == 'timeout'
+    # the engine is reset for the next simulation of the process
+    assert library.calls[-2:] == ['swmm_end', 'swmm_close']
+
+
+def test_failed_start_is_not_ended():
+    library = EngineLibrary(start_code=200)
+    with pytest.raises(RunFailure) as failure:
+        run(library)
+    assert failure.value.kind == 'return_code'
+    assert library.calls == ['swmm_open', 'swmm_start', 'swmm_close']
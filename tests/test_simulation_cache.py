@@ -0,0 +1,55 @@
+import os
+
+import numpy as np
+import pytest
+
+from swmm_calibration.classes.simulation_cache import SimulationCache
+
+
+def test_memory_lru_eviction():
+    cache = SimulationCache(max_items=2)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    # a is used, so b is the least recently used result
+    assert cache.get('a') == 1
+    cache.put('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    assert cache.statistics()['memory_hits'] == 3
+    assert cache.statistics()['misses'] == 1
+
+
+def test_disk_cache_shared_and_bounded(tmp_path):
+    directory = str(tmp_path / 'cache')
+    cache = SimulationCache(max_items=1, directory=directory, max_disk_mb=5000 / 2 ** 20)
+    for i in range(10):
+        cache.put(cache.key('run', i), np.full(200, i, dtype=np.float64))
+        # distinct modification times, the order of use
+        os.utime(cache.path(cache.key('run', i)), (i, i))
+    assert cache.disk_usage() <= 5000
+    # the most recent results are kept, the first ones were evicted
+    other = SimulationCache(directory=directory)
+    assert other.get(cache.key('run', 0)) is None
+    assert (other.get(cache.key('run', 9)) == 9).all()
+    assert other.statistics()['disk_hits'] == 1
+
+
+def test_key_depends_on_all_parts():
+    cache = SimulationCache()
+    assert cache.key('model', b'forcing') == cache.key('model', b'forcing')
+    assert cache.key('model', b'forcing') != cache.key('model', b'other forcing')
+
+
+def test_quantize_relative_to_bounds():
+    cache = SimulationCache(quantize=0.1)
+    cal_params = {'width': {'bounds': [10, 110]}, 'roughness': {'bounds': [0.01, 0.02]}}
+    quantized = cache.quantize_parameters({'width': 47, 'roughness': 0.01234}, cal_params)
+    assert quantized['width'] == pytest.approx(50)
+    assert quantized['roughness'] == pytest.approx(0.012)
+    # within the bounds
+    assert cache.quantize_parameters({'width': 109.9, 'roughness': 0.02}, cal_params)['width'] <= 110
+
+
+def test_quantize_disabled():
+    params = {'width': 47}
+    assert SimulationCache().quantize_parameters(params, {'width': {'bounds': [10, 110]}}) is params
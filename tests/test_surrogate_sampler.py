@@ -0,0 +1,21 @@
+import pandas as pd
+
+from conftest import calibrate
+
+
+def test_surrogate_improves_on_initial_design(tmp_path):
+    iterations = calibrate(tmp_path / 'seq', repetitions=30, calibration_algorithm='surrogate', options={'initial_points': 10})
+    assert len(iterations) == 30
+    # like1 is minimized, the surrogate proposes better parameter sets than the latin hypercube design
+    assert iterations['like1'][10:].min() < iterations['like1'][:10].min()
+    # parameter sets stay within their bounds
+    assert ((iterations['pars_r'] >= 0) & (iterations['pars_r'] <= 0.03)).all()
+
+
+def test_surrogate_pool_matches_sequential(tmp_path):
+    # the batch size defaults to the number of worker processes, a fixed batch size gives the same parameter sets
+    options = {'initial_points': 10, 'batch_size': 2}
+    sequential = calibrate(tmp_path / 'seq', repetitions=20, calibration_algorithm='surrogate', options=options)
+    pool = calibrate(tmp_path / 'pool', repetitions=20, calibration_algorithm='surrogate', options=options,
+                     parallel='pool', processes=2)
+    pd.testing.assert_frame_equal(pool, sequential)